@@ -6,6 +6,7 @@
 
 import os
 import sys
+import types
 
 
 # In order to load django before 1.7, we need to create a faux
@@ -75,6 +76,12 @@ exclude_patterns = ['_build']
 # We fake our more expensive imports when building the docs.
 sys.modules.update((mod_name, Mock()) for mod_name in MOCK_MODULES)
 
+# oauth2client.aio uses coroutine syntax added in Python 3.5, so it can't be
+# imported, or documented, on older interpreters.
+if sys.version_info < (3, 5):
+    sys.modules['oauth2client.aio'] = types.ModuleType(
+        'oauth2client.aio', 'asyncio support. Requires Python 3.5 or later.')
+
 # We want to set the RTD theme, but not if we're on RTD.
 if os.environ.get('READTHEDOCS', None) != 'True':
     import sphinx_rtd_theme
@@ -15,11 +15,13 @@
 """Helper functions for commonly used utilities."""
 
 import base64
+import collections
 import functools
 import inspect
 import json
 import logging
 import os
+import threading
 import warnings
 
 import six
@@ -140,6 +142,83 @@ def positional(max_positional_args):
         return positional(len(args) - len(defaults))(max_positional_args)
 
 
+class LRUCache(object):
+    """Thread-safe, bounded cache which evicts the least recently used key.
+
+    Has the same ``get`` / ``set`` / ``delete`` interface as
+    :class:`oauth2client.transport.MemoryCache`, and keeps count of lookups
+    that hit and missed so callers can monitor its effectiveness.
+
+    Args:
+        max_size: int, The maximum number of entries to keep. Once the cache
+                  is full, setting a new key evicts the least recently used
+                  one.
+    """
+
+    def __init__(self, max_size):
+        if max_size < 1:
+            raise ValueError('max_size must be a positive integer.')
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None, is_valid=None):
+        """Retrieve a value, marking it as the most recently used.
+
+        Args:
+            key: hashable, The key to look up.
+            default: object, The value to return if ``key`` is not cached.
+            is_valid: callable, (Optional) Called with the cached value. If
+                      it returns False the entry is evicted and the lookup
+                      counts as a miss.
+
+        Returns:
+            The cached value, or ``default`` if ``key`` is not cached.
+        """
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            if is_valid is not None and not is_valid(value):
+                self.misses += 1
+                return default
+            self._entries[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entries if full.
+
+        Args:
+            key: hashable, The key to store ``value`` under.
+            value: object, The value to store.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove a key from the cache, if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove all entries and reset the hit and miss counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
 def scopes_to_string(scopes):
     """Converts scope value to a string.
 
@@ -0,0 +1,326 @@
+# Copyright 2016 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""asyncio support for OAuth 2.0 credentials.
+
+Refreshes :class:`oauth2client.client.OAuth2Credentials` (including service
+account credentials) and authorizes requests from coroutines, without
+pushing the refresh onto a thread. Requires Python 3.5 or later.
+
+Requests are made with an *async request callable*: a coroutine function
+taking ``uri, method='GET', body=None, headers=None`` like
+:func:`oauth2client.transport.request` and returning a ``(response,
+content)`` pair, where ``response.status`` is the HTTP status code. For
+example, with aiohttp::
+
+    async def request(uri, method='GET', body=None, headers=None):
+        async with session.request(method, uri, data=body,
+                                   headers=headers) as resp:
+            return resp, await resp.read()
+
+    token_info = await aio.get_access_token(credentials, request)
+
+    authed_request = aio.wrap_request_for_auth(credentials, request)
+    resp, content = await authed_request('https://www.googleapis.com/...')
+
+Coroutines on the same event loop which refresh the same credentials at
+the same time share a single request to the token endpoint. As in
+:meth:`oauth2client.client.OAuth2Credentials.refresh`, credentials with a
+store hold its lock while refreshing, and use a token another process has
+stored instead of requesting one. Storage calls may block, so they're made
+in the event loop's default executor.
+
+Credentials which aren't refreshed through the token endpoint (e.g.
+:class:`oauth2client.contrib.gce.AppAssertionCredentials`) are refreshed
+with their synchronous ``refresh`` in the event loop's default executor.
+"""
+
+import asyncio
+import logging
+import threading
+import weakref
+
+from oauth2client import client
+from oauth2client import transport
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# Maps credentials to {event loop: in-flight refresh task}. Like
+# client._refresh_states, it is kept out of the credentials themselves so
+# that it is never serialized, pickled or copied.
+_refresh_tasks = weakref.WeakKeyDictionary()
+_refresh_tasks_lock = threading.Lock()
+
+
+def _refreshes_with_token_endpoint(credentials):
+    """True if the credentials are refreshed by a request to token_uri."""
+    return (isinstance(credentials, client.OAuth2Credentials) and
+            type(credentials)._refresh is client.OAuth2Credentials._refresh)
+
+
+async def _post_refresh_request(credentials, request):
+    """Requests a new access token from the token endpoint of credentials.
+
+    The async counterpart of the request made by
+    ``OAuth2Credentials._do_refresh_request``.
+
+    Returns:
+        tuple, the status and content of the response.
+    """
+    body = credentials._generate_refresh_request_body()
+    headers = credentials._generate_refresh_request_headers()
+
+    _LOGGER.info('Refreshing access_token')
+    resp, content = await request(credentials.token_uri, method='POST',
+                                  body=body, headers=headers)
+    return resp.status, content
+
+
+def _reread_store(credentials):
+    """Updates credentials from their store if refreshed elsewhere.
+
+    Returns:
+        bool, True if the credentials were updated.
+    """
+    new_cred = credentials.store.locked_get()
+    if (new_cred and not new_cred.invalid and
+            new_cred.access_token != credentials.access_token and
+            not new_cred.access_token_expired):
+        _LOGGER.info('Updated access_token read from Storage')
+        credentials._updateFromCredential(new_cred)
+        return True
+    return False
+
+
+async def _refresh_with_store(credentials, request):
+    """Refreshes credentials which have a store.
+
+    The async counterpart of ``OAuth2Credentials._refresh``: holds the
+    storage lock while refreshing, and first reads the store in case
+    another process has already refreshed the credentials. Storage calls
+    may block, e.g. waiting for a file lock, so they're made in the event
+    loop's default executor.
+    """
+    store = credentials.store
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(None, store.acquire_lock)
+    try:
+        if await loop.run_in_executor(None, _reread_store, credentials):
+            return
+        status, content = await _post_refresh_request(credentials, request)
+        await loop.run_in_executor(
+            None, credentials._handle_refresh_response, status, content)
+    finally:
+        await loop.run_in_executor(None, store.release_lock)
+
+
+def _refresh_in_thread(credentials):
+    token_uri = getattr(credentials, 'token_uri', None)
+    with transport.pooled_http(token_uri) as http:
+        credentials._refresh(http)
+
+
+async def _do_refresh(credentials, request):
+    if _refreshes_with_token_endpoint(credentials):
+        if credentials.store is not None:
+            await _refresh_with_store(credentials, request)
+            return
+        status, content = await _post_refresh_request(credentials, request)
+        credentials._handle_refresh_response(status, content)
+    else:
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, _refresh_in_thread, credentials)
+
+
+def _start_refresh(credentials, request):
+    """Gets the in-flight refresh of credentials, starting one if needed.
+
+    Returns:
+        tuple, the refresh task and whether it was started by this call.
+    """
+    loop = asyncio.get_event_loop()
+    with _refresh_tasks_lock:
+        tasks = _refresh_tasks.setdefault(credentials, {})
+        task = tasks.get(loop)
+        if task is not None:
+            return task, False
+        task = asyncio.ensure_future(_do_refresh(credentials, request))
+        tasks[loop] = task
+
+    def forget(unused_task):
+        with _refresh_tasks_lock:
+            tasks.pop(loop, None)
+
+    task.add_done_callback(forget)
+    return task, True
+
+
+async def refresh(credentials, request):
+    """Refreshes the access_token of credentials.
+
+    If a refresh of the credentials is already in flight on the current
+    event loop, waits for it instead of starting another. Cancelling the
+    caller doesn't cancel the shared refresh.
+
+    Args:
+        credentials: Credentials, the credentials to refresh.
+        request: coroutine function, An async request callable used to
+                 make the request to the token endpoint.
+
+    Raises:
+        HttpAccessTokenRefreshError: When the refresh fails.
+    """
+    task, _ = _start_refresh(credentials, request)
+    await asyncio.shield(task)
+
+
+async def _refresh_if_stale(credentials, request, stale_token):
+    """Refreshes credentials unless another coroutine already has.
+
+    The async counterpart of ``OAuth2Credentials._refresh_if_stale``.
+    """
+    if (credentials.access_token and
+            credentials.access_token != stale_token and
+            not credentials.access_token_expired):
+        _LOGGER.info('Re-using access_token refreshed by another caller')
+        return
+    await refresh(credentials, request)
+
+
+def _log_background_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        # The current token is still valid; a refresh will be retried
+        # by the next caller, or once the token has expired.
+        _LOGGER.warning('Background refresh of access_token failed',
+                        exc_info=task.exception())
+
+
+async def _maybe_refresh_ahead(credentials, request):
+    """Refreshes credentials about to expire, if they support it.
+
+    The async counterpart of ``OAuth2Credentials._refresh_ahead``. In
+    background mode, the refresh runs as a separate task and this returns
+    immediately.
+    """
+    refresh_ahead_due = getattr(credentials, '_refresh_ahead_due', None)
+    if refresh_ahead_due is None or not refresh_ahead_due():
+        return
+    if credentials.refresh_ahead_in_background:
+        task, started = _start_refresh(credentials, request)
+        if started:
+            _LOGGER.info('Refreshing access_token ahead of expiry in the '
+                         'background')
+            task.add_done_callback(_log_background_failure)
+        return
+    await _refresh_if_stale(credentials, request, credentials.access_token)
+
+
+async def get_access_token(credentials, request):
+    """Returns the access token of credentials and its expiration.
+
+    The async counterpart of
+    :meth:`oauth2client.client.OAuth2Credentials.get_access_token`. If the
+    token doesn't exist or has expired, gets a new one. If it expires
+    within the credentials' ``refresh_ahead_secs``, refreshes it (or starts
+    refreshing it in the background) before returning.
+
+    Args:
+        credentials: OAuth2Credentials, the credentials to get a token for.
+        request: coroutine function, An async request callable used to
+                 make the request to the token endpoint.
+
+    Returns:
+        AccessTokenInfo, the access token and the seconds until it expires.
+
+    Raises:
+        HttpAccessTokenRefreshError: When a needed refresh fails.
+    """
+    if not credentials.access_token or credentials.access_token_expired:
+        await refresh(credentials, request)
+    else:
+        await _maybe_refresh_ahead(credentials, request)
+    return client.AccessTokenInfo(access_token=credentials.access_token,
+                                  expires_in=credentials._expires_in())
+
+
+def wrap_request_for_auth(credentials, request):
+    """Wraps an async request callable to authorize its requests.
+
+    The async counterpart of
+    :func:`oauth2client.transport.wrap_http_for_auth`. The returned callable
+    gets an access token if needed, adds it to the request headers and, if
+    the request fails with one of
+    :data:`oauth2client.transport.REFRESH_STATUS_CODES`, refreshes the token
+    and retries the request.
+
+    Args:
+        credentials: Credentials, the credentials used to identify the
+                     authenticated user.
+        request: coroutine function, An async request callable, used both
+                 for the authorized requests and for refreshing.
+
+    Returns:
+        coroutine function, An async request callable taking the same
+        arguments as ``request``. It has the credentials as its
+        ``credentials`` attribute.
+    """
+
+    async def new_request(uri, method='GET', body=None, headers=None,
+                          **kwargs):
+        if not credentials.access_token:
+            _LOGGER.info('Attempting refresh to obtain '
+                         'initial access_token')
+            await _refresh_if_stale(credentials, request, None)
+        else:
+            await _maybe_refresh_ahead(credentials, request)
+
+        # Clone and modify the request headers to add the appropriate
+        # Authorization header.
+        headers = transport._initialize_headers(headers)
+        access_token = credentials.access_token
+        credentials.apply(headers)
+        transport._apply_user_agent(headers, credentials.user_agent)
+
+        body_stream_position = None
+        # Check if the body is a file-like stream.
+        if all(getattr(body, stream_prop, None) for stream_prop in
+               transport._STREAM_PROPERTIES):
+            body_stream_position = body.tell()
+
+        resp, content = await request(uri, method=method, body=body,
+                                      headers=headers, **kwargs)
+
+        # A stored token may expire between the time it is retrieved and
+        # the time the request is made, so we may need to try twice.
+        max_refresh_attempts = 2
+        for refresh_attempt in range(max_refresh_attempts):
+            if resp.status not in transport.REFRESH_STATUS_CODES:
+                break
+            _LOGGER.info('Refreshing due to a %s (attempt %s/%s)',
+                         resp.status, refresh_attempt + 1,
+                         max_refresh_attempts)
+            await _refresh_if_stale(credentials, request, access_token)
+            access_token = credentials.access_token
+            credentials.apply(headers)
+            if body_stream_position is not None:
+                body.seek(body_stream_position)
+
+            resp, content = await request(uri, method=method, body=body,
+                                          headers=headers, **kwargs)
+
+        return resp, content
+
+    new_request.credentials = credentials
+    return new_request
@@ -20,6 +20,7 @@ Tools for interacting with OAuth 2.0 protected resources.
 import collections
 import copy
 import datetime
+import email.utils
 import json
 import logging
 import os
@@ -27,6 +28,8 @@ import shutil
 import socket
 import sys
 import tempfile
+import threading
+import weakref
 
 import six
 from six.moves import http_client
@@ -117,6 +120,12 @@ _GCE_HEADERS = {_METADATA_FLAVOR_HEADER: _DESIRED_METADATA_FLAVOR}
 # easier testing (by replacing with a stub).
 _UTCNOW = datetime.datetime.utcnow
 
+# Seconds before cached ID token verification certificates expire to start
+# fetching them again in the background.
+_CERTS_REFRESH_AHEAD_SECS = 60
+# Seconds to wait before retrying a failed background certificate fetch.
+_CERTS_RETRY_SECS = 10
+
 # NOTE: These names were previously defined in this module but have been
 #       moved into `oauth2client.transport`,
 clean_headers = transport.clean_headers
@@ -180,6 +189,42 @@ class CryptoUnavailableError(Error, NotImplementedError):
     """Raised when a crypto library is required, but none is available."""
 
 
+# Per-credentials state used to coalesce concurrent refreshes. It is kept
+# out of the credentials themselves so that it is never serialized, pickled
+# or copied between credentials.
+_refresh_states = weakref.WeakKeyDictionary()
+_refresh_states_lock = threading.Lock()
+
+
+class _RefreshState(object):
+    """Lock serializing refreshes of one credential, and their statistics."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.coalesced_refreshes = 0
+        # The thread running a refresh-ahead in the background, if any.
+        self.background_refresh = None
+        # True while the holder of lock refreshes a token ahead of expiry.
+        self.refreshing_ahead = False
+
+
+def _get_refresh_state(credentials):
+    """Get or create the refresh state shared by all users of credentials.
+
+    Args:
+        credentials: Credentials, the credentials being refreshed.
+
+    Returns:
+        _RefreshState, the state for ``credentials``.
+    """
+    with _refresh_states_lock:
+        state = _refresh_states.get(credentials)
+        if state is None:
+            state = _RefreshState()
+            _refresh_states[credentials] = state
+        return state
+
+
 def _parse_expiry(expiry):
     if expiry and isinstance(expiry, datetime.datetime):
         return expiry.strftime(EXPIRY_FORMAT)
@@ -447,6 +492,19 @@ class OAuth2Credentials(Credentials):
     OAuth2Credentials objects may be safely pickled and unpickled.
     """
 
+    NON_SERIALIZED_MEMBERS = (
+        frozenset(['refresh_ahead_secs', 'refresh_ahead_in_background']) |
+        Credentials.NON_SERIALIZED_MEMBERS)
+    """Members that aren't serialized when object is converted to JSON."""
+
+    refresh_ahead_secs = 0
+    """Refresh the access_token this many seconds before it expires.
+
+    See :meth:`set_refresh_ahead`."""
+
+    refresh_ahead_in_background = False
+    """Whether refreshes ahead of expiry run in a background thread."""
+
     @_helpers.positional(8)
     def __init__(self, access_token, client_id, client_secret, refresh_token,
                  token_expiry, token_uri, user_agent, revoke_uri=None,
@@ -651,19 +709,133 @@ class OAuth2Credentials(Credentials):
             return True
         return False
 
+    @property
+    def coalesced_refreshes(self):
+        """Number of refreshes skipped because another thread made one.
+
+        See :meth:`_refresh_if_stale`.
+        """
+        return _get_refresh_state(self).coalesced_refreshes
+
     def get_access_token(self, http=None):
         """Return the access token and its expiration information.
 
         If the token does not exist, get one.
         If the token expired, refresh it.
+        If the token expires within ``refresh_ahead_secs``, refresh it (or
+        start refreshing it in the background) before returning.
         """
         if not self.access_token or self.access_token_expired:
-            if not http:
-                http = transport.get_http_object()
-            self.refresh(http)
+            if http:
+                self.refresh(http)
+            else:
+                with transport.pooled_http(self.token_uri) as http:
+                    self.refresh(http)
+        elif self._refresh_ahead_due():
+            self._refresh_ahead(http)
         return AccessTokenInfo(access_token=self.access_token,
                                expires_in=self._expires_in())
 
+    def set_refresh_ahead(self, seconds, background=False):
+        """Refresh the access_token before it expires.
+
+        Without this, a refresh only happens once the access_token has
+        expired or has been rejected, adding a round trip to the token
+        endpoint (and, in the latter case, a failed request) to the latency
+        of whichever request hits the expiry. With a refresh-ahead margin,
+        :meth:`get_access_token` and the requests made by an authorized
+        ``http`` renew the token once it is within ``seconds`` of its
+        ``token_expiry``.
+
+        The margin should be comfortably smaller than the lifetime of the
+        tokens issued, otherwise every use of the credentials will refresh.
+
+        Args:
+            seconds: int, How long before ``token_expiry`` to refresh. 0
+                     disables refreshing ahead of expiry.
+            background: bool, If True, the refresh is made in a background
+                        thread while the still-valid access_token keeps
+                        being used. Otherwise the caller which notices the
+                        token is about to expire makes the refresh.
+        """
+        self.refresh_ahead_secs = seconds
+        self.refresh_ahead_in_background = background
+
+    def _refresh_ahead_due(self):
+        """True if the access_token is within ``refresh_ahead_secs`` of expiry.
+
+        Always False if refreshing ahead of expiry is disabled, or if the
+        token_expiry isn't set.
+        """
+        if not self.refresh_ahead_secs or not self.token_expiry:
+            return False
+        margin = datetime.timedelta(seconds=self.refresh_ahead_secs)
+        return _UTCNOW() + margin >= self.token_expiry
+
+    def _refresh_ahead(self, http):
+        """Refreshes a still-valid access_token that is about to expire.
+
+        The refresh is coalesced with any other made concurrently. In
+        background mode, it is made by a separate thread (at most one per
+        credentials at a time) with its own HTTP object, and this method
+        returns immediately.
+
+        As the current token is still valid, a failed refresh doesn't mark
+        the credentials invalid, and in the foreground it's only raised if
+        the token has expired meanwhile. Otherwise it's logged, and retried
+        by the next caller.
+
+        Args:
+            http: an object to be used to make HTTP requests if refreshing
+                  in the foreground. If None, one is checked out of the
+                  shared :class:`oauth2client.transport.HttpPool`.
+        """
+        stale_token = self.access_token
+        if not self.refresh_ahead_in_background:
+            try:
+                if http:
+                    self._refresh_if_stale(http, stale_token, ahead=True)
+                else:
+                    with transport.pooled_http(self.token_uri) as http:
+                        self._refresh_if_stale(http, stale_token, ahead=True)
+            except Exception:
+                if self.access_token_expired:
+                    raise
+                logger.warning('Refresh of access_token ahead of expiry '
+                               'failed', exc_info=True)
+            return
+
+        state = _get_refresh_state(self)
+        with _refresh_states_lock:
+            if state.background_refresh is not None:
+                return
+            thread = threading.Thread(target=self._background_refresh,
+                                      args=(state, stale_token))
+            thread.daemon = True
+            state.background_refresh = thread
+        logger.info('Refreshing access_token ahead of expiry in the '
+                    'background')
+        thread.start()
+
+    def _background_refresh(self, state, stale_token):
+        """Target of the thread started by :meth:`_refresh_ahead`.
+
+        Args:
+            state: _RefreshState, the refresh state of these credentials.
+            stale_token: string, the access_token about to expire.
+        """
+        try:
+            with transport.pooled_http(self.token_uri) as http:
+                self._refresh_if_stale(http, stale_token, ahead=True)
+        except Exception:
+            # The current token is still valid; a refresh will be retried
+            # by the next caller, or once the token has expired.
+            logger.warning('Background refresh of access_token failed',
+                           exc_info=True)
+        finally:
+            with _refresh_states_lock:
+                state.background_refresh = None
+
     def set_store(self, store):
         """Set the Storage for the credential.
 
@@ -762,6 +934,46 @@ class OAuth2Credentials(Credentials):
             finally:
                 self.store.release_lock()
 
+    def _refresh_if_stale(self, http, stale_token, ahead=False):
+        """Refreshes the access_token unless another thread already has.
+
+        Refreshes are serialized on a per-credentials lock, so when many
+        threads sharing these credentials hit an expired token only the
+        first one to take the lock makes a request to the token endpoint.
+        The others find that the access_token no longer matches the one
+        they used, skip their refresh and re-use the new token. Skipped
+        refreshes are counted in ``coalesced_refreshes``.
+
+        Args:
+            http: an object to be used to make HTTP requests.
+            stale_token: string, the access_token the caller found to be
+                         missing or rejected, or None.
+            ahead: bool, True if stale_token is still valid and is being
+                   refreshed ahead of its expiry. An error response then
+                   doesn't mark the credentials invalid.
+
+        Returns:
+            bool, True if a refresh was performed, False if it was coalesced
+            with one made by another thread.
+
+        Raises:
+            HttpAccessTokenRefreshError: When the refresh fails.
+        """
+        state = _get_refresh_state(self)
+        with state.lock:
+            if (self.access_token and self.access_token != stale_token and
+                    not self.access_token_expired):
+                state.coalesced_refreshes += 1
+                logger.info('Re-using access_token refreshed by another '
+                            'thread')
+                return False
+            state.refreshing_ahead = ahead
+            try:
+                self._refresh(http)
+            finally:
+                state.refreshing_ahead = False
+            return True
+
     def _do_refresh_request(self, http):
         """Refresh the access_token using the refresh_token.
 
@@ -778,8 +990,27 @@ class OAuth2Credentials(Credentials):
         resp, content = transport.request(
             http, self.token_uri, method='POST',
             body=body, headers=headers)
+        self._handle_refresh_response(
+            resp.status, content,
+            mark_invalid=not _get_refresh_state(self).refreshing_ahead)
+
+    def _handle_refresh_response(self, status, content, mark_invalid=True):
+        """Updates the credentials from a response of the token endpoint.
+
+        Shared by :meth:`_do_refresh_request` and :mod:`oauth2client.aio`,
+        which make the request in different ways.
+
+        Args:
+            status: int, The HTTP status of the response.
+            content: bytes or string, The body of the response.
+            mark_invalid: bool, Whether an error response marks the
+                          credentials invalid.
+
+        Raises:
+            HttpAccessTokenRefreshError: When the refresh fails.
+        """
         content = _helpers._from_bytes(content)
-        if resp.status == http_client.OK:
+        if status == http_client.OK:
             d = json.loads(content)
             self.token_response = d
             self.access_token = d['access_token']
@@ -804,19 +1035,20 @@ class OAuth2Credentials(Credentials):
             # An {'error':...} response body means the token is expired or
             # revoked, so we flag the credentials as such.
             logger.info('Failed to retrieve access token: %s', content)
-            error_msg = 'Invalid response {0}.'.format(resp.status)
+            error_msg = 'Invalid response {0}.'.format(status)
             try:
                 d = json.loads(content)
                 if 'error' in d:
                     error_msg = d['error']
                     if 'error_description' in d:
                         error_msg += ': ' + d['error_description']
-                    self.invalid = True
-                    if self.store is not None:
-                        self.store.locked_put(self)
+                    if mark_invalid:
+                        self.invalid = True
+                        if self.store is not None:
+                            self.store.locked_put(self)
             except (TypeError, ValueError):
                 pass
-            raise HttpAccessTokenRefreshError(error_msg, status=resp.status)
+            raise HttpAccessTokenRefreshError(error_msg, status=status)
 
     def _revoke(self, http):
         """Revokes this credential and deletes the stored copy (if it exists).
@@ -1526,9 +1758,205 @@ def _require_crypto_or_die():
         raise CryptoUnavailableError('No crypto library available')
 
 
+def _fetch_certs(http, cert_uri):
+    """Fetches the certificates used to verify ID tokens.
+
+    Args:
+        http: httplib2.Http, instance to use to make the HTTP request.
+        cert_uri: string, URI of the certificates in JSON format.
+
+    Returns:
+        tuple, The response and the certificates, a dictionary of
+        certificates in PEM format keyed by key ID.
+
+    Raises:
+        VerifyJwtTokenError: if the certificates can't be fetched.
+    """
+    resp, content = transport.request(http, cert_uri)
+    if resp.status != http_client.OK:
+        raise VerifyJwtTokenError('Status code: {0}'.format(resp.status))
+    return resp, json.loads(_helpers._from_bytes(content))
+
+
+def _parse_cache_expiry(resp, now):
+    """Works out until when a response may be cached.
+
+    Honours the ``max-age``, ``no-cache`` and ``no-store`` directives of the
+    ``Cache-Control`` header, falling back to the ``Expires`` header. The
+    ``Expires`` time is taken relative to the response's ``Date``, if any, to
+    be robust to clock skew.
+
+    Args:
+        resp: httplib2.Response, the response.
+        now: datetime, the current UTC time.
+
+    Returns:
+        datetime, the UTC time until which the response is fresh. This is
+        ``now`` if it may not be cached.
+    """
+    directives = {}
+    for directive in resp.get('cache-control', '').split(','):
+        name, _, value = directive.strip().partition('=')
+        directives[name.lower()] = value.strip('"')
+    if 'no-cache' in directives or 'no-store' in directives:
+        return now
+
+    if 'max-age' in directives:
+        try:
+            max_age = int(directives['max-age'])
+            age = int(resp.get('age', 0))
+        except ValueError:
+            return now
+        return now + datetime.timedelta(seconds=max(0, max_age - age))
+
+    expires = email.utils.parsedate_tz(resp.get('expires', ''))
+    if expires is None:
+        return now
+    date = email.utils.parsedate_tz(resp.get('date', ''))
+    if date is None:
+        epoch = datetime.datetime(1970, 1, 1)
+        return epoch + datetime.timedelta(
+            seconds=email.utils.mktime_tz(expires))
+    freshness = email.utils.mktime_tz(expires) - email.utils.mktime_tz(date)
+    return now + datetime.timedelta(seconds=max(0, freshness))
+
+
+_CertificateSnapshot = collections.namedtuple(
+    '_CertificateSnapshot', ['verifiers', 'expiry', 'refresh_at'])
+
+
+class _CertificateStore(object):
+    """Caches the certificates used to verify ID tokens.
+
+    Certificates are fetched once, parsed into verifiers and kept for as long
+    as the response's caching headers allow. Shortly before they expire they
+    are fetched again in a background thread, so that in the steady state
+    verifying a token makes no HTTP request.
+
+    The parsed certificates are held in an immutable snapshot which is
+    swapped out whole when they are fetched again, so reading them takes no
+    lock.
+
+    Args:
+        cert_uri: string, URI of the certificates in JSON format.
+        refresh_ahead_secs: int, How long before the certificates expire to
+                            fetch them again in the background.
+    """
+
+    def __init__(self, cert_uri, refresh_ahead_secs=_CERTS_REFRESH_AHEAD_SECS):
+        self.cert_uri = cert_uri
+        self.refresh_ahead_secs = refresh_ahead_secs
+        self.fetches = 0
+        self._snapshot = None
+        # Held while fetching, so that only one fetch happens at a time.
+        self._fetch_lock = threading.Lock()
+
+    def get_verifiers(self):
+        """Get verifiers for the current certificates, fetching if needed.
+
+        Returns:
+            dict, Verifier objects keyed by key ID.
+
+        Raises:
+            VerifyJwtTokenError: if the certificates can't be fetched.
+        """
+        snapshot = self._snapshot
+        now = _UTCNOW()
+        if snapshot is None or now >= snapshot.expiry:
+            snapshot = self._fetch_if_expired()
+        elif now >= snapshot.refresh_at:
+            self._start_background_fetch()
+        return snapshot.verifiers
+
+    def _fetch_if_expired(self):
+        """Fetches the certificates, unless another thread just did."""
+        with self._fetch_lock:
+            # A failed background fetch replaces the snapshot too, without
+            # renewing it, so check its expiry rather than its identity.
+            snapshot = self._snapshot
+            if snapshot is None or _UTCNOW() >= snapshot.expiry:
+                snapshot = self._snapshot = self._fetch()
+            return snapshot
+
+    def _start_background_fetch(self):
+        """Fetches the certificates in a background thread.
+
+        Does nothing if they are already being fetched.
+        """
+        if not self._fetch_lock.acquire(False):
+            return
+        try:
+            thread = threading.Thread(target=self._background_fetch)
+            thread.daemon = True
+            thread.start()
+        except Exception:
+            self._fetch_lock.release()
+            raise
+
+    def _background_fetch(self):
+        """Target of the background thread. Releases the fetch lock."""
+        try:
+            self._snapshot = self._fetch()
+        except Exception:
+            logger.warning('Failed to fetch certificates from %s, will '
+                           'retry.', self.cert_uri, exc_info=True)
+            snapshot = self._snapshot
+            retry_at = _UTCNOW() + datetime.timedelta(
+                seconds=_CERTS_RETRY_SECS)
+            self._snapshot = snapshot._replace(
+                refresh_at=min(snapshot.expiry, retry_at))
+        finally:
+            self._fetch_lock.release()
+
+    def _fetch(self):
+        """Fetches and parses the certificates.
+
+        Returns:
+            _CertificateSnapshot, the parsed certificates.
+
+        Raises:
+            VerifyJwtTokenError: if the certificates can't be fetched.
+        """
+        with transport.pooled_http(self.cert_uri) as http:
+            resp, certs = _fetch_certs(http, self.cert_uri)
+        verifiers = dict((key_id, crypt._get_verifier(pem))
+                         for key_id, pem in six.iteritems(certs))
+
+        now = _UTCNOW()
+        expiry = _parse_cache_expiry(resp, now)
+        refresh_at = expiry - datetime.timedelta(
+            seconds=self.refresh_ahead_secs)
+        if refresh_at <= now:
+            # Short-lived: refresh half way through the lifetime instead.
+            refresh_at = now + (expiry - now) // 2
+        self.fetches += 1
+        return _CertificateSnapshot(verifiers, expiry, refresh_at)
+
+
+_certificate_stores = {}
+_certificate_stores_lock = threading.Lock()
+
+
+def _get_certificate_store(cert_uri):
+    """Get or create the certificate store shared by all users of cert_uri.
+
+    Args:
+        cert_uri: string, URI of the certificates in JSON format.
+
+    Returns:
+        _CertificateStore, the store for ``cert_uri``.
+    """
+    with _certificate_stores_lock:
+        store = _certificate_stores.get(cert_uri)
+        if store is None:
+            store = _CertificateStore(cert_uri)
+            _certificate_stores[cert_uri] = store
+        return store
+
+
 @_helpers.positional(2)
 def verify_id_token(id_token, audience, http=None,
-                    cert_uri=ID_TOKEN_VERIFICATION_CERTS):
+                    cert_uri=ID_TOKEN_VERIFICATION_CERTS, cache=None):
     """Verifies a signed JWT id_token.
 
     This function requires PyOpenSSL and because of that it does not work on
@@ -1537,10 +1965,17 @@ def verify_id_token(id_token, audience, http=None,
     Args:
         id_token: string, A Signed JWT.
         audience: string, The audience 'aud' that the token should be for.
-        http: httplib2.Http, instance to use to make the HTTP request. Callers
-              should supply an instance that has caching enabled.
+        http: httplib2.Http, (Optional) instance to use to make the HTTP
+              request. Callers should supply an instance that has caching
+              enabled. If not given, the certificates are fetched once and
+              cached for as long as the response's ``Cache-Control`` or
+              ``Expires`` headers allow, and refreshed in the background
+              shortly before they expire.
         cert_uri: string, URI of the certificates in JSON format to
                   verify the JWT against.
+        cache: oauth2client.crypt.VerifiedTokenCache, (Optional) Remembers
+               tokens which verified, so that a token presented again until
+               it expires costs a lookup instead of a signature check.
 
     Returns:
         The deserialized JSON in the JWT.
@@ -1551,14 +1986,53 @@ def verify_id_token(id_token, audience, http=None,
     """
     _require_crypto_or_die()
     if http is None:
-        http = transport.get_cached_http()
+        verifiers = _get_certificate_store(cert_uri).get_verifiers()
+        return crypt._verify_signed_jwt_with_verifiers(
+            id_token, verifiers, audience, cache=cache)
 
-    resp, content = transport.request(http, cert_uri)
-    if resp.status == http_client.OK:
-        certs = json.loads(_helpers._from_bytes(content))
-        return crypt.verify_signed_jwt_with_certs(id_token, certs, audience)
-    else:
-        raise VerifyJwtTokenError('Status code: {0}'.format(resp.status))
+    _, certs = _fetch_certs(http, cert_uri)
+    return crypt.verify_signed_jwt_with_certs(id_token, certs, audience,
+                                              cache=cache)
+
+
+@_helpers.positional(2)
+def verify_id_tokens(id_tokens, audience, http=None,
+                     cert_uri=ID_TOKEN_VERIFICATION_CERTS, executor=None):
+    """Verifies many signed JWT id_tokens at once.
+
+    The certificates are fetched and parsed once for the whole batch, and
+    each token is only checked against the certificate named by its key ID.
+
+    Args:
+        id_tokens: iterable, Signed JWTs.
+        audience: string, The audience 'aud' that the tokens should be for.
+        http: httplib2.Http, (Optional) instance to use to make the HTTP
+              request. If not given, cached certificates are used as in
+              :func:`verify_id_token`.
+        cert_uri: string, URI of the certificates in JSON format to
+                  verify the JWTs against.
+        executor: object, (Optional) An executor with a ``map`` method, such
+                  as a ``concurrent.futures.ThreadPoolExecutor``, to spread
+                  signature checks across.
+
+    Returns:
+        list, A :data:`oauth2client.crypt.JwtVerificationResult` for each
+        token, in order, holding either the deserialized JSON in the JWT or
+        the ``oauth2client.crypt.AppIdentityError`` it failed with.
+
+    Raises:
+        VerifyJwtTokenError: if the certificates can't be fetched.
+        CryptoUnavailableError: if no crypto library is available.
+    """
+    _require_crypto_or_die()
+    if http is None:
+        verifiers = _get_certificate_store(cert_uri).get_verifiers()
+        return crypt._verify_signed_jwts_with_verifiers(
+            id_tokens, verifiers, audience=audience, executor=executor)
+
+    _, certs = _fetch_certs(http, cert_uri)
+    return crypt.verify_signed_jwts_with_certs(
+        id_tokens, certs, audience=audience, executor=executor)
 
 
 def _extract_id_token(id_token):
@@ -1963,10 +2437,14 @@ class OAuth2WebServerFlow(Flow):
             headers['user-agent'] = self.user_agent
 
         if http is None:
-            http = transport.get_http_object()
-
-        resp, content = transport.request(
-            http, self.device_uri, method='POST', body=body, headers=headers)
+            with transport.pooled_http(self.device_uri) as http:
+                resp, content = transport.request(
+                    http, self.device_uri, method='POST', body=body,
+                    headers=headers)
+        else:
+            resp, content = transport.request(
+                http, self.device_uri, method='POST', body=body,
+                headers=headers)
         content = _helpers._from_bytes(content)
         if resp.status == http_client.OK:
             try:
@@ -2048,10 +2526,14 @@ class OAuth2WebServerFlow(Flow):
             headers['user-agent'] = self.user_agent
 
         if http is None:
-            http = transport.get_http_object()
-
-        resp, content = transport.request(
-            http, self.token_uri, method='POST', body=body, headers=headers)
+            with transport.pooled_http(self.token_uri) as http:
+                resp, content = transport.request(
+                    http, self.token_uri, method='POST', body=body,
+                    headers=headers)
+        else:
+            resp, content = transport.request(
+                http, self.token_uri, method='POST', body=body,
+                headers=headers)
         d = _parse_exchange_token_response(content)
         if resp.status == http_client.OK and 'access_token' in d:
             access_token = d['access_token']
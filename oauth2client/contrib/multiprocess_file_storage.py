@@ -73,15 +73,26 @@ To retrieve the credentials::
 
     storage.get(credentials)
 
+Every storage of a file shares its interprocess lock, so processes refreshing
+credentials of different keys wait for each other. With many keys, use
+:class:`ShardedMultiprocessFileStorage` to spread them over several files,
+each with its own lock::
+
+    storage = ShardedMultiprocessFileStorage(filename, key)
+
 """
 
 import base64
+import binascii
+import hashlib
 import json
 import logging
 import os
+import struct
 import threading
 
 import fasteners
+import six
 from six import iteritems
 
 from oauth2client import _helpers
@@ -92,11 +103,43 @@ from oauth2client import client
 #: interprocess lock before falling back to read-only mode.
 INTERPROCESS_LOCK_DEADLINE = 1
 
+#: The number of records in a credentials file below which it's never
+#: compacted. Above it, the file is compacted once most of its records have
+#: been superseded.
+COMPACTION_MIN_RECORDS = 100
+
+#: The default number of files :class:`ShardedMultiprocessFileStorage`
+#: spreads credentials over.
+DEFAULT_NUM_SHARDS = 16
+
+_FILE_VERSION = 3
+
 logger = logging.getLogger(__name__)
 _backends = {}
 _backends_lock = threading.Lock()
 
 
+def _replace_file(source, destination):
+    """Atomically renames a file over another."""
+    replace = getattr(os, 'replace', None)
+    if replace is None:  # pragma: NO COVER
+        # Python 2, where rename only replaces files on POSIX.
+        replace = os.rename
+    replace(source, destination)
+
+
+def _file_signature(file_):
+    """Identifies the contents of an open file without reading them.
+
+    Records are only appended to a file, which changes its size, and it's
+    only rewritten by renaming a new file over it, which changes its inode,
+    so an unchanged signature means unchanged contents.
+    """
+    stat = os.fstat(file_.fileno())
+    mtime = getattr(stat, 'st_mtime_ns', stat.st_mtime)
+    return stat.st_dev, stat.st_ino, stat.st_size, mtime
+
+
 def _create_file_if_needed(filename):
     """Creates the an empty file if it does not already exist.
 
@@ -112,78 +155,61 @@ def _create_file_if_needed(filename):
         return True
 
 
-def _load_credentials_file(credentials_file):
-    """Load credentials from the given file handle.
+def _encode_credential(credential):
+    """Serializes a credential as base64-encoded JSON."""
+    return _helpers._from_bytes(base64.b64encode(
+        _helpers._to_bytes(credential.to_json())))
 
-    The file is expected to be in this format:
 
-        {
-            "file_version": 2,
-            "credentials": {
-                "key": "base64 encoded json representation of credentials."
-            }
-        }
+def _decode_credential(encoded_credential):
+    """Inverse of :func:`_encode_credential`."""
+    return client.Credentials.new_from_json(
+        base64.b64decode(encoded_credential))
 
-    This function will warn and return empty credentials instead of raising
-    exceptions.
 
-    Args:
-        credentials_file: An open file handle.
+def _make_header(generation):
+    """Makes the first line of a credentials file.
 
-    Returns:
-        A dictionary mapping user-defined keys to an instance of
-        :class:`oauth2client.client.Credentials`.
+    Args:
+        generation: string, Changes whenever the file is rewritten, so that
+                    processes which have read part of the file know to read
+                    it again from the start.
     """
-    try:
-        credentials_file.seek(0)
-        data = json.load(credentials_file)
-    except Exception:
-        logger.warning(
-            'Credentials file could not be loaded, will ignore and '
-            'overwrite.')
-        return {}
-
-    if data.get('file_version') != 2:
-        logger.warning(
-            'Credentials file is not version 2, will ignore and '
-            'overwrite.')
-        return {}
-
-    credentials = {}
-
-    for key, encoded_credential in iteritems(data.get('credentials', {})):
-        try:
-            credential_json = base64.b64decode(encoded_credential)
-            credential = client.Credentials.new_from_json(credential_json)
-            credentials[key] = credential
-        except:
-            logger.warning(
-                'Invalid credential {0} in file, ignoring.'.format(key))
+    return _helpers._to_bytes(json.dumps({
+        'file_version': _FILE_VERSION,
+        'generation': generation,
+    }) + '\n')
 
-    return credentials
 
-
-def _write_credentials_file(credentials_file, credentials):
-    """Writes credentials to a file.
-
-    Refer to :func:`_load_credentials_file` for the format.
+def _make_record(key, encoded_credential):
+    """Makes a line recording the credential of a key.
 
     Args:
-        credentials_file: An open file handle, must be read/write.
-        credentials: A dictionary mapping user-defined keys to an instance of
-            :class:`oauth2client.client.Credentials`.
+        key: string, The key of the credential.
+        encoded_credential: string, The credential as returned by
+                            :func:`_encode_credential`, or None if the
+                            credential was deleted.
     """
-    data = {'file_version': 2, 'credentials': {}}
+    if encoded_credential is None:
+        record = {'key': key, 'deleted': True}
+    else:
+        record = {'key': key, 'credential': encoded_credential}
+    return _helpers._to_bytes(json.dumps(record) + '\n')
 
-    for key, credential in iteritems(credentials):
-        credential_json = credential.to_json()
-        encoded_credential = _helpers._from_bytes(base64.b64encode(
-            _helpers._to_bytes(credential_json)))
-        data['credentials'][key] = encoded_credential
 
-    credentials_file.seek(0)
-    json.dump(data, credentials_file)
-    credentials_file.truncate()
+def _parse_json_line(line):
+    """Parses a line of a credentials file as a JSON object.
+
+    Returns:
+        dict, the object, or None if the line isn't a JSON object.
+    """
+    try:
+        data = json.loads(_helpers._from_bytes(line))
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    return data
 
 
 class _MultiprocessStorageBackend(object):
@@ -192,6 +218,26 @@ class _MultiprocessStorageBackend(object):
     Each process has only one instance of this backend per file. All threads
     share a single instance of this backend. This ensures that all threads
     use the same thread lock and process lock when accessing the file.
+
+    The file is an append-only log. Its first line is a header::
+
+        {"file_version": 3, "generation": "<random hex>"}
+
+    and each following line records the credential of one key, superseding
+    any earlier record of that key::
+
+        {"key": "key", "credential": "<base64 encoded json of credential>"}
+        {"key": "key", "deleted": true}
+
+    Writing a credential appends one record while holding the interprocess
+    lock, and the backend remembers how far it has read the file, so each
+    lock cycle only reads the records other processes have appended since.
+    Once superseded records outnumber the live ones, the file is compacted:
+    rewritten to a temporary file with a new generation, which is renamed
+    over it.
+
+    Version 2 files, a single JSON object mapping keys to credentials, are
+    read, and rewritten in the new format on the next write.
     """
 
     def __init__(self, filename):
@@ -201,47 +247,281 @@ class _MultiprocessStorageBackend(object):
             '{0}.lock'.format(filename))
         self._thread_lock = threading.Lock()
         self._read_only = False
+        # Credentials are only decoded from the file when their key is
+        # requested. _decoded_from maps the key of each decoded credential
+        # to the encoded credential it was decoded from (or which it
+        # supersedes, if it was put in this process), so it's decoded again
+        # only if the file has changed since.
         self._credentials = {}
+        self._decoded_from = {}
+        # Keys of credentials put while in read-only mode, which are only
+        # kept in memory until they're written to the file.
+        self._unsaved = set()
+        # The file as of the last read: the generation of its header, the
+        # offset up to which it has been read, the number of records read
+        # and the latest encoded credential of each key.
+        self._generation = None
+        self._offset = 0
+        self._num_records = 0
+        self._encoded_credentials = {}
+        # Whether the file needs rewriting before records can be appended,
+        # e.g. because it's empty or in an older format.
+        self._needs_rewrite = True
+        # The signature of the file when it was last read or written, to skip
+        # reading it if it hasn't changed since.
+        self._signature = None
+        self.reloads = 0
+        self.skipped_reloads = 0
+
+    def _read_header(self):
+        """Reads the header of the file.
+
+        Returns:
+            tuple, the parsed header (None if it's missing or invalid) and
+            the offset after it.
+        """
+        self._file.seek(0)
+        # A version 2 file is a single line, so this reads all of it.
+        line = self._file.readline()
+        return _parse_json_line(line), len(line)
+
+    def _reset(self):
+        """Forgets what was read of the file, to read it from the start."""
+        self._generation = None
+        self._offset = 0
+        self._num_records = 0
+        self._encoded_credentials = {}
+        self._needs_rewrite = True
+
+    def _forget(self, key):
+        """Forgets the decoded credential of a key."""
+        self._credentials.pop(key, None)
+        self._decoded_from.pop(key, None)
+        self._unsaved.discard(key)
+
+    def _forget_missing(self):
+        """Forgets credentials no longer in the file after reading it again.
+
+        Credentials deleted by another process may have been compacted away
+        without this process reading their deletion records.
+        """
+        for key in list(self._credentials):
+            if (key not in self._encoded_credentials and
+                    key not in self._unsaved):
+                self._forget(key)
+
+    def _apply_record(self, key, encoded_credential):
+        """Updates the credential of a key from a record of the file."""
+        if encoded_credential is None:
+            self._encoded_credentials.pop(key, None)
+            self._forget(key)
+        else:
+            self._encoded_credentials[key] = encoded_credential
+
+    def _get_credential(self, key):
+        """Gets the credential of a key, decoding it from the file if needed.
+        """
+        encoded_credential = self._encoded_credentials.get(key)
+        if encoded_credential is None:
+            if key in self._unsaved:
+                return self._credentials[key]
+            return None
+        if self._decoded_from.get(key) == encoded_credential:
+            return self._credentials.get(key)
+        try:
+            credential = _decode_credential(encoded_credential)
+        except:
+            logger.warning(
+                'Invalid credential {0} in file, ignoring.'.format(key))
+            del self._encoded_credentials[key]
+            if key in self._unsaved:
+                return self._credentials[key]
+            self._forget(key)
+            return None
+        self._credentials[key] = credential
+        self._decoded_from[key] = encoded_credential
+        self._unsaved.discard(key)
+        return credential
+
+    def _load_version_2(self, data):
+        credentials = data.get('credentials', {})
+        if not isinstance(credentials, dict):
+            logger.warning(
+                'Credentials file could not be loaded, will ignore and '
+                'overwrite.')
+            return
+        for key, encoded_credential in iteritems(credentials):
+            if not isinstance(encoded_credential, six.string_types):
+                logger.warning(
+                    'Invalid credential {0} in file, ignoring.'.format(key))
+                continue
+            self._apply_record(key, encoded_credential)
+
+    def _start_reading(self, header, header_end):
+        """Reads the file from the start, after forgetting what was read.
+
+        Returns:
+            bool, whether the records following the header should be read.
+        """
+        self._reset()
+        if header is None:
+            if header_end:
+                logger.warning(
+                    'Credentials file could not be loaded, will ignore '
+                    'and overwrite.')
+            return False
+        file_version = header.get('file_version')
+        if file_version == 2:
+            self._load_version_2(header)
+            logger.debug('Read version 2 credential file')
+            return False
+        if file_version != _FILE_VERSION:
+            logger.warning(
+                'Credentials file is not version {0}, will ignore and '
+                'overwrite.'.format(_FILE_VERSION))
+            return False
+        if not isinstance(header.get('generation'), six.string_types):
+            logger.warning(
+                'Credentials file has an invalid header, will ignore and '
+                'overwrite.')
+            return False
+        self._generation = header['generation']
+        self._offset = header_end
+        self._needs_rewrite = False
+        return True
 
     def _load_credentials(self):
-        """(Re-)loads the credentials from the file."""
+        """Loads the credentials written to the file since the last load."""
         if not self._file:
             return
 
-        loaded_credentials = _load_credentials_file(self._file)
-        self._credentials.update(loaded_credentials)
+        signature = _file_signature(self._file)
+        if signature == self._signature:
+            self.skipped_reloads += 1
+            return
+        self.reloads += 1
+        self._signature = signature
+
+        header, header_end = self._read_header()
+        if (self._generation is None or header is None or
+                header.get('generation') != self._generation):
+            if self._start_reading(header, header_end):
+                self._read_records()
+            self._forget_missing()
+        else:
+            self._read_records()
+
+    def _read_records(self):
+        """Reads the records appended since the file was last read."""
+        self._file.seek(self._offset)
+        lines = self._file.read().split(b'\n')
+        # The last piece is empty, or a record still being written (or left
+        # partially written by a crash), so isn't read yet.
+        for line in lines[:-1]:
+            self._offset += len(line) + 1
+            self._num_records += 1
+            record = _parse_json_line(line)
+            if (record is None or
+                    not isinstance(record.get('key'), six.string_types) or
+                    not isinstance(record.get('credential', ''),
+                                   six.string_types)):
+                logger.warning('Invalid record in credentials file, '
+                               'ignoring.')
+                continue
+            self._apply_record(record['key'], record.get('credential'))
+        if lines[-1] and not self._read_only:
+            # No other process is writing, so the record is garbage.
+            self._needs_rewrite = True
 
         logger.debug('Read credential file')
 
-    def _write_credentials(self):
+    def _compact(self):
+        """Rewrites the file with only the latest record of each key."""
+        generation = _helpers._from_bytes(
+            binascii.hexlify(os.urandom(8)))
+        temp_filename = '{0}.tmp'.format(self._filename)
+        with open(temp_filename, 'wb') as temp_file:
+            temp_file.write(_make_header(generation))
+            for key, encoded_credential in iteritems(
+                    self._encoded_credentials):
+                temp_file.write(_make_record(key, encoded_credential))
+        self._file.close()
+        _replace_file(temp_filename, self._filename)
+        self._file = open(self._filename, 'r+b')
+        self._signature = _file_signature(self._file)
+
+        self._file.seek(0, os.SEEK_END)
+        self._offset = self._file.tell()
+        self._generation = generation
+        self._num_records = len(self._encoded_credentials)
+        self._needs_rewrite = False
+        logger.debug('Compacted credential file {0}.'.format(self._filename))
+
+    def _write_record(self, key, encoded_credential):
+        """Records the credential of a key in the file.
+
+        Args:
+            key: string, The key of the credential.
+            encoded_credential: string, The encoded credential, or None to
+                                record that it was deleted.
+        """
         if self._read_only:
             logger.debug('In read-only mode, not writing credentials.')
             return
 
-        _write_credentials_file(self._file, self._credentials)
+        if encoded_credential is None:
+            self._encoded_credentials.pop(key, None)
+        else:
+            self._encoded_credentials[key] = encoded_credential
+
+        if self._needs_rewrite:
+            self._compact()
+            return
+
+        record = _make_record(key, encoded_credential)
+        self._file.seek(self._offset)
+        self._file.write(record)
+        self._file.flush()
+        self._offset += len(record)
+        self._num_records += 1
+        self._signature = _file_signature(self._file)
         logger.debug('Wrote credential file {0}.'.format(self._filename))
 
+        num_superseded = self._num_records - len(self._encoded_credentials)
+        if (self._num_records >= COMPACTION_MIN_RECORDS and
+                num_superseded > len(self._encoded_credentials)):
+            self._compact()
+
     def acquire_lock(self):
         self._thread_lock.acquire()
-        locked = self._process_lock.acquire(timeout=INTERPROCESS_LOCK_DEADLINE)
+        try:
+            locked = self._process_lock.acquire(
+                timeout=INTERPROCESS_LOCK_DEADLINE)
+        except:
+            self._thread_lock.release()
+            raise
+        self._read_only = not locked
 
-        if locked:
-            _create_file_if_needed(self._filename)
-            self._file = open(self._filename, 'r+')
-            self._read_only = False
+        # Don't leave the locks held if the file can't be opened or read.
+        try:
+            if locked:
+                _create_file_if_needed(self._filename)
+                self._file = open(self._filename, 'r+b')
 
-        else:
-            logger.warn(
-                'Failed to obtain interprocess lock for credentials. '
-                'If a credential is being refreshed, other processes may '
-                'not see the updated access token and refresh as well.')
-            if os.path.exists(self._filename):
-                self._file = open(self._filename, 'r')
             else:
-                self._file = None
-            self._read_only = True
+                logger.warn(
+                    'Failed to obtain interprocess lock for credentials. '
+                    'If a credential is being refreshed, other processes may '
+                    'not see the updated access token and refresh as well.')
+                if os.path.exists(self._filename):
+                    self._file = open(self._filename, 'rb')
+                else:
+                    self._file = None
 
-        self._load_credentials()
+            self._load_credentials()
+        except:
+            self.release_lock()
+            raise
 
     def release_lock(self):
         if self._file is not None:
@@ -265,28 +545,33 @@ class _MultiprocessStorageBackend(object):
 
     def locked_get(self, key):
         # Check if the credential is already in memory.
-        credentials = self._credentials.get(key, None)
+        credentials = self._get_credential(key)
 
-        # Use the refresh predicate to determine if the entire store should be
+        # Use the refresh predicate to determine if the store should be
         # reloaded. This basically checks if the credentials are invalid
         # or expired. This covers the situation where another process has
         # refreshed the credentials and this process doesn't know about it yet.
         # In that case, this process won't needlessly refresh the credentials.
         if self._refresh_predicate(credentials):
             self._load_credentials()
-            credentials = self._credentials.get(key, None)
+            credentials = self._get_credential(key)
 
         return credentials
 
     def locked_put(self, key, credentials):
         self._load_credentials()
         self._credentials[key] = credentials
-        self._write_credentials()
+        self._write_record(key, _encode_credential(credentials))
+        self._decoded_from[key] = self._encoded_credentials.get(key)
+        if self._read_only:
+            self._unsaved.add(key)
+        else:
+            self._unsaved.discard(key)
 
     def locked_delete(self, key):
         self._load_credentials()
-        self._credentials.pop(key, None)
-        self._write_credentials()
+        self._forget(key)
+        self._write_record(key, None)
 
 
 def _get_backend(filename):
@@ -322,6 +607,19 @@ class MultiprocessFileStorage(client.Storage):
         self._key = key
         self._backend = _get_backend(filename)
 
+    @property
+    def reloads(self):
+        """The number of times this process has read the file.
+
+        Counts are shared by all storages of the same file.
+        """
+        return self._backend.reloads
+
+    @property
+    def skipped_reloads(self):
+        """The number of reads skipped because the file hadn't changed."""
+        return self._backend.skipped_reloads
+
     def acquire_lock(self):
         self._backend.acquire_lock()
 
@@ -353,3 +651,44 @@ class MultiprocessFileStorage(client.Storage):
     def locked_delete(self):
         """Deletes the current credentials from the store."""
         return self._backend.locked_delete(self._key)
+
+
+def _shard_filename(filename, key, num_shards):
+    """Gets the name of the shard file storing the credential of a key.
+
+    The shard is picked by hashing the key, rather than with ``hash``, so
+    that every process picks the same one.
+    """
+    digest = hashlib.sha256(_helpers._to_bytes(key)).digest()
+    shard = struct.unpack('>I', digest[:4])[0] % num_shards
+    return '{0}.{1}'.format(filename, shard)
+
+
+class ShardedMultiprocessFileStorage(MultiprocessFileStorage):
+    """Multiprocess file credential storage, sharded by key.
+
+    Stores each credential in one of ``num_shards`` files, named
+    ``<filename>.<shard>``, picked by hashing its key. Each file has its own
+    interprocess lock, so processes refreshing credentials stored in
+    different files don't wait for each other.
+
+    All processes sharing the files must use the same ``num_shards``;
+    changing it moves credentials to other files, where they won't be found
+    until they're stored again.
+
+    Args:
+      filename: The path prefix of the files where credentials will be
+          stored.
+      key: An arbitrary string used to uniquely identify this set of
+          credentials.
+      num_shards: The number of files to spread credentials over.
+
+    Raises:
+      ValueError: If num_shards is less than 1.
+    """
+    def __init__(self, filename, key, num_shards=DEFAULT_NUM_SHARDS):
+        if num_shards < 1:
+            raise ValueError(
+                'num_shards must be at least 1, got {0}'.format(num_shards))
+        super(ShardedMultiprocessFileStorage, self).__init__(
+            _shard_filename(filename, key, num_shards), key)
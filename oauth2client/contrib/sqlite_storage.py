@@ -0,0 +1,213 @@
+# Copyright 2016 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""SQLite credential storage.
+
+This module provides :class:`SQLiteStorage`, which stores credentials in a
+local SQLite database, one row per key, and can be shared by many processes.
+
+The database is used in write-ahead logging (WAL) mode, so processes reading
+credentials don't block, or get blocked by, a process writing one. Writes
+only touch the row of the credential being stored.
+
+No lock is held across processes. Instead, storing credentials is a
+compare-and-swap: when credentials are refreshed, they're read from the
+database (as in :meth:`oauth2client.client.OAuth2Credentials._refresh`)
+and the refreshed credentials are only written if the row hasn't been
+written by another process since. If it has, the other process refreshed
+them concurrently, and its credentials are kept. Within a process, storages
+hold a thread lock while refreshing, as :class:`oauth2client.file.Storage`
+does.
+
+Usage
+=====
+
+Create an instance of :class:`SQLiteStorage` for each credential you want to
+store, keyed as you would a
+:class:`oauth2client.contrib.multiprocess_file_storage.MultiprocessFileStorage`::
+
+    storage = SQLiteStorage('credentials.db', key)
+    storage.put(credentials)
+    credentials.set_store(storage)
+
+    credentials = storage.get()
+
+"""
+
+import binascii
+import logging
+import os
+import sqlite3
+import threading
+
+from oauth2client import _helpers
+from oauth2client import client
+
+
+#: The maximum amount of time, in seconds, to wait for another process to
+#: finish writing to the database.
+DEFAULT_TIMEOUT = 5
+
+_CREATE_TABLE = (
+    'CREATE TABLE IF NOT EXISTS credentials ('
+    'key TEXT PRIMARY KEY NOT NULL, '
+    'credential TEXT NOT NULL, '
+    'version TEXT NOT NULL)')
+_SELECT = 'SELECT credential, version FROM credentials WHERE key = ?'
+_INSERT = (
+    'INSERT OR IGNORE INTO credentials (key, credential, version) '
+    'VALUES (?, ?, ?)')
+_UPDATE = (
+    'UPDATE credentials SET credential = ?, version = ? '
+    'WHERE key = ? AND version = ?')
+_UPSERT = (
+    'INSERT OR REPLACE INTO credentials (key, credential, version) '
+    'VALUES (?, ?, ?)')
+_DELETE = 'DELETE FROM credentials WHERE key = ?'
+
+# Marks a row that was read but doesn't exist.
+_MISSING = object()
+
+logger = logging.getLogger(__name__)
+# SQLite connections can't be shared between threads, or with forked
+# processes, so each thread has its own connection to each database.
+_local = threading.local()
+
+
+def _new_version():
+    """Makes a version for a row, unique across processes and writes."""
+    return _helpers._from_bytes(binascii.hexlify(os.urandom(8)))
+
+
+def _connect(filename, timeout):
+    """Opens a connection to a database, creating it if needed."""
+    connection = sqlite3.connect(
+        filename, timeout=timeout, isolation_level=None)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.execute(_CREATE_TABLE)
+    return connection
+
+
+def _get_connection(filename, timeout):
+    """Gets the current thread's connection to a database.
+
+    Args:
+        filename: string, The absolute path of the database.
+        timeout: float, The busy timeout of new connections.
+
+    Returns:
+        sqlite3.Connection, in autocommit mode.
+    """
+    pid = os.getpid()
+    if getattr(_local, 'pid', None) != pid:
+        # The connections of the parent process mustn't be used after fork.
+        _local.pid = pid
+        _local.connections = {}
+    connection = _local.connections.get(filename)
+    if connection is None:
+        connection = _connect(filename, timeout)
+        _local.connections[filename] = connection
+    return connection
+
+
+class SQLiteStorage(client.Storage):
+    """Store and retrieve a single credential in a SQLite database.
+
+    Args:
+        filename: string, The path of the database.
+        key: string, An arbitrary string used to uniquely identify this set
+             of credentials.
+        timeout: float, The maximum amount of time, in seconds, to wait for
+                 another process to finish writing to the database.
+    """
+
+    def __init__(self, filename, key, timeout=DEFAULT_TIMEOUT):
+        super(SQLiteStorage, self).__init__(lock=threading.Lock())
+        self._filename = os.path.abspath(filename)
+        self._key = key
+        self._timeout = timeout
+        # The version of the row read in the current lock cycle, to compare
+        # against when writing it.
+        self._read_version = None
+
+    def _connection(self):
+        return _get_connection(self._filename, self._timeout)
+
+    def acquire_lock(self):
+        super(SQLiteStorage, self).acquire_lock()
+        self._read_version = None
+
+    def release_lock(self):
+        self._read_version = None
+        super(SQLiteStorage, self).release_lock()
+
+    def locked_get(self):
+        """Retrieves the current credentials from the database.
+
+        Returns:
+            An instance of :class:`oauth2client.client.Credentials` or `None`.
+        """
+        row = self._connection().execute(_SELECT, (self._key,)).fetchone()
+        if row is None:
+            self._read_version = _MISSING
+            return None
+
+        content, self._read_version = row
+        try:
+            credentials = client.Credentials.new_from_json(content)
+        except (AttributeError, ImportError, KeyError, TypeError, ValueError):
+            # Not JSON, or not a serialized Credentials subclass.
+            logger.warning(
+                'Invalid credential {0} in database, ignoring.'.format(
+                    self._key))
+            return None
+        credentials.set_store(self)
+        return credentials
+
+    def locked_put(self, credentials):
+        """Writes the given credentials to the database.
+
+        If the credentials were read in the current lock cycle, they're only
+        written if no other process has written them since.
+
+        Args:
+            credentials: an instance of
+                :class:`oauth2client.client.Credentials`.
+        """
+        content = credentials.to_json()
+        version = _new_version()
+        connection = self._connection()
+        if self._read_version is None:
+            connection.execute(_UPSERT, (self._key, content, version))
+        else:
+            if self._read_version is _MISSING:
+                cursor = connection.execute(
+                    _INSERT, (self._key, content, version))
+            else:
+                cursor = connection.execute(
+                    _UPDATE,
+                    (content, version, self._key, self._read_version))
+            if cursor.rowcount == 0:
+                logger.info(
+                    'Credential {0} was written by another process, keeping '
+                    'its value.'.format(self._key))
+                return
+        # Further writes in this lock cycle replace this one.
+        self._read_version = version
+
+    def locked_delete(self):
+        """Deletes the current credentials from the database."""
+        self._connection().execute(_DELETE, (self._key,))
+        self._read_version = _MISSING
@@ -0,0 +1,337 @@
+# Copyright 2016 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Background refreshing of long-lived credentials.
+
+This module provides :class:`TokenRefresher`, which keeps a set of
+credentials fresh from a background thread so that the threads making
+requests never have to wait on the token endpoint.
+
+Each credential is scheduled to be refreshed ``refresh_ahead_secs`` before
+its ``token_expiry``, minus a random jitter so that credentials issued at
+the same time don't all hit the token endpoint at once. Failed refreshes
+are retried with exponential backoff.
+
+Usage
+=====
+
+Create a refresher, add the credentials to keep fresh and start it::
+
+    refresher = TokenRefresher()
+    refresher.add(service_account_credentials)
+    refresher.add(gce.AppAssertionCredentials())
+    refresher.start()
+
+The credentials can then be used as usual, for example with
+``credentials.authorize(http)``. To monitor the refresher, use
+:meth:`TokenRefresher.next_refresh_times` and
+:meth:`TokenRefresher.failure_counts`. When done::
+
+    refresher.stop()
+
+"""
+
+import datetime
+import heapq
+import itertools
+import logging
+import random
+import threading
+
+from oauth2client import client
+from oauth2client import transport
+
+
+#: The default number of seconds before a token expires to refresh it.
+DEFAULT_REFRESH_AHEAD_SECS = 300
+#: The default maximum random number of seconds to refresh tokens earlier.
+DEFAULT_JITTER_SECS = 30
+#: The default delay, in seconds, before retrying a failed refresh.
+DEFAULT_MIN_BACKOFF_SECS = 1
+#: The default maximum delay, in seconds, between retries of failed
+#: refreshes.
+DEFAULT_MAX_BACKOFF_SECS = 300
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry(object):
+    """Scheduling state for one credential."""
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self.refresh_at = None
+        self.failures = 0
+
+
+class TokenRefresher(object):
+    """Keeps credentials fresh from a background thread.
+
+    Args:
+        credentials: iterable, (Optional) The
+                     :class:`oauth2client.client.Credentials` to keep fresh.
+                     More can be added later with :meth:`add`.
+        refresh_ahead_secs: int, How long before a token expires to
+                            refresh it.
+        jitter_secs: int, Refreshes are made up to this many seconds
+                     earlier, chosen at random for each refresh.
+        min_backoff_secs: int, The delay before retrying a failed refresh.
+                          It doubles with each consecutive failure.
+        max_backoff_secs: int, The maximum delay between retries of a failed
+                          refresh.
+        http_factory: callable, Returns the HTTP object to use for a
+                      refresh. By default, HTTP objects are checked out of
+                      the shared :class:`oauth2client.transport.HttpPool`.
+    """
+
+    def __init__(self, credentials=(),
+                 refresh_ahead_secs=DEFAULT_REFRESH_AHEAD_SECS,
+                 jitter_secs=DEFAULT_JITTER_SECS,
+                 min_backoff_secs=DEFAULT_MIN_BACKOFF_SECS,
+                 max_backoff_secs=DEFAULT_MAX_BACKOFF_SECS,
+                 http_factory=None):
+        self._refresh_ahead_secs = refresh_ahead_secs
+        self._jitter_secs = jitter_secs
+        self._min_backoff_secs = min_backoff_secs
+        self._max_backoff_secs = max_backoff_secs
+        self._http_factory = http_factory
+        self._condition = threading.Condition()
+        # Heap of (refresh_at, sequence number, entry). Entries which have
+        # been rescheduled or removed are left in the heap and skipped.
+        self._heap = []
+        self._counter = itertools.count()
+        self._entries = {}
+        self._thread = None
+        self._stopping = False
+        for creds in credentials:
+            self.add(creds)
+
+    def add(self, credentials):
+        """Start keeping credentials fresh.
+
+        Credentials without an access_token are refreshed right away,
+        others shortly before their ``token_expiry``. Credentials which
+        don't expire are not refreshed.
+
+        Args:
+            credentials: :class:`oauth2client.client.Credentials`, the
+                         credentials to keep fresh.
+        """
+        with self._condition:
+            if credentials in self._entries:
+                return
+            entry = _Entry(credentials)
+            self._entries[credentials] = entry
+            self._schedule(entry, self._next_refresh_time(credentials))
+
+    def remove(self, credentials):
+        """Stop keeping credentials fresh.
+
+        Args:
+            credentials: :class:`oauth2client.client.Credentials`, the
+                         credentials previously passed to :meth:`add`.
+        """
+        with self._condition:
+            entry = self._entries.pop(credentials, None)
+            if entry is not None:
+                entry.refresh_at = None
+
+    def next_refresh_times(self):
+        """Get when each credential will next be refreshed.
+
+        Returns:
+            dict, mapping each credential to the UTC datetime of its next
+            refresh, or None if it is not scheduled to be refreshed.
+        """
+        with self._condition:
+            return dict((creds, entry.refresh_at)
+                        for creds, entry in self._entries.items())
+
+    def failure_counts(self):
+        """Get the number of consecutive failed refreshes of each credential.
+
+        Returns:
+            dict, mapping each credential to the number of times in a row
+            refreshing it has failed. Reset to 0 by a successful refresh.
+        """
+        with self._condition:
+            return dict((creds, entry.failures)
+                        for creds, entry in self._entries.items())
+
+    def start(self):
+        """Start refreshing credentials in a background (daemon) thread."""
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the background thread, waiting for it to exit.
+
+        Args:
+            timeout: float, (Optional) The maximum number of seconds to wait
+                     for an in-progress refresh to finish.
+        """
+        with self._condition:
+            thread = self._thread
+            if thread is None:
+                return
+            self._stopping = True
+            self._condition.notify()
+        thread.join(timeout)
+        with self._condition:
+            self._thread = None
+
+    def refresh_due(self):
+        """Refresh all credentials whose refresh time has passed.
+
+        This is called by the background thread, but can also be called
+        directly to drive the refresher from an existing event loop.
+
+        Returns:
+            int, The number of credentials refreshed (successfully or not).
+        """
+        refreshed = 0
+        entry = self._pop_due()
+        while entry is not None:
+            self._refresh(entry)
+            refreshed += 1
+            entry = self._pop_due()
+        return refreshed
+
+    def _run(self):
+        """Target of the background thread."""
+        while True:
+            with self._condition:
+                while not self._stopping:
+                    wait_secs = self._secs_until_next_refresh()
+                    if wait_secs is not None and wait_secs <= 0:
+                        break
+                    self._condition.wait(wait_secs)
+                if self._stopping:
+                    return
+            self.refresh_due()
+
+    def _secs_until_next_refresh(self):
+        """Seconds until the next refresh, or None if none is scheduled.
+
+        Must be called with the condition held.
+        """
+        while self._heap:
+            refresh_at, _, entry = self._heap[0]
+            if entry.refresh_at is refresh_at:
+                delta = refresh_at - client._UTCNOW()
+                return delta.days * 86400 + delta.seconds + (
+                    delta.microseconds / 1e6)
+            # Stale: the entry was rescheduled or removed.
+            heapq.heappop(self._heap)
+        return None
+
+    def _pop_due(self):
+        """Remove and return the next entry due for a refresh, if any."""
+        with self._condition:
+            wait_secs = self._secs_until_next_refresh()
+            if wait_secs is None or wait_secs > 0:
+                return None
+            _, _, entry = heapq.heappop(self._heap)
+            entry.refresh_at = None
+            return entry
+
+    def _schedule(self, entry, refresh_at):
+        """(Re-)schedules an entry. Must be called with the condition held.
+
+        Args:
+            entry: _Entry, the entry to schedule.
+            refresh_at: datetime, when to refresh the entry's credentials,
+                        or None to not refresh them.
+        """
+        entry.refresh_at = refresh_at
+        if refresh_at is not None:
+            heapq.heappush(self._heap,
+                           (refresh_at, next(self._counter), entry))
+            self._condition.notify()
+
+    def _jitter(self):
+        return datetime.timedelta(
+            seconds=random.uniform(0, self._jitter_secs))
+
+    def _next_refresh_time(self, credentials):
+        """When to next refresh credentials, based on their token_expiry.
+
+        Tokens which expire within ``refresh_ahead_secs`` (e.g. because
+        their lifetime is shorter than that) are refreshed half way through
+        their remaining lifetime.
+
+        Args:
+            credentials: :class:`oauth2client.client.Credentials`, the
+                         credentials to schedule.
+
+        Returns:
+            datetime, the time at which to refresh the credentials, or None
+            if they don't expire.
+        """
+        now = client._UTCNOW()
+        if not getattr(credentials, 'access_token', None):
+            return now
+        token_expiry = getattr(credentials, 'token_expiry', None)
+        if token_expiry is None:
+            return None
+        margin = datetime.timedelta(seconds=self._refresh_ahead_secs)
+        refresh_at = token_expiry - margin - self._jitter()
+        if refresh_at <= now:
+            refresh_at = now + (token_expiry - now) // 2
+        return max(now, refresh_at)
+
+    def _retry_time(self, failures):
+        """When to retry refreshing credentials after consecutive failures.
+
+        Args:
+            failures: int, the number of consecutive failed refreshes.
+
+        Returns:
+            datetime, the time at which to retry.
+        """
+        backoff_secs = min(self._max_backoff_secs,
+                           self._min_backoff_secs * 2 ** (failures - 1))
+        backoff = datetime.timedelta(seconds=backoff_secs)
+        return client._UTCNOW() + backoff + self._jitter()
+
+    def _refresh(self, entry):
+        """Refreshes the credentials of an entry and reschedules it."""
+        credentials = entry.credentials
+        try:
+            if self._http_factory is None:
+                token_uri = getattr(credentials, 'token_uri', None)
+                with transport.pooled_http(token_uri) as http:
+                    transport._refresh_if_stale(credentials, http,
+                                                credentials.access_token)
+            else:
+                transport._refresh_if_stale(credentials, self._http_factory(),
+                                            credentials.access_token)
+        except Exception:
+            failures = entry.failures + 1
+            logger.warning('Failed to refresh credentials (%d attempts), '
+                           'will retry.', failures, exc_info=True)
+            refresh_at = self._retry_time(failures)
+        else:
+            failures = 0
+            refresh_at = self._next_refresh_time(credentials)
+
+        with self._condition:
+            if self._entries.get(credentials) is entry:
+                entry.failures = failures
+                self._schedule(entry, refresh_at)
@@ -15,9 +15,18 @@
 # limitations under the License.
 """Crypto-related routines for oauth2client."""
 
+import collections
+import copy
+import hashlib
 import json
 import logging
+import numbers
+import os
 import time
+import timeit
+
+import rsa
+import six
 
 from oauth2client import _helpers
 from oauth2client import _pure_python_crypt
@@ -29,6 +38,17 @@ RsaVerifier = _pure_python_crypt.RsaVerifier
 CLOCK_SKEW_SECS = 300  # 5 minutes in seconds
 AUTH_TOKEN_LIFETIME_SECS = 300  # 5 minutes in seconds
 MAX_TOKEN_LIFETIME_SECS = 86400  # 1 day in seconds
+VERIFIER_CACHE_SIZE = 64
+SIGNER_CACHE_SIZE = 64
+VERIFIED_TOKEN_CACHE_SIZE = 1024
+# Number of signatures checked per task when verifying JWTs in bulk.
+_BATCH_CHUNK_SIZE = 64
+
+# Parsed verifiers, keyed by (Verifier class, SHA-256 digest of the PEM).
+_verifier_cache = _helpers.LRUCache(VERIFIER_CACHE_SIZE)
+# Parsed signers, keyed by (Signer class, SHA-256 digest of the key,
+# SHA-256 digest of the password or None).
+_signer_cache = _helpers.LRUCache(SIGNER_CACHE_SIZE)
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +57,89 @@ class AppIdentityError(Exception):
     """Error to indicate crypto failure."""
 
 
+#: The outcome of verifying one JWT in bulk: the deserialized JSON payload
+#: if it verified, else the ``AppIdentityError`` explaining why not.
+JwtVerificationResult = collections.namedtuple(
+    'JwtVerificationResult', ['payload', 'error'])
+
+
+class VerifiedTokenCache(object):
+    """Remembers the payloads of JWTs whose signature verified.
+
+    Pass an instance as the ``cache`` argument of
+    :func:`verify_signed_jwt_with_certs` (or
+    :func:`oauth2client.client.verify_id_token`) so that presenting the same
+    JWT again costs a lookup instead of a signature check. Entries are kept
+    until the JWT's ``exp`` and are keyed by a hash of the JWT and of the
+    certificates it was verified against, so they stop matching once those
+    certificates are rotated out. The time range and audience are still
+    checked on every use.
+
+    Args:
+        max_size: int, The maximum number of JWTs to remember.
+    """
+
+    def __init__(self, max_size=VERIFIED_TOKEN_CACHE_SIZE):
+        self._cache = _helpers.LRUCache(max_size)
+
+    @property
+    def hits(self):
+        """The number of lookups that found a verified JWT."""
+        return self._cache.hits
+
+    @property
+    def misses(self):
+        """The number of lookups that didn't find a verified JWT."""
+        return self._cache.misses
+
+    def __len__(self):
+        return len(self._cache)
+
+    @staticmethod
+    def _key(jwt, certs):
+        return (hashlib.sha256(_helpers._to_bytes(jwt)).digest(),
+                frozenset(certs))
+
+    @staticmethod
+    def _unexpired(payload_dict):
+        return time.time() < payload_dict['exp']
+
+    def get(self, jwt, certs):
+        """Gets the payload of a JWT previously verified against certs.
+
+        Args:
+            jwt: string, A JWT.
+            certs: iterable, The certificates (or Verifier objects) the JWT is
+                   being verified against.
+
+        Returns:
+            dict, A copy of the JWT's payload, or None if it wasn't verified
+            against the same certificates or has expired.
+        """
+        payload_dict = self._cache.get(self._key(jwt, certs),
+                                       is_valid=self._unexpired)
+        if payload_dict is None:
+            return None
+        return copy.deepcopy(payload_dict)
+
+    def set(self, jwt, certs, payload_dict):
+        """Remembers the payload of a JWT whose signature verified.
+
+        JWTs without a numeric ``exp`` are not remembered.
+
+        Args:
+            jwt: string, A JWT.
+            certs: iterable, The certificates (or Verifier objects) the JWT
+                   was verified against.
+            payload_dict: dict, The JWT's deserialized JSON payload.
+        """
+        expiration = payload_dict.get('exp')
+        if (not isinstance(expiration, numbers.Real) or
+                isinstance(expiration, bool)):
+            return
+        self._cache.set(self._key(jwt, certs), copy.deepcopy(payload_dict))
+
+
 def _bad_pkcs12_key_as_pem(*args, **kwargs):
     raise NotImplementedError('pkcs12_key_as_pem requires OpenSSL.')
 
@@ -71,6 +174,205 @@ else:  # pragma: NO COVER
     Verifier = RsaVerifier
 
 
+OPENSSL_BACKEND = 'openssl'
+PYCRYPTO_BACKEND = 'pycrypto'
+RSA_BACKEND = 'rsa'
+#: Benchmark the available backends and use the fastest for each of signing
+#: and verifying.
+AUTO_BACKEND = 'auto'
+#: The environment variable naming the backend to use at import time.
+CRYPTO_BACKEND_ENV_VAR = 'OAUTH2CLIENT_CRYPTO_BACKEND'
+
+# The available backends, in order of preference, mapped to their
+# (Signer, Verifier) classes.
+_BACKENDS = collections.OrderedDict()
+if OpenSSLSigner:
+    _BACKENDS[OPENSSL_BACKEND] = (OpenSSLSigner, OpenSSLVerifier)
+if PyCryptoSigner:
+    _BACKENDS[PYCRYPTO_BACKEND] = (PyCryptoSigner, PyCryptoVerifier)
+_BACKENDS[RSA_BACKEND] = (RsaSigner, RsaVerifier)
+
+# Number of operations timed per backend in auto mode, the fastest of which
+# is used.
+_BENCHMARK_ROUNDS = 5
+_BENCHMARK_KEY_BITS = 1024
+
+# How the current backend was chosen, and the timings of auto mode.
+_backend_mode = None
+_backend_timings = {}
+
+
+def available_backends():
+    """Get the names of the crypto backends which can be used.
+
+    Returns:
+        list, the names of the available backends, in the order they are
+        preferred by default.
+    """
+    return list(_BACKENDS)
+
+
+def _backend_name(cls, index):
+    """Get the name of the backend a Signer or Verifier class belongs to."""
+    for name, classes in _BACKENDS.items():
+        if classes[index] is cls:
+            return name
+    return None
+
+
+def get_backend_info():
+    """Describe the crypto backend in use, for diagnostics.
+
+    Returns:
+        dict, with the keys ``'mode'`` (the name passed to
+        :func:`set_backend`, or None if the default was kept),
+        ``'signer'`` and ``'verifier'`` (the names of the backends used for
+        signing and verifying), ``'available'`` (the names of the available
+        backends) and ``'timings'`` (the seconds each backend took to sign
+        and verify in auto mode, keyed by ``'sign'`` and ``'verify'``).
+    """
+    return {
+        'mode': _backend_mode,
+        'signer': _backend_name(Signer, 0),
+        'verifier': _backend_name(Verifier, 1),
+        'available': available_backends(),
+        'timings': copy.deepcopy(_backend_timings),
+    }
+
+
+def _time_fastest(func):
+    """Times the fastest of several calls of a function, in seconds."""
+    timings = []
+    for _ in range(_BENCHMARK_ROUNDS):
+        start = timeit.default_timer()
+        func()
+        timings.append(timeit.default_timer() - start)
+    return min(timings)
+
+
+def _der(tag, *contents):
+    """DER-encodes a value from its tag and encoded contents."""
+    content = b''.join(contents)
+    length = len(content)
+    if length < 0x80:
+        encoded_length = six.int2byte(length)
+    else:
+        length_bytes = rsa.transform.int2bytes(length)
+        encoded_length = six.int2byte(0x80 | len(length_bytes)) + length_bytes
+    return six.int2byte(tag) + encoded_length + content
+
+
+def _make_self_signed_cert(public_key, private_key):
+    """Makes a minimal self-signed X.509 certificate for a key pair.
+
+    Args:
+        public_key: rsa.PublicKey, the key to certify.
+        private_key: rsa.PrivateKey, the key to sign the certificate with.
+
+    Returns:
+        bytes, the certificate in PEM format.
+    """
+    sequence, set_, integer, bit_string = 0x30, 0x31, 0x02, 0x03
+    # sha256WithRSAEncryption and rsaEncryption, with NULL parameters.
+    sha256_with_rsa = _der(sequence, b'\x06\x09*\x86H\x86\xf7\r\x01\x01\x0b',
+                           b'\x05\x00')
+    rsa_encryption = _der(sequence, b'\x06\x09*\x86H\x86\xf7\r\x01\x01\x01',
+                          b'\x05\x00')
+    # CN=oauth2client
+    name = _der(sequence, _der(set_, _der(
+        sequence, b'\x06\x03U\x04\x03', _der(0x0c, b'oauth2client'))))
+    validity = _der(sequence, _der(0x17, b'000101000000Z'),
+                    _der(0x17, b'491231235959Z'))
+    public_key_info = _der(sequence, rsa_encryption, _der(
+        bit_string, b'\x00', public_key.save_pkcs1(format='DER')))
+    version = _der(0xa0, _der(integer, b'\x02'))  # v3
+    tbs_certificate = _der(sequence, version, _der(integer, b'\x01'),
+                           sha256_with_rsa, name, validity, name,
+                           public_key_info)
+    signature = rsa.sign(tbs_certificate, private_key, 'SHA-256')
+    der = _der(sequence, tbs_certificate, sha256_with_rsa,
+               _der(bit_string, b'\x00', signature))
+    return rsa.pem.save_pem(der, 'CERTIFICATE')
+
+
+def _benchmark_backends():
+    """Times signing and verifying with each available backend.
+
+    Uses a freshly generated key, and a self-signed certificate for it so
+    that verifiers are loaded the way they are for verifying ID tokens.
+
+    Returns:
+        dict, ``{'sign': {name: seconds}, 'verify': {name: seconds}}``.
+    """
+    public_key, private_key = rsa.newkeys(_BENCHMARK_KEY_BITS)
+    private_pem = private_key.save_pkcs1()
+    cert_pem = _make_self_signed_cert(public_key, private_key)
+    message = b'x' * 256
+    signature = RsaSigner(private_key).sign(message)
+
+    timings = {'sign': {}, 'verify': {}}
+    for name, (signer_cls, verifier_cls) in _BACKENDS.items():
+        signer = signer_cls.from_string(private_pem)
+        verifier = verifier_cls.from_string(cert_pem, True)
+        if not verifier.verify(message, signature):  # pragma: NO COVER
+            raise AppIdentityError(
+                'Crypto backend {0} failed to verify.'.format(name))
+        timings['sign'][name] = _time_fastest(
+            lambda: signer.sign(message))
+        timings['verify'][name] = _time_fastest(
+            lambda: verifier.verify(message, signature))
+    return timings
+
+
+def set_backend(name):
+    """Choose the crypto backend used to sign and verify.
+
+    Args:
+        name: string, One of :func:`available_backends`, or
+              ``AUTO_BACKEND`` to benchmark the available backends and use
+              the fastest for signing and the fastest for verifying.
+
+    Raises:
+        ValueError: if the backend is unknown or unavailable.
+    """
+    global Signer, Verifier, _backend_mode, _backend_timings
+
+    if name == AUTO_BACKEND:
+        timings = _benchmark_backends()
+        signer_name = min(timings['sign'], key=timings['sign'].get)
+        verifier_name = min(timings['verify'], key=timings['verify'].get)
+    elif name in _BACKENDS:
+        timings = {}
+        signer_name = verifier_name = name
+    else:
+        raise ValueError(
+            'Unknown or unavailable crypto backend {0!r}, expected one of '
+            '{1}.'.format(name, available_backends() + [AUTO_BACKEND]))
+
+    Signer = _BACKENDS[signer_name][0]
+    Verifier = _BACKENDS[verifier_name][1]
+    _backend_mode = name
+    _backend_timings = timings
+    logger.info('Using the %s crypto backend for signing and %s for '
+                'verifying.', signer_name, verifier_name)
+
+
+def _set_backend_from_env():
+    """Chooses the crypto backend named by ``CRYPTO_BACKEND_ENV_VAR``."""
+    name = os.getenv(CRYPTO_BACKEND_ENV_VAR)
+    if not name:
+        return
+    try:
+        set_backend(name.strip().lower())
+    except ValueError:
+        logger.warning('Ignoring %s=%r, expected one of %s.',
+                       CRYPTO_BACKEND_ENV_VAR, name,
+                       available_backends() + [AUTO_BACKEND])
+
+
+_set_backend_from_env()
+
+
 def make_signed_jwt(signer, payload, key_id=None):
     """Make a signed JWT.
 
@@ -102,6 +404,58 @@ def make_signed_jwt(signer, payload, key_id=None):
     return b'.'.join(segments)
 
 
+def _get_verifier(pem):
+    """Gets a verifier for an X.509 certificate, parsing it at most once.
+
+    Parsed verifiers are kept in a bounded cache shared across calls and
+    threads, so repeatedly verifying tokens against the same certificates
+    (e.g. Google's ID token signing certificates) skips parsing them.
+
+    Args:
+        pem: string or bytes, A certificate in PEM format.
+
+    Returns:
+        Verifier, a verifier for the certificate's public key.
+    """
+    key = (Verifier, hashlib.sha256(_helpers._to_bytes(pem)).digest())
+    verifier = _verifier_cache.get(key)
+    if verifier is None:
+        verifier = Verifier.from_string(pem, is_x509_cert=True)
+        _verifier_cache.set(key, verifier)
+    return verifier
+
+
+def _get_signer(key, password=None):
+    """Gets a signer for a private key, parsing it at most once.
+
+    Parsed signers are kept in a bounded cache shared across calls and
+    threads, so repeatedly deserializing credentials for the same service
+    account (e.g. from storage) skips parsing its PEM or PKCS#12 key.
+
+    Args:
+        key: string or bytes, A private key in PEM or PKCS#12 format.
+        password: string or bytes, (Optional) The password of a PKCS#12
+                  key. Defaults to the default of ``Signer.from_string``.
+
+    Returns:
+        Signer, a signer for the private key.
+    """
+    password_digest = None
+    if password is not None:
+        password_digest = hashlib.sha256(
+            _helpers._to_bytes(password)).digest()
+    cache_key = (Signer, hashlib.sha256(_helpers._to_bytes(key)).digest(),
+                 password_digest)
+    signer = _signer_cache.get(cache_key)
+    if signer is None:
+        if password is None:
+            signer = Signer.from_string(key)
+        else:
+            signer = Signer.from_string(key, password)
+        _signer_cache.set(cache_key, signer)
+    return signer
+
+
 def _verify_signature(message, signature, certs):
     """Verifies signed content using a list of certificates.
 
@@ -114,8 +468,23 @@ def _verify_signature(message, signature, certs):
         AppIdentityError: If none of the certificates can verify the message
                           against the signature.
     """
-    for pem in certs:
-        verifier = Verifier.from_string(pem, is_x509_cert=True)
+    _verify_signature_with_verifiers(
+        message, signature, (_get_verifier(pem) for pem in certs))
+
+
+def _verify_signature_with_verifiers(message, signature, verifiers):
+    """Verifies signed content using a list of parsed verifiers.
+
+    Args:
+        message: string or bytes, The message to verify.
+        signature: string or bytes, The signature on the message.
+        verifiers: iterable, Verifier objects to try in turn.
+
+    Raises:
+        AppIdentityError: If none of the verifiers can verify the message
+                          against the signature.
+    """
+    for verifier in verifiers:
         if verifier.verify(message, signature):
             return
 
@@ -123,6 +492,48 @@ def _verify_signature(message, signature, certs):
     raise AppIdentityError('Invalid token signature')
 
 
+def _get_key_id(header):
+    """Gets the key ID from the encoded header of a JWT.
+
+    Args:
+        header: bytes, The base64url-encoded JWT header segment.
+
+    Returns:
+        string, The header's ``'kid'`` field, or None if it has none, it
+        isn't a string or the header can't be parsed.
+    """
+    try:
+        header_dict = json.loads(
+            _helpers._from_bytes(_helpers._urlsafe_b64decode(header)))
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(header_dict, dict):
+        return None
+    key_id = header_dict.get('kid')
+    if not isinstance(key_id, six.string_types):
+        return None
+    return key_id
+
+
+def _select_certs(header, certs):
+    """Selects the certificates to verify a JWT's signature with.
+
+    If the JWT header names a key ID present in ``certs``, only that
+    certificate is used. Otherwise every certificate is tried.
+
+    Args:
+        header: bytes, The base64url-encoded JWT header segment.
+        certs: dict, Dictionary where values of public keys in PEM format.
+
+    Returns:
+        iterable, The certificates in PEM format to try.
+    """
+    key_id = _get_key_id(header)
+    if key_id is not None and key_id in certs:
+        return [certs[key_id]]
+    return certs.values()
+
+
 def _check_audience(payload_dict, audience):
     """Checks audience field from a JWT payload.
 
@@ -204,22 +615,18 @@ def _verify_time_range(payload_dict):
             now, latest, payload_dict))
 
 
-def verify_signed_jwt_with_certs(jwt, certs, audience=None):
-    """Verify a JWT against public certs.
-
-    See http://self-issued.info/docs/draft-jones-json-web-token.html.
+def _decode_jwt(jwt):
+    """Splits a JWT and decodes its signature and payload.
 
     Args:
         jwt: string, A JWT.
-        certs: dict, Dictionary where values of public keys in PEM format.
-        audience: string, The audience, 'aud', that this JWT should contain. If
-                  None then the JWT's 'aud' parameter is not verified.
 
     Returns:
-        dict, The deserialized JSON payload in the JWT.
+        tuple, The encoded header segment, the signed message, the decoded
+        signature and the deserialized JSON payload.
 
     Raises:
-        AppIdentityError: if any checks are failed.
+        AppIdentityError: if the JWT is malformed.
     """
     jwt = _helpers._to_bytes(jwt)
 
@@ -238,8 +645,44 @@ def verify_signed_jwt_with_certs(jwt, certs, audience=None):
     except:
         raise AppIdentityError('Can\'t parse token: {0}'.format(payload_bytes))
 
+    return header, message_to_sign, signature, payload_dict
+
+
+def verify_signed_jwt_with_certs(jwt, certs, audience=None, cache=None):
+    """Verify a JWT against public certs.
+
+    See http://self-issued.info/docs/draft-jones-json-web-token.html.
+
+    Args:
+        jwt: string, A JWT.
+        certs: dict, Dictionary where values of public keys in PEM format,
+               keyed by key ID. If the JWT header has a ``'kid'`` matching
+               one of the keys, only that certificate is checked.
+        audience: string, The audience, 'aud', that this JWT should contain. If
+                  None then the JWT's 'aud' parameter is not verified.
+        cache: VerifiedTokenCache, (Optional) Remembers JWTs which verified,
+               to skip checking their signature again.
+
+    Returns:
+        dict, The deserialized JSON payload in the JWT.
+
+    Raises:
+        AppIdentityError: if any checks are failed.
+    """
+    if cache is not None:
+        payload_dict = cache.get(jwt, certs.values())
+        if payload_dict is not None:
+            _verify_time_range(payload_dict)
+            _check_audience(payload_dict, audience)
+            return payload_dict
+
+    header, message_to_sign, signature, payload_dict = _decode_jwt(jwt)
+
     # Verify that the signature matches the message.
-    _verify_signature(message_to_sign, signature, certs.values())
+    _verify_signature(message_to_sign, signature,
+                      _select_certs(header, certs))
+    if cache is not None:
+        cache.set(jwt, certs.values(), payload_dict)
 
     # Verify the issued at and created times in the payload.
     _verify_time_range(payload_dict)
@@ -248,3 +691,164 @@ def verify_signed_jwt_with_certs(jwt, certs, audience=None):
     _check_audience(payload_dict, audience)
 
     return payload_dict
+
+
+def _verify_signed_jwt_with_verifiers(jwt, verifiers, audience=None,
+                                      cache=None):
+    """Verify a JWT against already parsed public keys.
+
+    Behaves like :func:`verify_signed_jwt_with_certs`, but skips parsing
+    certificates.
+
+    Args:
+        jwt: string, A JWT.
+        verifiers: dict, Dictionary where values are Verifier objects, keyed
+                   by key ID.
+        audience: string, The audience, 'aud', that this JWT should contain. If
+                  None then the JWT's 'aud' parameter is not verified.
+        cache: VerifiedTokenCache, (Optional) Remembers JWTs which verified,
+               to skip checking their signature again.
+
+    Returns:
+        dict, The deserialized JSON payload in the JWT.
+
+    Raises:
+        AppIdentityError: if any checks are failed.
+    """
+    if cache is not None:
+        payload_dict = cache.get(jwt, verifiers.values())
+        if payload_dict is not None:
+            _verify_time_range(payload_dict)
+            _check_audience(payload_dict, audience)
+            return payload_dict
+
+    header, message_to_sign, signature, payload_dict = _decode_jwt(jwt)
+    _verify_signature_with_verifiers(message_to_sign, signature,
+                                     _select_certs(header, verifiers))
+    if cache is not None:
+        cache.set(jwt, verifiers.values(), payload_dict)
+    _verify_time_range(payload_dict)
+    _check_audience(payload_dict, audience)
+    return payload_dict
+
+
+def _verify_signatures(task):
+    """Checks a chunk of signatures against the same verifiers.
+
+    Module-level so that it can be run by a process pool.
+
+    Args:
+        task: tuple, A list of Verifier objects and a list of
+              ``(message, signature)`` pairs.
+
+    Returns:
+        list, a bool for each pair, True if one of the verifiers verified
+        the signature.
+    """
+    verifiers, signed = task
+    return [any(verifier.verify(message, signature)
+                for verifier in verifiers)
+            for message, signature in signed]
+
+
+def verify_signed_jwts_with_certs(jwts, certs, audience=None, executor=None):
+    """Verify many JWTs against public certs.
+
+    Each certificate is parsed once for the whole batch. Tokens are grouped
+    by the key ID in their header, so that each group is checked only
+    against its certificate.
+
+    Args:
+        jwts: iterable, The JWTs to verify.
+        certs: dict, Dictionary where values of public keys in PEM format,
+               keyed by key ID.
+        audience: string, The audience, 'aud', that the JWTs should contain.
+                  If None then the JWTs' 'aud' parameter is not verified.
+        executor: object, (Optional) An executor with a ``map`` method, such
+                  as a ``concurrent.futures.ThreadPoolExecutor``, to spread
+                  signature checks across. A process pool can only be used
+                  if the Verifier objects can be pickled.
+
+    Returns:
+        list, A :data:`JwtVerificationResult` for each JWT, in order. A JWT
+        failing to verify does not stop the others from being verified.
+    """
+    verifiers = dict((key_id, _get_verifier(pem))
+                     for key_id, pem in certs.items())
+    return _verify_signed_jwts_with_verifiers(jwts, verifiers,
+                                              audience=audience,
+                                              executor=executor)
+
+
+def _verify_signed_jwts_with_verifiers(jwts, verifiers, audience=None,
+                                       executor=None):
+    """Verify many JWTs against already parsed public keys.
+
+    Behaves like :func:`verify_signed_jwts_with_certs`, but skips parsing
+    certificates.
+
+    Args:
+        jwts: iterable, The JWTs to verify.
+        verifiers: dict, Dictionary where values are Verifier objects, keyed
+                   by key ID.
+        audience: string, The audience, 'aud', that the JWTs should contain.
+                  If None then the JWTs' 'aud' parameter is not verified.
+        executor: object, (Optional) An executor with a ``map`` method.
+
+    Returns:
+        list, A :data:`JwtVerificationResult` for each JWT, in order.
+    """
+    results = []
+    # Decoded JWTs, grouped by the key ID of the verifier to check them
+    # with, or None to check them with every verifier.
+    groups = collections.OrderedDict()
+    for index, jwt in enumerate(jwts):
+        try:
+            header, message_to_sign, signature, payload_dict = (
+                _decode_jwt(jwt))
+        except AppIdentityError as exc:
+            results.append(JwtVerificationResult(None, exc))
+            continue
+        except (TypeError, ValueError) as exc:
+            results.append(JwtVerificationResult(
+                None, AppIdentityError('Can\'t parse token: {0}'.format(exc))))
+            continue
+        results.append(None)
+        key_id = _get_key_id(header)
+        if key_id not in verifiers:
+            key_id = None
+        groups.setdefault(key_id, []).append(
+            (index, message_to_sign, signature, payload_dict))
+
+    chunks = []
+    tasks = []
+    for key_id, group in groups.items():
+        if key_id is None:
+            candidates = list(verifiers.values())
+        else:
+            candidates = [verifiers[key_id]]
+        for start in range(0, len(group), _BATCH_CHUNK_SIZE):
+            chunk = group[start:start + _BATCH_CHUNK_SIZE]
+            chunks.append(chunk)
+            tasks.append((candidates, [(message_to_sign, signature)
+                                       for _, message_to_sign, signature, _
+                                       in chunk]))
+
+    if executor is None:
+        verified = [_verify_signatures(task) for task in tasks]
+    else:
+        verified = executor.map(_verify_signatures, tasks)
+
+    for chunk, chunk_verified in zip(chunks, verified):
+        for (index, _, _, payload_dict), valid in zip(chunk, chunk_verified):
+            try:
+                if not valid:
+                    raise AppIdentityError('Invalid token signature')
+                _verify_time_range(payload_dict)
+                _check_audience(payload_dict, audience)
+            except AppIdentityError as exc:
+                results[index] = JwtVerificationResult(None, exc)
+            else:
+                results[index] = JwtVerificationResult(payload_dict, None)
+
+    return results
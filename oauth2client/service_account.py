@@ -18,8 +18,12 @@ import base64
 import copy
 import datetime
 import json
+import threading
 import time
 
+from six.moves import http_client
+from six.moves import queue
+
 import oauth2client
 from oauth2client import _helpers
 from oauth2client import client
@@ -37,6 +41,13 @@ to .pem format:
     >   openssl pkcs12 -nodes -nocerts -passin pass:notasecret | \
     >   openssl rsa > key.pem
 """
+# Defaults of ServiceAccountCredentials.create_delegated_bulk.
+_BULK_MAX_WORKERS = 8
+_BULK_MAX_RETRIES = 5
+_BULK_MIN_BACKOFF_SECS = 1
+_BULK_MAX_BACKOFF_SECS = 32
+# Token endpoint statuses which mean "slow down" rather than "no".
+_BULK_RETRY_STATUSES = (429, http_client.SERVICE_UNAVAILABLE)
 
 
 class ServiceAccountCredentials(client.AssertionCredentials):
@@ -182,7 +193,7 @@ class ServiceAccountCredentials(client.AssertionCredentials):
             revoke_uri = keyfile_dict.get('revoke_uri',
                                           oauth2client.GOOGLE_REVOKE_URI)
 
-        signer = crypt.Signer.from_string(private_key_pkcs8_pem)
+        signer = crypt._get_signer(private_key_pkcs8_pem)
         credentials = cls(service_account_email, signer, scopes=scopes,
                           private_key_id=private_key_id,
                           client_id=client_id, token_uri=token_uri,
@@ -287,8 +298,7 @@ class ServiceAccountCredentials(client.AssertionCredentials):
             private_key_password = _PASSWORD_DEFAULT
         if crypt.Signer is not crypt.OpenSSLSigner:
             raise NotImplementedError(_PKCS12_ERROR)
-        signer = crypt.Signer.from_string(private_key_pkcs12,
-                                          private_key_password)
+        signer = crypt._get_signer(private_key_pkcs12, private_key_password)
         credentials = cls(service_account_email, signer, scopes=scopes,
                           token_uri=token_uri, revoke_uri=revoke_uri)
         credentials._private_key_pkcs12 = private_key_pkcs12
@@ -440,14 +450,14 @@ class ServiceAccountCredentials(client.AssertionCredentials):
         password = None
         if pkcs12_val is None:
             private_key_pkcs8_pem = json_data['_private_key_pkcs8_pem']
-            signer = crypt.Signer.from_string(private_key_pkcs8_pem)
+            signer = crypt._get_signer(private_key_pkcs8_pem)
         else:
             # NOTE: This assumes that private_key_pkcs8_pem is not also
             #       in the serialized data. This would be very incorrect
             #       state.
             pkcs12_val = base64.b64decode(pkcs12_val)
             password = json_data['_private_key_password']
-            signer = crypt.Signer.from_string(pkcs12_val, password)
+            signer = crypt._get_signer(pkcs12_val, password)
 
         credentials = cls(
             json_data['_service_account_email'],
@@ -540,6 +550,162 @@ class ServiceAccountCredentials(client.AssertionCredentials):
         """
         return self.create_with_claims({'sub': sub})
 
+    def create_delegated_bulk(self, subjects, scopes=None, http_factory=None,
+                              max_workers=_BULK_MAX_WORKERS,
+                              max_retries=_BULK_MAX_RETRIES,
+                              min_backoff_secs=_BULK_MIN_BACKOFF_SECS,
+                              max_backoff_secs=_BULK_MAX_BACKOFF_SECS):
+        """Create and refresh delegated credentials for many subjects.
+
+        Each subject's credentials are created with :meth:`create_delegated`
+        and refreshed by a pool of worker threads, so that signing the
+        assertions and requesting the access tokens happen concurrently.
+        Each worker makes all of its requests with one HTTP object, reusing
+        its connection to ``token_uri``.
+
+        When the token endpoint responds with 429 or 503, every worker
+        pauses for an exponentially increasing delay before the request is
+        retried, up to ``max_retries`` times.
+
+        For example::
+
+          >>> results = creds.create_delegated_bulk(
+          ...     ['foo@email.com', 'bar@email.com'], scopes=scopes)
+          >>> for sub, result in results.items():
+          ...     if isinstance(result, Exception):
+          ...         print('Failed for', sub, result)
+
+        Args:
+            subjects: iterable, The email addresses to act on behalf of.
+            scopes: List or string, (Optional) Scopes to request instead of
+                    the scopes of these credentials.
+            http_factory: callable, (Optional) Called with no arguments by
+                          each worker to make its HTTP object. Defaults to
+                          :func:`transport.get_http_object`.
+            max_workers: int, The maximum number of concurrent requests.
+            max_retries: int, The maximum number of times the request of a
+                         subject is retried after 429 or 503 responses.
+            min_backoff_secs: float, The pause after the first 429 or 503.
+            max_backoff_secs: float, The maximum pause between retries.
+
+        Returns:
+            dict, mapping each subject to its refreshed
+            ``ServiceAccountCredentials``, or to the exception raised when
+            refreshing them (usually ``client.HttpAccessTokenRefreshError``)
+            or by ``http_factory``.
+
+        Raises:
+            ValueError: If max_workers is less than 1.
+        """
+        if max_workers < 1:
+            raise ValueError(
+                'max_workers must be at least 1, got {0}'.format(max_workers))
+        if scopes is None:
+            credentials = self
+        else:
+            credentials = self.create_scoped(scopes)
+        if http_factory is None:
+            http_factory = transport.get_http_object
+        minter = _DelegatedTokenMinter(
+            credentials, http_factory, max_retries, min_backoff_secs,
+            max_backoff_secs)
+        return minter.run(subjects, max_workers)
+
+
+class _DelegatedTokenMinter(object):
+    """Refreshes delegated credentials for many subjects from a thread pool.
+
+    Backs :meth:`ServiceAccountCredentials.create_delegated_bulk`. The
+    workers share a pause deadline, so that a rate-limited response slows
+    down all of them rather than just the one which received it.
+    """
+
+    def __init__(self, credentials, http_factory, max_retries,
+                 min_backoff_secs, max_backoff_secs):
+        self._credentials = credentials
+        self._http_factory = http_factory
+        self._max_retries = max_retries
+        self._min_backoff_secs = min_backoff_secs
+        self._max_backoff_secs = max_backoff_secs
+        self._lock = threading.Lock()
+        self._pause_until = 0
+        self._subjects = queue.Queue()
+        self._results = {}
+        # The last error raised by http_factory, if any.
+        self._http_error = None
+
+    def run(self, subjects, max_workers):
+        """Refreshes credentials for each subject and waits for all of them.
+
+        Returns:
+            dict, mapping each subject to credentials or an exception.
+        """
+        num_subjects = 0
+        for subject in subjects:
+            self._subjects.put(subject)
+            num_subjects += 1
+        workers = [threading.Thread(target=self._work)
+                   for _ in range(min(max_workers, num_subjects))]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        for worker in workers:
+            worker.join()
+        # Subjects left over if every worker failed to make an HTTP object.
+        while True:
+            try:
+                subject = self._subjects.get_nowait()
+            except queue.Empty:
+                return self._results
+            self._results[subject] = self._http_error
+
+    def _work(self):
+        try:
+            http = self._http_factory()
+        except Exception as exc:
+            # Leave the subjects to the other workers.
+            with self._lock:
+                self._http_error = exc
+            return
+        while True:
+            try:
+                subject = self._subjects.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                result = self._mint(subject, http)
+            except Exception as exc:
+                result = exc
+            with self._lock:
+                self._results[subject] = result
+
+    def _wait_for_pause(self):
+        with self._lock:
+            delay = self._pause_until - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _pause(self, retries):
+        backoff = min(self._max_backoff_secs,
+                      self._min_backoff_secs * 2 ** retries)
+        with self._lock:
+            self._pause_until = max(self._pause_until, time.time() + backoff)
+
+    def _mint(self, subject, http):
+        credentials = self._credentials.create_delegated(subject)
+        retries = 0
+        while True:
+            self._wait_for_pause()
+            try:
+                credentials.refresh(http)
+                return credentials
+            except client.HttpAccessTokenRefreshError as exc:
+                if (exc.status not in _BULK_RETRY_STATUSES or
+                        retries >= self._max_retries):
+                    raise
+                self._pause(retries)
+                retries += 1
+
 
 def _datetime_to_secs(utc_time):
     # TODO(issue 298): use time_delta.total_seconds()
@@ -559,6 +725,18 @@ class _JWTAccessCredentials(ServiceAccountCredentials):
     _MAX_TOKEN_LIFETIME_SECS = 3600
     """Max lifetime of the token (one hour, in seconds)."""
 
+    _AUDIENCE_TOKEN_CACHE_SIZE = 32
+    """Max number of per-audience tokens kept for requests without ``aud``."""
+
+    _AUDIENCE_TOKEN_REFRESH_MARGIN_SECS = 300
+    """Sign a new per-audience token once the cached one is this close to
+    expiring (five minutes, in seconds)."""
+
+    NON_SERIALIZED_MEMBERS = (
+        frozenset(['_audience_tokens']) |
+        ServiceAccountCredentials.NON_SERIALIZED_MEMBERS)
+    """Members that aren't serialized when object is converted to JSON."""
+
     def __init__(self,
                  service_account_email,
                  signer,
@@ -667,6 +845,58 @@ class _JWTAccessCredentials(ServiceAccountCredentials):
         """
         self.access_token, self.token_expiry = self._create_token()
 
+    def __getstate__(self):
+        """Trim the state down to something that can be pickled."""
+        d = super(_JWTAccessCredentials, self).__getstate__()
+        d.pop('_audience_tokens', None)
+        return d
+
+    @property
+    def audience_token_cache(self):
+        """The cache of signed tokens used for requests without an ``aud``.
+
+        Created on first use with ``_AUDIENCE_TOKEN_CACHE_SIZE`` entries, and
+        exposes ``hits`` and ``misses`` counters.
+
+        Returns:
+            oauth2client._helpers.LRUCache, mapping an audience to a pair of
+            the signed token and its expiry.
+        """
+        cache = self.__dict__.get('_audience_tokens')
+        if cache is None:
+            cache = _helpers.LRUCache(self._AUDIENCE_TOKEN_CACHE_SIZE)
+            self._audience_tokens = cache
+        return cache
+
+    def _get_audience_token(self, audience):
+        """Get a signed token for an audience, re-using a cached one if fresh.
+
+        A cached token is re-used until it is within
+        ``_AUDIENCE_TOKEN_REFRESH_MARGIN_SECS`` of its expiry, so repeated
+        requests to the same audience are not each signed.
+
+        Args:
+            audience: string, The ``aud`` claim for the token, typically the
+                      root of the URI being requested.
+
+        Returns:
+            string, The signed JWT.
+        """
+        margin = datetime.timedelta(
+            seconds=self._AUDIENCE_TOKEN_REFRESH_MARGIN_SECS)
+        deadline = client._UTCNOW() + margin
+
+        def is_fresh(cached):
+            return deadline < cached[1]
+
+        cache = self.audience_token_cache
+        cached = cache.get(audience, is_valid=is_fresh)
+        if cached is not None:
+            return cached[0]
+        token, expiry = self._create_token({'aud': audience})
+        cache.set(audience, (token, expiry))
+        return token
+
     def _create_token(self, additional_claims=None):
         now = client._UTCNOW()
         lifetime = datetime.timedelta(seconds=self._MAX_TOKEN_LIFETIME_SECS)
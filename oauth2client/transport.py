@@ -12,11 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
 import logging
+import threading
+import time
 
 import httplib2
 import six
 from six.moves import http_client
+from six.moves import urllib
 
 from oauth2client import _helpers
 
@@ -27,6 +31,10 @@ _STREAM_PROPERTIES = ('read', 'seek', 'tell')
 
 # Google Data client libraries may need to set this to [401, 403].
 REFRESH_STATUS_CODES = (http_client.UNAUTHORIZED,)
+# The maximum number of idle HTTP objects kept per host by an HttpPool.
+DEFAULT_POOL_MAX_SIZE = 10
+# How many seconds an HttpPool keeps an HTTP object idle before dropping it.
+DEFAULT_POOL_IDLE_TIMEOUT = 60
 
 
 class MemoryCache(object):
@@ -73,6 +81,127 @@ def get_http_object(*args, **kwargs):
     return httplib2.Http(*args, **kwargs)
 
 
+def _close_http(http):
+    """Closes the connections held open by an HTTP object."""
+    for connection in http.connections.values():
+        connection.close()
+    http.connections.clear()
+
+
+class HttpPool(object):
+    """A thread-safe pool of HTTP objects, keyed by host.
+
+    ``httplib2.Http`` objects keep their connections open between requests,
+    but aren't thread-safe. The pool hands each caller an HTTP object of its
+    own for the duration of a :meth:`checkout` and takes it back afterwards,
+    so that later requests to the same host reuse its open connection
+    rather than making a new TCP and TLS handshake.
+
+    Args:
+        max_size: int, The maximum number of idle HTTP objects kept per
+                  host. Any more are closed when they're checked in.
+        idle_timeout: float, The seconds after which an idle HTTP object is
+                      closed rather than reused, as the server has likely
+                      closed its end of the connection by then.
+    """
+
+    def __init__(self, max_size=DEFAULT_POOL_MAX_SIZE,
+                 idle_timeout=DEFAULT_POOL_IDLE_TIMEOUT):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        # Maps (scheme, host) to a list of (http, idle since) pairs, oldest
+        # first.
+        self._idle = {}
+
+    @staticmethod
+    def _key(uri):
+        parts = urllib.parse.urlsplit(uri or '')
+        return parts.scheme, parts.netloc
+
+    def _get(self, key):
+        """Gets the most recently used idle HTTP object for a key, if any."""
+        now = time.time()
+        expired = []
+        http = None
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle and now - idle[0][1] > self.idle_timeout:
+                expired.append(idle.pop(0)[0])
+            if idle:
+                http = idle.pop()[0]
+        for expired_http in expired:
+            _close_http(expired_http)
+        return http
+
+    def _put(self, key, http):
+        """Returns an HTTP object to the pool, or closes it if it's full."""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_size:
+                idle.append((http, time.time()))
+                return
+        _close_http(http)
+
+    @contextlib.contextmanager
+    def checkout(self, uri):
+        """Checks out an HTTP object for making requests to a URI's host.
+
+        The HTTP object must only be used by the calling thread, and only
+        within the ``with`` block::
+
+            with pool.checkout(token_uri) as http:
+                resp, content = transport.request(http, token_uri)
+
+        If the block raises, the HTTP object is closed rather than put back,
+        in case its connection was left in a bad state. Objects made by a
+        replaced :func:`get_http_object` which aren't ``httplib2.Http``
+        instances are never pooled.
+
+        Args:
+            uri: string, The URI requests will be made to.
+
+        Yields:
+            httplib2.Http, an HTTP object, possibly with an open connection
+            to the host of ``uri``.
+        """
+        key = self._key(uri)
+        http = self._get(key)
+        if http is None:
+            http = get_http_object()
+        try:
+            yield http
+        except Exception:
+            if isinstance(http, httplib2.Http):
+                _close_http(http)
+            raise
+        if isinstance(http, httplib2.Http):
+            self._put(key, http)
+
+    def clear(self):
+        """Closes and drops all idle HTTP objects."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for entries in idle.values():
+            for http, _ in entries:
+                _close_http(http)
+
+
+def pooled_http(uri):
+    """Checks an HTTP object out of the pool shared by token requests.
+
+    Used by credentials when refreshing without a caller-supplied HTTP
+    object. See :meth:`HttpPool.checkout`.
+
+    Args:
+        uri: string, The URI requests will be made to.
+
+    Returns:
+        A context manager yielding an HTTP object.
+    """
+    return _HTTP_POOL.checkout(uri)
+
+
 def _initialize_headers(headers):
     """Creates a copy of the headers.
 
@@ -134,6 +263,94 @@ def clean_headers(headers):
     return clean
 
 
+class _AuthHeaders(object):
+    """Builds the cleaned headers of authorized requests.
+
+    The equivalent of copying the request headers, applying the credentials
+    and user agent to them and passing them through :func:`clean_headers`,
+    except that the encoded ``Authorization`` and ``user-agent`` headers are
+    cached until the access token (or user agent) changes, so that only the
+    caller's own headers are encoded on each request.
+
+    Assumes ``credentials.apply`` only depends on the access token, as it
+    does for :class:`oauth2client.client.OAuth2Credentials`.
+
+    Args:
+        credentials: Credentials, the credentials to apply.
+    """
+
+    def __init__(self, credentials):
+        self._credentials = credentials
+        # Pair of ((access token, user agent), cleaned headers), replaced
+        # as a whole so that concurrent readers see a consistent pair.
+        self._cached = None
+
+    def build(self, headers):
+        """Returns cleaned request headers with the credentials applied.
+
+        Args:
+            headers: dict, The caller's request headers, or None. Left
+                     unmodified.
+
+        Returns:
+            dict, the request headers to send, with bytes keys and values.
+        """
+        credentials = self._credentials
+        user_agent = credentials.user_agent
+        if user_agent is not None and headers and 'user-agent' in headers:
+            # The user agents are combined, so can't be cached.
+            headers = _initialize_headers(headers)
+            credentials.apply(headers)
+            _apply_user_agent(headers, user_agent)
+            return clean_headers(headers)
+
+        key = (credentials.access_token, user_agent)
+        cached = self._cached
+        if cached is None or cached[0] != key:
+            auth_headers = {}
+            credentials.apply(auth_headers)
+            _apply_user_agent(auth_headers, user_agent)
+            cached = (key, clean_headers(auth_headers))
+            self._cached = cached
+        clean = clean_headers(headers) if headers else {}
+        clean.update(cached[1])
+        return clean
+
+
+def _refresh_if_stale(credentials, http, stale_token):
+    """Refreshes credentials, coalescing concurrent refreshes if supported.
+
+    Credentials which implement ``_refresh_if_stale`` (e.g.
+    :class:`oauth2client.client.OAuth2Credentials`) let threads which
+    shared a stale token wait for a single refresh instead of each making
+    their own request to the token endpoint.
+
+    Args:
+        credentials: Credentials, the credentials to refresh.
+        http: an object to be used to make HTTP requests.
+        stale_token: string, the access token which was missing or rejected.
+    """
+    refresh_if_stale = getattr(credentials, '_refresh_if_stale', None)
+    if refresh_if_stale is None:
+        credentials._refresh(http)
+    else:
+        refresh_if_stale(http, stale_token)
+
+
+def _maybe_refresh_ahead(credentials, http):
+    """Refreshes credentials about to expire, if they support it.
+
+    See :meth:`oauth2client.client.OAuth2Credentials.set_refresh_ahead`.
+
+    Args:
+        credentials: Credentials, the credentials to refresh.
+        http: an object to be used to make HTTP requests.
+    """
+    refresh_ahead_due = getattr(credentials, '_refresh_ahead_due', None)
+    if refresh_ahead_due is not None and refresh_ahead_due():
+        credentials._refresh_ahead(http)
+
+
 def wrap_http_for_auth(credentials, http):
     """Prepares an HTTP object's request method for auth.
 
@@ -148,6 +365,7 @@ def wrap_http_for_auth(credentials, http):
               auth requests.
     """
     orig_request_method = http.request
+    auth_headers = _AuthHeaders(credentials)
 
     # The closure that will replace 'httplib2.Http.request'.
     def new_request(uri, method='GET', body=None, headers=None,
@@ -156,13 +374,13 @@ def wrap_http_for_auth(credentials, http):
         if not credentials.access_token:
             _LOGGER.info('Attempting refresh to obtain '
                          'initial access_token')
-            credentials._refresh(orig_request_method)
+            _refresh_if_stale(credentials, orig_request_method, None)
+        else:
+            _maybe_refresh_ahead(credentials, orig_request_method)
 
-        # Clone and modify the request headers to add the appropriate
-        # Authorization header.
-        headers = _initialize_headers(headers)
-        credentials.apply(headers)
-        _apply_user_agent(headers, credentials.user_agent)
+        # Add the appropriate Authorization header to a copy of the request
+        # headers.
+        access_token = credentials.access_token
 
         body_stream_position = None
         # Check if the body is a file-like stream.
@@ -171,7 +389,7 @@ def wrap_http_for_auth(credentials, http):
             body_stream_position = body.tell()
 
         resp, content = request(orig_request_method, uri, method, body,
-                                clean_headers(headers),
+                                auth_headers.build(headers),
                                 redirections, connection_type)
 
         # A stored token may expire between the time it is retrieved and
@@ -183,13 +401,13 @@ def wrap_http_for_auth(credentials, http):
             _LOGGER.info('Refreshing due to a %s (attempt %s/%s)',
                          resp.status, refresh_attempt + 1,
                          max_refresh_attempts)
-            credentials._refresh(orig_request_method)
-            credentials.apply(headers)
+            _refresh_if_stale(credentials, orig_request_method, access_token)
+            access_token = credentials.access_token
             if body_stream_position is not None:
                 body.seek(body_stream_position)
 
             resp, content = request(orig_request_method, uri, method, body,
-                                    clean_headers(headers),
+                                    auth_headers.build(headers),
                                     redirections, connection_type)
 
         return resp, content
@@ -232,12 +450,13 @@ def wrap_http_for_jwt_access(credentials, http):
                            method, body, headers, redirections,
                            connection_type)
         else:
-            # If we don't have an 'aud' (audience) claim,
-            # create a 1-time token with the uri root as the audience
+            # If we don't have an 'aud' (audience) claim, use a token with
+            # the uri root as the audience, re-signing it only when the
+            # cached one for that audience is about to expire.
             headers = _initialize_headers(headers)
             _apply_user_agent(headers, credentials.user_agent)
             uri_root = uri.split('?', 1)[0]
-            token, unused_expiry = credentials._create_token({'aud': uri_root})
+            token = credentials._get_audience_token(uri_root)
 
             headers['Authorization'] = 'Bearer ' + token
             return request(orig_request_method, uri, method, body,
@@ -283,3 +502,4 @@ def request(http, uri, method='GET', body=None, headers=None,
 
 
 _CACHED_HTTP = httplib2.Http(MemoryCache())
+_HTTP_POOL = HttpPool()
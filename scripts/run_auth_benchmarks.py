@@ -0,0 +1,335 @@
+# Copyright 2016 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""End-to-end benchmarks of authorized requests.
+
+Starts a local stub of the token, revoke and tokeninfo endpoints and of an
+API in a separate process, then makes authorized requests to the API from
+several threads sharing one set of credentials, for each kind of
+credentials::
+
+    $ python scripts/run_auth_benchmarks.py --output before.json
+    $ python scripts/run_auth_benchmarks.py --threads 64 --token-lifetime 5
+
+The scenarios are:
+
+* ``none``: unauthorized requests, the baseline to compare against.
+* ``oauth2``: ``OAuth2Credentials.authorize()``, refreshing with a refresh
+  token.
+* ``service_account``: ``ServiceAccountCredentials`` with scopes,
+  refreshing with a signed JWT assertion.
+* ``jwt_access``: service account credentials without scopes, which send
+  self-signed JWTs instead of access tokens.
+
+For each scenario and thread count, prints as JSON the p50 and p99 request
+latency, the number of API requests per token refresh and the CPU time
+this process spent per request. The stub runs in its own process so that
+its CPU time isn't counted.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import threading
+import time
+import timeit
+
+import six
+from six.moves import BaseHTTPServer
+from six.moves import http_client
+from six.moves import socketserver
+from six.moves import urllib
+
+import oauth2client
+from oauth2client import client
+from oauth2client import crypt
+from oauth2client import service_account
+from oauth2client import transport
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'tests', 'data')
+SCENARIOS = ('none', 'oauth2', 'service_account', 'jwt_access')
+DEFAULT_THREADS = (1, 8, 64)
+_SCOPE = 'https://www.googleapis.com/auth/benchmark'
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn,
+                           BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class _StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Serves the stub endpoints. Counts requests on the server."""
+
+    protocol_version = 'HTTP/1.1'
+    # Don't let Nagle's algorithm delay the body, written after the headers.
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _count(self, name):
+        with self.server.lock:
+            self.server.counts[name] = self.server.counts.get(name, 0) + 1
+
+    def _respond(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get('content-length', 0))
+        return self.rfile.read(length)
+
+    def do_POST(self):
+        path = urllib.parse.urlparse(self.path).path
+        self._read_body()
+        if path == '/token':
+            self._count('token')
+            self._respond(http_client.OK, {
+                'access_token': 'token-{0}'.format(time.time()),
+                'expires_in': self.server.token_lifetime,
+                'token_type': 'Bearer',
+            })
+        else:
+            self._respond(http_client.NOT_FOUND, {})
+
+    def do_GET(self):
+        path = urllib.parse.urlparse(self.path).path
+        if path == '/api':
+            self._count('api')
+            if self.headers.get('authorization') is None:
+                self._count('api_unauthorized')
+            self._respond(http_client.OK, {'ok': True})
+        elif path == '/tokeninfo':
+            self._count('tokeninfo')
+            self._respond(http_client.OK, {'scope': _SCOPE})
+        elif path == '/revoke':
+            self._count('revoke')
+            self._respond(http_client.OK, {})
+        elif path == '/stats':
+            with self.server.lock:
+                counts = dict(self.server.counts)
+                self.server.counts.clear()
+            self._respond(http_client.OK, counts)
+        else:
+            self._respond(http_client.NOT_FOUND, {})
+
+
+def _serve(port_queue, token_lifetime):
+    """Target of the stub server process."""
+    server = _ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    server.lock = threading.Lock()
+    server.counts = {}
+    server.token_lifetime = token_lifetime
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def _start_stub(token_lifetime):
+    """Starts the stub server process.
+
+    Returns:
+        tuple, the process and the base URL of the stub.
+    """
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve,
+                                      args=(port_queue, token_lifetime))
+    process.daemon = True
+    process.start()
+    port = port_queue.get(timeout=30)
+    return process, 'http://127.0.0.1:{0}'.format(port)
+
+
+def _stub_counts(base_url):
+    """Gets and resets the request counts of the stub server."""
+    resp, content = transport.request(transport.get_http_object(),
+                                      base_url + '/stats')
+    return json.loads(content.decode('utf-8'))
+
+
+def _make_credentials(scenario, base_url):
+    """Makes the credentials for a scenario, or None for no credentials."""
+    if scenario == 'none':
+        return None
+    if scenario == 'oauth2':
+        return client.OAuth2Credentials(
+            None, 'client_id', 'client_secret', 'refresh_token', None,
+            base_url + '/token', 'oauth2client-benchmark',
+            revoke_uri=base_url + '/revoke',
+            token_info_uri=base_url + '/tokeninfo')
+    with open(os.path.join(DATA_DIR, 'privatekey.pem'), 'rb') as file_obj:
+        signer = crypt.Signer.from_string(file_obj.read())
+    if scenario == 'service_account':
+        return service_account.ServiceAccountCredentials(
+            'benchmark@testing.gserviceaccount.com', signer, scopes=_SCOPE,
+            private_key_id='key1', token_uri=base_url + '/token',
+            revoke_uri=base_url + '/revoke')
+    return service_account._JWTAccessCredentials(
+        'benchmark@testing.gserviceaccount.com', signer,
+        private_key_id='key1', token_uri=base_url + '/token',
+        revoke_uri=base_url + '/revoke')
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    index = int(round(percent / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def _process_time():
+    if six.PY3:
+        return time.process_time()
+    return time.clock()  # pragma: NO COVER
+
+
+def run_scenario(scenario, base_url, threads, requests_per_thread):
+    """Makes authorized requests to the stub API from several threads.
+
+    Each thread has its own HTTP object, since they aren't thread-safe, but
+    all threads share the same credentials.
+
+    Returns:
+        dict, the results.
+    """
+    credentials = _make_credentials(scenario, base_url)
+    api_uri = base_url + '/api'
+    latencies = []
+    errors = []
+    barrier = threading.Event()
+
+    def worker():
+        http = transport.get_http_object()
+        if credentials is not None:
+            http = credentials.authorize(http)
+        thread_latencies = []
+        barrier.wait()
+        try:
+            for _ in range(requests_per_thread):
+                start = timeit.default_timer()
+                resp, _ = transport.request(http, api_uri)
+                thread_latencies.append(timeit.default_timer() - start)
+                if resp.status != http_client.OK:
+                    raise RuntimeError('Status code: {0}'.format(resp.status))
+        except Exception as exc:
+            errors.append(repr(exc))
+        latencies.extend(thread_latencies)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    _stub_counts(base_url)
+    cpu_start = _process_time()
+    wall_start = timeit.default_timer()
+    barrier.set()
+    for thread in workers:
+        thread.join()
+    wall_time = timeit.default_timer() - wall_start
+    cpu_time = _process_time() - cpu_start
+    counts = _stub_counts(base_url)
+
+    if scenario == 'oauth2':
+        # Exercise the remaining endpoints once.
+        http = transport.get_http_object()
+        credentials.retrieve_scopes(http)
+        credentials.revoke(http)
+        counts.update(_stub_counts(base_url))
+
+    latencies.sort()
+    total = len(latencies)
+    refreshes = counts.get('token', 0)
+    return {
+        'threads': threads,
+        'requests': total,
+        'errors': errors,
+        'p50_ms': _percentile(latencies, 50) * 1000 if total else None,
+        'p99_ms': _percentile(latencies, 99) * 1000 if total else None,
+        'requests_per_sec': total / wall_time if wall_time else None,
+        'requests_per_refresh': (counts.get('api', 0) / float(refreshes)
+                                 if refreshes else None),
+        'cpu_ms_per_request': cpu_time * 1000 / total if total else None,
+        'stub_requests': counts,
+    }
+
+
+def run(scenarios, thread_counts, requests_per_thread, token_lifetime):
+    """Runs the benchmarks against a fresh stub server.
+
+    Returns:
+        dict, the results, ready to be dumped to JSON.
+    """
+    process, base_url = _start_stub(token_lifetime)
+    try:
+        results = {}
+        for scenario in scenarios:
+            results[scenario] = [
+                run_scenario(scenario, base_url, threads, requests_per_thread)
+                for threads in thread_counts]
+    finally:
+        process.terminate()
+        process.join()
+    return {
+        'oauth2client': oauth2client.__version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'crypto': crypt.get_backend_info(),
+        'requests_per_thread': requests_per_thread,
+        'token_lifetime': token_lifetime,
+        'benchmarks': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        '--scenario', action='append', dest='scenarios', choices=SCENARIOS,
+        help='Scenario to run. May be repeated. Defaults to all.')
+    parser.add_argument(
+        '--threads', action='append', type=int, dest='thread_counts',
+        help='Number of threads. May be repeated. Defaults to {0}.'.format(
+            ', '.join(str(threads) for threads in DEFAULT_THREADS)))
+    parser.add_argument(
+        '--requests', type=int, default=200,
+        help='Number of requests made by each thread.')
+    parser.add_argument(
+        '--token-lifetime', type=int, default=3600,
+        help='Lifetime, in seconds, of the access tokens the stub issues. '
+             'Lower it to include refreshes in the hot path.')
+    parser.add_argument(
+        '--output', help='File to write the JSON results to. '
+                         'Defaults to stdout.')
+    args = parser.parse_args(argv)
+
+    results = run(args.scenarios or SCENARIOS,
+                  args.thread_counts or DEFAULT_THREADS,
+                  args.requests, args.token_lifetime)
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as file_obj:
+            file_obj.write(output + '\n')
+    else:
+        sys.stdout.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+# Copyright 2016 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Micro-benchmarks for the crypto backends.
+
+Times loading keys, signing, verifying and JWT round-trips with each
+available backend, using the keys in ``tests/data``, and prints the results
+as JSON so they can be diffed across releases::
+
+    $ python scripts/run_crypto_benchmarks.py --output before.json
+    $ python scripts/run_crypto_benchmarks.py --backend rsa --min-time 1
+
+For each benchmark the output has the operations per second of the fastest
+of several runs, plus (on Python 3) the peak memory allocated by one
+operation and the number of memory blocks it left allocated.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:  # pragma: NO COVER
+    tracemalloc = None
+
+from pyasn1.codec.der import decoder
+from pyasn1_modules.rfc2459 import Certificate
+import rsa
+
+import oauth2client
+from oauth2client import _pure_python_crypt
+from oauth2client import crypt
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'tests', 'data')
+# Public keys in a PEM format each backend's Verifier can load. OpenSSL only
+# loads non-certificate public keys out of private keys.
+_PUBLIC_KEY_FILES = {
+    crypt.OPENSSL_BACKEND: 'privatekey.pem',
+    crypt.PYCRYPTO_BACKEND: 'publickey_openssl.pem',
+    crypt.RSA_BACKEND: 'privatekey.pub',
+}
+_MESSAGE = b'x' * 256
+_AUDIENCE = 'benchmark@testing.gserviceaccount.com'
+
+
+def _datafile(filename):
+    with open(os.path.join(DATA_DIR, filename), 'rb') as file_obj:
+        return file_obj.read()
+
+
+def _time_once(func, min_time):
+    """Calls func repeatedly for at least min_time seconds.
+
+    Returns:
+        tuple, the number of calls and the seconds they took.
+    """
+    iterations = 0
+    batch = 1
+    start = timeit.default_timer()
+    while True:
+        for _ in range(batch):
+            func()
+        iterations += batch
+        elapsed = timeit.default_timer() - start
+        if elapsed >= min_time:
+            return iterations, elapsed
+        batch *= 2
+
+
+def _measure_allocations(func):
+    """Measures the memory allocated by one call of func.
+
+    Returns:
+        dict, the peak bytes allocated during the call and the number of
+        blocks left allocated after it, or None values without tracemalloc.
+    """
+    if tracemalloc is None:  # pragma: NO COVER
+        return {'peak_bytes': None, 'retained_blocks': None}
+    # Warm up any caches first, so they aren't counted.
+    func()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        func()
+        peak_bytes = tracemalloc.get_traced_memory()[1] - start_bytes
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    # Ignore tracemalloc's own allocations.
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    retained_blocks = sum(
+        stat.count_diff for stat in after.filter_traces(ignore).compare_to(
+            before.filter_traces(ignore), 'lineno'))
+    return {'peak_bytes': peak_bytes, 'retained_blocks': retained_blocks}
+
+
+def benchmark(func, min_time, repeat):
+    """Benchmarks func.
+
+    Args:
+        func: callable, the operation to time, taking no arguments.
+        min_time: float, the minimum seconds to run each timing for.
+        repeat: int, the number of timings, of which the fastest is kept.
+
+    Returns:
+        dict, the results.
+    """
+    best_iterations, best_elapsed = None, None
+    for _ in range(repeat):
+        iterations, elapsed = _time_once(func, min_time)
+        if (best_elapsed is None or
+                elapsed / iterations < best_elapsed / best_iterations):
+            best_iterations, best_elapsed = iterations, elapsed
+    result = {
+        'iterations': best_iterations,
+        'seconds_per_op': best_elapsed / best_iterations,
+        'ops_per_sec': best_iterations / best_elapsed,
+    }
+    result.update(_measure_allocations(func))
+    return result
+
+
+def _public_key_bits(cert):
+    """Decodes the public key of a PEM certificate as a pyasn1 BitString."""
+    der = rsa.pem.load_pem(cert, 'CERTIFICATE')
+    asn1_cert, _ = decoder.decode(der, asn1Spec=Certificate())
+    tbs_cert = asn1_cert['tbsCertificate']
+    return tbs_cert['subjectPublicKeyInfo']['subjectPublicKey']
+
+
+def pure_python_benchmarks():
+    """Builds the benchmarks of the pure-Python helpers.
+
+    Converts the public keys of the certificates in ``certs.json`` from
+    bits to bytes, both from the pyasn1 BitString and from a plain list.
+
+    Returns:
+        list, of (benchmark name, callable) pairs.
+    """
+    certs = json.loads(_datafile('certs.json').decode('utf-8'))
+    benchmarks = []
+    for key_id in sorted(certs):
+        bit_string = _public_key_bits(certs[key_id].encode('utf-8'))
+        bit_list = list(bit_string)
+        benchmarks.extend([
+            ('_bit_list_to_bytes[{0}]'.format(key_id),
+             lambda bits=bit_string: _pure_python_crypt._bit_list_to_bytes(
+                 bits)),
+            ('_bit_list_to_bytes[{0}:list]'.format(key_id),
+             lambda bits=bit_list: _pure_python_crypt._bit_list_to_bytes(
+                 bits)),
+        ])
+    return benchmarks
+
+
+def backend_benchmarks(name):
+    """Builds the benchmarks for one backend.
+
+    Args:
+        name: string, the name of the backend, one of
+              ``crypt.available_backends()``.
+
+    Returns:
+        list, of (benchmark name, callable) pairs.
+    """
+    signer_cls, verifier_cls = crypt._BACKENDS[name]
+    private_key = _datafile('privatekey.pem')
+    public_key = _datafile(_PUBLIC_KEY_FILES[name])
+    cert = _datafile('public_cert.pem')
+    certs = {'key1': cert}
+
+    signer = signer_cls.from_string(private_key)
+    verifier = verifier_cls.from_string(cert, is_x509_cert=True)
+    signature = signer.sign(_MESSAGE)
+
+    def make_jwt():
+        now = int(time.time())
+        return crypt.make_signed_jwt(signer, {
+            'aud': _AUDIENCE,
+            'iat': now,
+            'exp': now + 3600,
+        }, key_id='key1')
+
+    jwt = make_jwt()
+
+    def verify_jwt():
+        return crypt.verify_signed_jwt_with_certs(jwt, certs, _AUDIENCE)
+
+    benchmarks = [
+        ('Signer.from_string',
+         lambda: signer_cls.from_string(private_key)),
+        ('Verifier.from_string[pem]',
+         lambda: verifier_cls.from_string(public_key, is_x509_cert=False)),
+        ('Verifier.from_string[x509]',
+         lambda: verifier_cls.from_string(cert, is_x509_cert=True)),
+        ('sign', lambda: signer.sign(_MESSAGE)),
+        ('verify', lambda: verifier.verify(_MESSAGE, signature)),
+        ('make_signed_jwt', make_jwt),
+        ('verify_signed_jwt_with_certs', verify_jwt),
+    ]
+    if name == crypt.RSA_BACKEND:
+        benchmarks.extend(pure_python_benchmarks())
+    return benchmarks
+
+
+def run(backends, min_time, repeat, selected=None):
+    """Runs the benchmarks.
+
+    Args:
+        backends: list, the names of the backends to benchmark.
+        min_time: float, the minimum seconds to run each timing for.
+        repeat: int, the number of timings of each benchmark.
+        selected: list, (Optional) the names of the benchmarks to run.
+                  Defaults to all of them.
+
+    Returns:
+        dict, the results, ready to be dumped to JSON.
+    """
+    results = {}
+    orig_state = (crypt.Signer, crypt.Verifier, crypt._backend_mode,
+                  crypt._backend_timings)
+    try:
+        for name in backends:
+            # verify_signed_jwt_with_certs uses crypt.Verifier.
+            crypt.set_backend(name)
+            results[name] = {}
+            for bench_name, func in backend_benchmarks(name):
+                if selected and bench_name not in selected:
+                    continue
+                results[name][bench_name] = benchmark(func, min_time, repeat)
+    finally:
+        (crypt.Signer, crypt.Verifier, crypt._backend_mode,
+         crypt._backend_timings) = orig_state
+    return {
+        'oauth2client': oauth2client.__version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'min_time': min_time,
+        'repeat': repeat,
+        'benchmarks': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        '--backend', action='append', dest='backends',
+        choices=crypt.available_backends(),
+        help='Backend to benchmark. May be repeated. Defaults to all.')
+    parser.add_argument(
+        '--benchmark', action='append', dest='benchmarks',
+        help='Benchmark to run. May be repeated. Defaults to all.')
+    parser.add_argument(
+        '--min-time', type=float, default=0.2,
+        help='Minimum seconds to run each timing for.')
+    parser.add_argument(
+        '--repeat', type=int, default=3,
+        help='Number of timings of each benchmark, the fastest is kept.')
+    parser.add_argument(
+        '--output', help='File to write the JSON results to. '
+                         'Defaults to stdout.')
+    args = parser.parse_args(argv)
+
+    results = run(args.backends or crypt.available_backends(),
+                  args.min_time, args.repeat, selected=args.benchmarks)
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as file_obj:
+            file_obj.write(output + '\n')
+    else:
+        sys.stdout.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -48,6 +48,8 @@ Note: oauth2client is now deprecated. No more features will be added to the
     libraries and the core team is turning down support. We recommend you use
     `google-auth <https://google-auth.readthedocs.io>`__ and
     `oauthlib <http://oauthlib.readthedocs.io/>`__.
+
+oauth2client.aio, which supports asyncio, requires Python 3.5 or later.
 """
 
 version = oauth2client.__version__
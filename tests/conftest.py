@@ -14,9 +14,17 @@
 
 """Py.test hooks."""
 
+import sys
+
 from oauth2client import _helpers
 
 
+# oauth2client.aio uses coroutine syntax added in Python 3.5.
+collect_ignore = []
+if sys.version_info < (3, 5):
+    collect_ignore.append('test_aio.py')
+
+
 def pytest_addoption(parser):
     """Adds the --gae-sdk option to py.test.
 
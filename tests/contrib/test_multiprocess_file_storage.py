@@ -19,6 +19,7 @@ import datetime
 import json
 import multiprocessing
 import os
+import shutil
 import tempfile
 import unittest
 
@@ -98,8 +99,9 @@ class MultiprocessStorageBehaviorTests(unittest.TestCase):
         self.assertIsNotNone(credentials)
         self.assertEqual('foo', credentials.access_token)
 
-        # Reset internal cache, ensure credentials were saved.
-        store._backend._credentials = {}
+        # Read the file afresh, ensure credentials were saved.
+        store._backend = multiprocess_file_storage._MultiprocessStorageBackend(
+            self.filename)
         credentials = store.get()
 
         self.assertIsNotNone(credentials)
@@ -252,47 +254,434 @@ class MultiprocessStorageUnitTests(unittest.TestCase):
         self.assertIs(backend_one, backend_two)
         self.assertIsNot(backend_one, backend_three)
 
-    def test__read_write_credentials_file(self):
+    def test__encode_decode_credential(self):
         credentials = _create_test_credentials()
-        contents = six.StringIO()
+        encoded = multiprocess_file_storage._encode_credential(credentials)
+        self.assertIsInstance(encoded, six.string_types)
+        self.assertEqual(
+            json.loads(credentials.to_json()),
+            json.loads(multiprocess_file_storage._decode_credential(
+                encoded).to_json()))
 
-        multiprocess_file_storage._write_credentials_file(
-            contents, {'key': credentials})
+    def test__make_record(self):
+        self.assertEqual(
+            json.loads(multiprocess_file_storage._make_record(
+                'key', 'abc').decode('utf-8')),
+            {'key': 'key', 'credential': 'abc'})
+        self.assertEqual(
+            json.loads(multiprocess_file_storage._make_record(
+                'key', None).decode('utf-8')),
+            {'key': 'key', 'deleted': True})
+
+    def _write_file(self, *lines):
+        with open(self.filename, 'wb') as file_:
+            file_.write(b''.join(lines))
+
+    def _read_lines(self):
+        with open(self.filename, 'rb') as file_:
+            return [json.loads(line.decode('utf-8')) for line in file_]
+
+    def _load(self, backend=None):
+        if backend is None:
+            backend = multiprocess_file_storage._MultiprocessStorageBackend(
+                self.filename)
+        backend.acquire_lock()
+        backend.release_lock()
+        return backend
 
-        contents.seek(0)
-        data = json.load(contents)
-        self.assertEqual(data['file_version'], 2)
-        self.assertTrue(data['credentials']['key'])
+    def _get(self, backend, key):
+        backend.acquire_lock()
+        try:
+            return backend.locked_get(key)
+        finally:
+            backend.release_lock()
 
-        # Read it back.
-        contents.seek(0)
-        results = multiprocess_file_storage._load_credentials_file(contents)
+    def test_put_appends_record(self):
+        credentials = _create_test_credentials()
+        backend = multiprocess_file_storage._MultiprocessStorageBackend(
+            self.filename)
+        backend.acquire_lock()
+        try:
+            backend.locked_put('a', credentials)
+            backend.locked_put('b', credentials)
+            backend.locked_delete('a')
+        finally:
+            backend.release_lock()
+
+        lines = self._read_lines()
+        self.assertEqual(lines[0]['file_version'], 3)
         self.assertEqual(
-            results['key'].access_token, credentials.access_token)
-
-        # Add an invalid credential and try reading it back. It should ignore
-        # the invalid one but still load the valid one.
-        data['credentials']['invalid'] = '123'
-        results = multiprocess_file_storage._load_credentials_file(
-            six.StringIO(json.dumps(data)))
-        self.assertNotIn('invalid', results)
+            [(line['key'], 'deleted' in line) for line in lines[1:]],
+            [('a', False), ('b', False), ('a', True)])
+
+        backend = self._load()
+        self.assertEqual(list(backend._encoded_credentials), ['b'])
+        self.assertIsNone(self._get(backend, 'a'))
         self.assertEqual(
-            results['key'].access_token, credentials.access_token)
+            self._get(backend, 'b').access_token, credentials.access_token)
+
+    def test_load_reads_only_new_records(self):
+        credentials = _create_test_credentials()
+        reader = self._load()
+        writer = self._load()
 
-    def test__load_credentials_file_invalid_json(self):
-        contents = six.StringIO('{[')
+        writer.acquire_lock()
+        try:
+            writer.locked_put('a', credentials)
+        finally:
+            writer.release_lock()
+        first = self._get(reader, 'a')
+
+        credentials.access_token = 'bar'
+        writer.acquire_lock()
+        try:
+            writer.locked_put('b', credentials)
+        finally:
+            writer.release_lock()
+
+        self._load(reader)
         self.assertEqual(
-            multiprocess_file_storage._load_credentials_file(contents), {})
+            sorted(reader._encoded_credentials), ['a', 'b'])
+        self.assertIs(self._get(reader, 'a'), first)
+        self.assertEqual(self._get(reader, 'b').access_token, 'bar')
+
+    def test_get_decodes_only_requested_key(self):
+        credentials = _create_test_credentials()
+        writer = self._load()
+        writer.acquire_lock()
+        try:
+            writer.locked_put('a', credentials)
+            writer.locked_put('b', credentials)
+        finally:
+            writer.release_lock()
+
+        reader = self._load()
+        decode = mock.Mock(
+            wraps=multiprocess_file_storage._decode_credential)
+        with mock.patch.object(
+                multiprocess_file_storage, '_decode_credential', decode):
+            first = self._get(reader, 'a')
+            self.assertIs(self._get(reader, 'a'), first)
+            self.assertEqual(decode.call_count, 1)
+            self.assertNotIn('b', reader._credentials)
+
+            # Only a changed credential is decoded again.
+            writer.acquire_lock()
+            try:
+                writer.locked_put('b', credentials)
+                credentials.access_token = 'bar'
+                writer.locked_put('a', credentials)
+            finally:
+                writer.release_lock()
+            self.assertEqual(self._get(reader, 'a').access_token, 'bar')
+            self.assertEqual(decode.call_count, 2)
+
+    def test_get_put_in_read_only_mode(self):
+        writer = self._load()
+        writer.acquire_lock()
+        try:
+            writer.locked_put('key', _create_test_credentials())
+        finally:
+            writer.release_lock()
+
+        backend = self._load()
+        credentials = _create_test_credentials()
+        credentials.access_token = 'memory'
+        backend._process_lock = mock.Mock()
+        backend._process_lock.acquire.return_value = False
+        backend.acquire_lock()
+        try:
+            backend.locked_put('key', credentials)
+            self.assertIs(backend.locked_get('key'), credentials)
+        finally:
+            backend.release_lock()
+
+    def test_skips_reload_of_unchanged_file(self):
+        reader = self._load()
+        writer = self._load()
+        writer.acquire_lock()
+        try:
+            writer.locked_put('key', _create_test_credentials())
+        finally:
+            writer.release_lock()
+
+        with mock.patch.object(reader, '_read_header',
+                               wraps=reader._read_header) as read_header:
+            self.assertIsNotNone(self._get(reader, 'key'))
+            self.assertIsNotNone(self._get(reader, 'key'))
+            self._load(reader)
+        self.assertEqual(read_header.call_count, 1)
+        self.assertEqual((reader.reloads, reader.skipped_reloads), (2, 2))
+
+        # The writer doesn't read back its own records.
+        self._load(writer)
+        self.assertEqual((writer.reloads, writer.skipped_reloads), (1, 3))
+
+    def test_storage_reload_counters(self):
+        store = multiprocess_file_storage.MultiprocessFileStorage(
+            self.filename, 'key')
+        store._backend = multiprocess_file_storage._MultiprocessStorageBackend(
+            self.filename)
+        store.put(_create_test_credentials())
+        self.assertIsNotNone(store.get())
+        self.assertEqual(store.reloads, 1)
+        self.assertEqual(store.skipped_reloads, 2)
 
-    def test__load_credentials_file_no_file_version(self):
-        contents = six.StringIO('{}')
+    def test_compaction(self):
+        credentials = _create_test_credentials()
+        reader = self._load()
+        writer = self._load()
+
+        writer.acquire_lock()
+        try:
+            for index in range(
+                    multiprocess_file_storage.COMPACTION_MIN_RECORDS):
+                credentials.access_token = str(index)
+                writer.locked_put('key', credentials)
+            writer.locked_put('other', credentials)
+        finally:
+            writer.release_lock()
+
+        lines = self._read_lines()
         self.assertEqual(
-            multiprocess_file_storage._load_credentials_file(contents), {})
+            [line['key'] for line in lines[1:]], ['key', 'other'])
+        self.assertEqual(writer._num_records, 2)
 
-    def test__load_credentials_file_bad_file_version(self):
-        contents = six.StringIO(json.dumps({'file_version': 1}))
+        # A process which read the file before it was compacted reads it
+        # again from the start.
+        self._load(reader)
         self.assertEqual(
-            multiprocess_file_storage._load_credentials_file(contents), {})
+            sorted(reader._encoded_credentials), ['key', 'other'])
+        self.assertEqual(
+            self._get(reader, 'key').access_token,
+            str(multiprocess_file_storage.COMPACTION_MIN_RECORDS - 1))
+
+    def _compact(self, backend):
+        backend.acquire_lock()
+        try:
+            backend._compact()
+        finally:
+            backend.release_lock()
+
+    def test_get_after_delete_compacted_by_other_process(self):
+        reader = self._load()
+        writer = self._load()
+        writer.acquire_lock()
+        try:
+            writer.locked_put('a', _create_test_credentials())
+            writer.locked_put('b', _create_test_credentials())
+        finally:
+            writer.release_lock()
+        self.assertIsNotNone(self._get(reader, 'a'))
+
+        writer.acquire_lock()
+        try:
+            writer.locked_delete('a')
+        finally:
+            writer.release_lock()
+        self._compact(writer)
+
+        self.assertIsNone(self._get(reader, 'a'))
+        self.assertNotIn('a', reader._credentials)
+        self.assertIsNotNone(self._get(reader, 'b'))
+
+    def test_get_after_file_overwritten_with_garbage(self):
+        reader = self._load()
+        writer = self._load()
+        writer.acquire_lock()
+        try:
+            writer.locked_put('a', _create_test_credentials())
+        finally:
+            writer.release_lock()
+        self.assertIsNotNone(self._get(reader, 'a'))
+
+        self._write_file(b'{[')
+        self.assertIsNone(self._get(reader, 'a'))
+
+    def test_get_after_credential_replaced_with_invalid_one(self):
+        reader = self._load()
+        writer = self._load()
+        writer.acquire_lock()
+        try:
+            writer.locked_put('a', _create_test_credentials())
+        finally:
+            writer.release_lock()
+        self.assertIsNotNone(self._get(reader, 'a'))
+
+        writer.acquire_lock()
+        try:
+            writer._write_record('a', '123')
+        finally:
+            writer.release_lock()
+        self.assertIsNone(self._get(reader, 'a'))
+        self.assertNotIn('a', reader._credentials)
+
+    def test_read_only_put_survives_reread(self):
+        backend = self._load()
+        credentials = _create_test_credentials()
+        backend._process_lock = mock.Mock()
+        backend._process_lock.acquire.return_value = False
+        backend.acquire_lock()
+        try:
+            backend.locked_put('key', credentials)
+        finally:
+            backend.release_lock()
+        self.assertEqual(backend._unsaved, set(['key']))
+
+        # Another process rewrites the file without the credentials.
+        writer = self._load()
+        writer.acquire_lock()
+        try:
+            writer.locked_put('other', _create_test_credentials())
+        finally:
+            writer.release_lock()
+        self._compact(writer)
+
+        backend.acquire_lock()
+        try:
+            self.assertIs(backend.locked_get('key'), credentials)
+        finally:
+            backend.release_lock()
+
+        # Once written to the file, the credentials are no longer unsaved.
+        backend._process_lock = writer._process_lock
+        backend.acquire_lock()
+        try:
+            backend.locked_put('key', credentials)
+        finally:
+            backend.release_lock()
+        self.assertEqual(backend._unsaved, set())
+
+    def test_load_version_2_file(self):
+        credentials = _create_test_credentials()
+        encoded = multiprocess_file_storage._encode_credential(credentials)
+        self._write_file(six.b(json.dumps({
+            'file_version': 2,
+            'credentials': {'key': encoded, 'invalid': '123'},
+        })))
+
+        backend = self._load()
+        self.assertEqual(
+            backend._encoded_credentials, {'key': encoded, 'invalid': '123'})
+        self.assertIsNone(self._get(backend, 'invalid'))
+        self.assertEqual(
+            self._get(backend, 'key').access_token, credentials.access_token)
+
+        # The first write rewrites the file in the current format.
+        backend.acquire_lock()
+        try:
+            backend.locked_put('new', credentials)
+        finally:
+            backend.release_lock()
+        lines = self._read_lines()
+        self.assertEqual(lines[0]['file_version'], 3)
+        self.assertEqual(
+            sorted(line['key'] for line in lines[1:]), ['key', 'new'])
+
+    def _assert_overwritten(self):
+        backend = self._load()
+        self.assertEqual(backend._encoded_credentials, {})
+        backend.acquire_lock()
+        try:
+            backend.locked_put('key', _create_test_credentials())
+        finally:
+            backend.release_lock()
+        lines = self._read_lines()
+        self.assertEqual(lines[0]['file_version'], 3)
+        self.assertEqual([line['key'] for line in lines[1:]], ['key'])
+
+    def test_load_invalid_json(self):
+        self._write_file(b'{[')
+        self._assert_overwritten()
+
+    def test_load_no_file_version(self):
+        self._write_file(b'{}')
+        self._assert_overwritten()
+
+    def test_load_bad_file_version(self):
+        self._write_file(six.b(json.dumps({'file_version': 1})))
+        self._assert_overwritten()
+
+    def test_load_header_without_generation(self):
+        self._write_file(
+            six.b(json.dumps({'file_version': 3})) + b'\n',
+            multiprocess_file_storage._make_record(
+                'key', multiprocess_file_storage._encode_credential(
+                    _create_test_credentials())))
+        self._assert_overwritten()
+
+    def test_load_record_with_invalid_key(self):
+        credentials = _create_test_credentials()
+        self._write_file(
+            multiprocess_file_storage._make_header('gen'),
+            six.b(json.dumps({'key': ['invalid'], 'credential': '123'})) +
+            b'\n',
+            multiprocess_file_storage._make_record(
+                'key', multiprocess_file_storage._encode_credential(
+                    credentials)))
+
+        backend = self._load()
+        self.assertEqual(list(backend._encoded_credentials), ['key'])
+        self.assertEqual(
+            self._get(backend, 'key').access_token, credentials.access_token)
+
+    def test_acquire_lock_releases_locks_on_load_error(self):
+        backend = multiprocess_file_storage._MultiprocessStorageBackend(
+            self.filename)
+        backend._process_lock = mock.Mock()
+        backend._process_lock.acquire.return_value = True
+        with mock.patch.object(backend, '_load_credentials',
+                               side_effect=ValueError):
+            with self.assertRaises(ValueError):
+                backend.acquire_lock()
+        self.assertIsNone(backend._file)
+        backend._process_lock.release.assert_called_once_with()
+        self.assertTrue(backend._thread_lock.acquire(False))
+        backend._thread_lock.release()
+
+    def test_load_invalid_and_partial_records(self):
+        credentials = _create_test_credentials()
+        self._write_file(
+            multiprocess_file_storage._make_header('gen'),
+            b'[]\n',
+            multiprocess_file_storage._make_record('invalid', '123'),
+            multiprocess_file_storage._make_record(
+                'key', multiprocess_file_storage._encode_credential(
+                    credentials)),
+            b'{"key": "par')
+
+        backend = self._load()
+        self.assertIsNone(self._get(backend, 'invalid'))
+        self.assertEqual(
+            self._get(backend, 'key').access_token, credentials.access_token)
+        self.assertTrue(backend._needs_rewrite)
+
+        # The partially written record is discarded by the next write.
+        backend.acquire_lock()
+        try:
+            backend.locked_delete('missing')
+        finally:
+            backend.release_lock()
+        lines = self._read_lines()
+        self.assertNotEqual(lines[0]['generation'], 'gen')
+        self.assertEqual([line['key'] for line in lines[1:]], ['key'])
+
+    def test_read_only_load_keeps_partial_record(self):
+        self._write_file(
+            multiprocess_file_storage._make_header('gen'), b'{"key": "par')
+        backend = multiprocess_file_storage._MultiprocessStorageBackend(
+            self.filename)
+        backend._process_lock = mock.Mock()
+        backend._process_lock.acquire.return_value = False
+        backend.acquire_lock()
+        try:
+            self.assertTrue(backend._read_only)
+            self.assertFalse(backend._needs_rewrite)
+            backend.locked_put('key', _create_test_credentials())
+        finally:
+            backend.release_lock()
+        with open(self.filename, 'rb') as file_:
+            self.assertEqual(file_.read().count(b'\n'), 1)
 
     def test__load_credentials_no_open_file(self):
         backend = multiprocess_file_storage._get_backend(self.filename)
@@ -330,5 +719,93 @@ class MultiprocessStorageUnitTests(unittest.TestCase):
         self.assertTrue(backend._refresh_predicate(credentials))
 
 
+class ShardedMultiprocessFileStorageTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'credentials')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test__shard_filename(self):
+        shard_filename = multiprocess_file_storage._shard_filename
+        self.assertEqual(
+            shard_filename(self.filename, 'key', 8),
+            shard_filename(self.filename, u'key', 8))
+        filenames = set(
+            shard_filename(self.filename, 'user-{0}'.format(index), 4)
+            for index in range(100))
+        self.assertEqual(
+            filenames,
+            set('{0}.{1}'.format(self.filename, shard)
+                for shard in range(4)))
+        self.assertEqual(
+            shard_filename(self.filename, 'key', 1),
+            '{0}.0'.format(self.filename))
+
+    def test_invalid_num_shards(self):
+        with self.assertRaises(ValueError):
+            multiprocess_file_storage.ShardedMultiprocessFileStorage(
+                self.filename, 'key', num_shards=0)
+
+    def _find_keys_in_different_shards(self, num_shards):
+        first_filename = multiprocess_file_storage._shard_filename(
+            self.filename, 'key-0', num_shards)
+        for index in range(1, 100):  # pragma: NO BRANCH
+            key = 'key-{0}'.format(index)
+            if multiprocess_file_storage._shard_filename(
+                    self.filename, key, num_shards) != first_filename:
+                return 'key-0', key
+
+    def test_basic_operations(self):
+        first_key, second_key = self._find_keys_in_different_shards(4)
+        first = multiprocess_file_storage.ShardedMultiprocessFileStorage(
+            self.filename, first_key, num_shards=4)
+        second = multiprocess_file_storage.ShardedMultiprocessFileStorage(
+            self.filename, second_key, num_shards=4)
+        self.assertIsNot(first._backend, second._backend)
+
+        first.put(_create_test_credentials())
+        credentials = _create_test_credentials()
+        credentials.access_token = 'bar'
+        second.put(credentials)
+
+        self.assertEqual(first.get().access_token, 'foo')
+        self.assertEqual(second.get().access_token, 'bar')
+        self.assertTrue(os.path.exists(
+            multiprocess_file_storage._shard_filename(
+                self.filename, first_key, 4)))
+
+        # Another storage of the same key finds the same credentials.
+        again = multiprocess_file_storage.ShardedMultiprocessFileStorage(
+            self.filename, first_key, num_shards=4)
+        self.assertIs(again._backend, first._backend)
+        self.assertEqual(again.get().access_token, 'foo')
+
+        first.delete()
+        self.assertIsNone(first.get())
+        self.assertEqual(second.get().access_token, 'bar')
+
+    def test_locks_shards_independently(self):
+        first_key, second_key = self._find_keys_in_different_shards(2)
+        first = multiprocess_file_storage.ShardedMultiprocessFileStorage(
+            self.filename, first_key, num_shards=2)
+        second = multiprocess_file_storage.ShardedMultiprocessFileStorage(
+            self.filename, second_key, num_shards=2)
+
+        # Hold the lock of the first shard in another process.
+        def child_process(die_event, ready_event):  # pragma: NO COVER
+            lock = fasteners.InterProcessLock(
+                '{0}.lock'.format(first._backend._filename))
+            with lock:
+                ready_event.set()
+                die_event.wait()
+
+        with scoped_child_process(child_process):
+            second.put(_create_test_credentials())
+            self.assertFalse(second._backend._read_only)
+
+
 if __name__ == '__main__':  # pragma: NO COVER
     unittest.main()
@@ -0,0 +1,196 @@
+# Copyright 2016 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for oauth2client.contrib.sqlite_storage."""
+
+import datetime
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from oauth2client import client
+from oauth2client.contrib import sqlite_storage
+from tests import http_mock
+
+
+def _create_test_credentials(access_token='foo'):
+    token_expiry = (
+        datetime.datetime.utcnow() + datetime.timedelta(seconds=3600))
+    return client.OAuth2Credentials(
+        access_token, 'test-client-id', 'cOuDdkfjxxnv+', '1/0/a.df219fjls0',
+        token_expiry, 'https://www.google.com/accounts/o8/oauth2/token',
+        'refresh_checker/1.0')
+
+
+def _put_in_child_process(filename, key, access_token):  # pragma: NO COVER
+    storage = sqlite_storage.SQLiteStorage(filename, key)
+    storage.put(_create_test_credentials(access_token))
+
+
+class SQLiteStorageTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'credentials.db')
+        self.storage = sqlite_storage.SQLiteStorage(self.filename, 'key')
+
+    def tearDown(self):
+        for connection in getattr(
+                sqlite_storage._local, 'connections', {}).values():
+            connection.close()
+        sqlite_storage._local.__dict__.clear()
+        shutil.rmtree(self.directory)
+
+    def test_basic_operations(self):
+        self.assertIsNone(self.storage.get())
+
+        self.storage.put(_create_test_credentials())
+        credentials = self.storage.get()
+        self.assertEqual(credentials.access_token, 'foo')
+        self.assertIs(credentials.store, self.storage)
+
+        # Other keys are stored in other rows.
+        other = sqlite_storage.SQLiteStorage(self.filename, 'other')
+        self.assertIsNone(other.get())
+        other.put(_create_test_credentials('bar'))
+        self.assertEqual(self.storage.get().access_token, 'foo')
+
+        self.storage.delete()
+        self.assertIsNone(self.storage.get())
+        self.assertEqual(other.get().access_token, 'bar')
+
+    def test_wal_mode(self):
+        self.storage.get()
+        connection = sqlite_storage._get_connection(
+            self.storage._filename, sqlite_storage.DEFAULT_TIMEOUT)
+        journal_mode, = connection.execute('PRAGMA journal_mode').fetchone()
+        self.assertEqual(journal_mode, 'wal')
+
+    def test_connection_per_thread_and_process(self):
+        connection = self.storage._connection()
+        self.assertIs(self.storage._connection(), connection)
+        with mock.patch('os.getpid', return_value=os.getpid() + 1):
+            self.assertIsNot(self.storage._connection(), connection)
+
+    def test_put_without_get_overwrites(self):
+        self.storage.put(_create_test_credentials())
+        self.storage.put(_create_test_credentials('bar'))
+        self.assertEqual(self.storage.get().access_token, 'bar')
+
+    def _put_concurrently(self, access_token):
+        other = sqlite_storage.SQLiteStorage(self.filename, 'key')
+        other.put(_create_test_credentials(access_token))
+
+    def test_put_after_get_compares_version(self):
+        self.storage.put(_create_test_credentials())
+
+        self.storage.acquire_lock()
+        try:
+            self.storage.locked_get()
+            self._put_concurrently('other')
+            self.storage.locked_put(_create_test_credentials('bar'))
+        finally:
+            self.storage.release_lock()
+        self.assertEqual(self.storage.get().access_token, 'other')
+
+        self.storage.acquire_lock()
+        try:
+            self.storage.locked_get()
+            self.storage.locked_put(_create_test_credentials('bar'))
+            self.storage.locked_put(_create_test_credentials('baz'))
+        finally:
+            self.storage.release_lock()
+        self.assertEqual(self.storage.get().access_token, 'baz')
+
+    def test_put_after_get_of_missing_row(self):
+        self.storage.acquire_lock()
+        try:
+            self.assertIsNone(self.storage.locked_get())
+            self._put_concurrently('other')
+            self.storage.locked_put(_create_test_credentials('bar'))
+        finally:
+            self.storage.release_lock()
+        self.assertEqual(self.storage.get().access_token, 'other')
+
+    def test_put_after_delete(self):
+        self.storage.put(_create_test_credentials())
+        self.storage.acquire_lock()
+        try:
+            self.storage.locked_get()
+            self.storage.locked_delete()
+            self.storage.locked_put(_create_test_credentials('bar'))
+        finally:
+            self.storage.release_lock()
+        self.assertEqual(self.storage.get().access_token, 'bar')
+
+    def test_get_invalid_credential(self):
+        self.storage.get()
+        self.storage._connection().execute(
+            sqlite_storage._UPSERT, ('key', '{[', 'version'))
+        self.assertIsNone(self.storage.get())
+
+    def test_get_credential_without_class(self):
+        self.storage.get()
+        for content in ('{}', '[]', '{"_module": "oauth2client.missing"}',
+                        '{"_module": "oauth2client.client", '
+                        '"_class": "Missing"}'):
+            self.storage._connection().execute(
+                sqlite_storage._UPSERT, ('key', content, 'version'))
+            self.assertIsNone(self.storage.get())
+
+    def test_refresh_reads_credentials_refreshed_by_another_process(self):
+        credentials = _create_test_credentials()
+        credentials.set_store(self.storage)
+        self.storage.put(credentials)
+        self._put_concurrently('other')
+
+        http = http_mock.HttpMock(data=json.dumps({
+            'access_token': 'new_token',
+            'expires_in': 3600,
+        }))
+        credentials.refresh(http)
+        self.assertEqual(credentials.access_token, 'other')
+        self.assertEqual(http.requests, 0)
+
+    def test_refresh_writes_refreshed_credentials(self):
+        credentials = _create_test_credentials()
+        credentials.set_store(self.storage)
+        self.storage.put(credentials)
+
+        http = http_mock.HttpMock(data=json.dumps({
+            'access_token': 'new_token',
+            'expires_in': 3600,
+        }))
+        credentials.refresh(http)
+        self.assertEqual(http.requests, 1)
+        self.assertEqual(self.storage.get().access_token, 'new_token')
+
+    def test_shared_between_processes(self):
+        self.storage.put(_create_test_credentials())
+        process = multiprocessing.Process(
+            target=_put_in_child_process,
+            args=(self.filename, 'key', 'child'))
+        process.start()
+        process.join(5)
+        self.assertEqual(process.exitcode, 0)
+        self.assertEqual(self.storage.get().access_token, 'child')
+
+
+if __name__ == '__main__':  # pragma: NO COVER
+    unittest.main()
@@ -0,0 +1,183 @@
+# Copyright 2016 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for oauth2client.contrib.token_refresher."""
+
+import datetime
+import json
+import threading
+import unittest
+
+import mock
+from six.moves import http_client
+
+from oauth2client import client
+from oauth2client.contrib import token_refresher
+from tests import http_mock
+
+
+NOW = datetime.datetime(2016, 1, 1, 12, 0, 0)
+TOKEN_URI = 'https://example.com/token'
+
+
+def _make_credentials(access_token='foo', expires_in=3600):
+    token_expiry = None
+    if expires_in is not None:
+        token_expiry = NOW + datetime.timedelta(seconds=expires_in)
+    return client.OAuth2Credentials(
+        access_token, 'client_id', 'client_secret', 'refresh_token',
+        token_expiry, TOKEN_URI, None)
+
+
+def _token_http(status=http_client.OK, access_token='new_token'):
+    token_response = {'access_token': access_token, 'expires_in': 3600}
+    return http_mock.HttpMock(
+        headers={'status': status},
+        data=json.dumps(token_response).encode('utf-8'))
+
+
+@mock.patch('oauth2client.client._UTCNOW', return_value=NOW)
+class TokenRefresherTests(unittest.TestCase):
+
+    def _make_refresher(self, http, **kwargs):
+        kwargs.setdefault('jitter_secs', 0)
+        return token_refresher.TokenRefresher(
+            http_factory=lambda: http, **kwargs)
+
+    def test_schedule(self, utcnow):
+        expiring = _make_credentials(expires_in=3600)
+        missing = _make_credentials(access_token=None)
+        forever = _make_credentials(expires_in=None)
+        refresher = self._make_refresher(
+            None, credentials=[expiring, missing, forever],
+            refresh_ahead_secs=600)
+        # Adding credentials twice has no effect.
+        refresher.add(expiring)
+
+        self.assertEqual(refresher.next_refresh_times(), {
+            expiring: NOW + datetime.timedelta(seconds=3000),
+            missing: NOW,
+            forever: None,
+        })
+        self.assertEqual(refresher.failure_counts(), {
+            expiring: 0,
+            missing: 0,
+            forever: 0,
+        })
+
+    def test_schedule_short_lifetime(self, utcnow):
+        credentials = _make_credentials(expires_in=60)
+        refresher = self._make_refresher(None, credentials=[credentials],
+                                         refresh_ahead_secs=600)
+        self.assertEqual(refresher.next_refresh_times()[credentials],
+                         NOW + datetime.timedelta(seconds=30))
+
+    @mock.patch('random.uniform', return_value=20)
+    def test_schedule_jitter(self, uniform, utcnow):
+        credentials = _make_credentials(expires_in=3600)
+        refresher = token_refresher.TokenRefresher(
+            credentials=[credentials], refresh_ahead_secs=600, jitter_secs=30)
+        self.assertEqual(refresher.next_refresh_times()[credentials],
+                         NOW + datetime.timedelta(seconds=2980))
+        uniform.assert_called_once_with(0, 30)
+
+    def test_refresh_due(self, utcnow):
+        due = _make_credentials(expires_in=60)
+        not_due = _make_credentials(expires_in=3600)
+        http = _token_http()
+        refresher = self._make_refresher(http, credentials=[due, not_due],
+                                         refresh_ahead_secs=600)
+
+        utcnow.return_value = NOW + datetime.timedelta(seconds=30)
+        self.assertEqual(refresher.refresh_due(), 1)
+        self.assertEqual(due.access_token, 'new_token')
+        self.assertEqual(not_due.access_token, 'foo')
+        self.assertEqual(http.requests, 1)
+        self.assertEqual(refresher.refresh_due(), 0)
+
+        # Rescheduled off the new token_expiry.
+        self.assertEqual(
+            refresher.next_refresh_times()[due],
+            utcnow.return_value + datetime.timedelta(seconds=3000))
+
+    def test_refresh_failure_backoff(self, utcnow):
+        credentials = _make_credentials(access_token=None)
+        http = _token_http(status=http_client.SERVICE_UNAVAILABLE)
+        refresher = self._make_refresher(
+            http, credentials=[credentials], min_backoff_secs=2,
+            max_backoff_secs=5)
+
+        for failures, backoff in ((1, 2), (2, 4), (3, 5), (4, 5)):
+            now = utcnow.return_value
+            with mock.patch('oauth2client.contrib.token_refresher.logger'):
+                self.assertEqual(refresher.refresh_due(), 1)
+            self.assertEqual(refresher.failure_counts()[credentials],
+                             failures)
+            next_time = refresher.next_refresh_times()[credentials]
+            self.assertEqual(next_time,
+                             now + datetime.timedelta(seconds=backoff))
+            # Nothing is retried before the backoff has passed.
+            self.assertEqual(refresher.refresh_due(), 0)
+            utcnow.return_value = next_time
+
+        self.assertEqual(http.requests, 4)
+        self.assertIsNone(credentials.access_token)
+
+    def test_refresh_failure_resets(self, utcnow):
+        credentials = _make_credentials(access_token=None)
+        http = _token_http(status=http_client.SERVICE_UNAVAILABLE)
+        refresher = self._make_refresher(http, credentials=[credentials])
+
+        with mock.patch('oauth2client.contrib.token_refresher.logger'):
+            refresher.refresh_due()
+        self.assertEqual(refresher.failure_counts()[credentials], 1)
+
+        http.response_headers = {'status': http_client.OK}
+        utcnow.return_value = refresher.next_refresh_times()[credentials]
+        self.assertEqual(refresher.refresh_due(), 1)
+        self.assertEqual(refresher.failure_counts()[credentials], 0)
+        self.assertEqual(credentials.access_token, 'new_token')
+
+    def test_remove(self, utcnow):
+        credentials = _make_credentials(access_token=None)
+        http = _token_http()
+        refresher = self._make_refresher(http, credentials=[credentials])
+        refresher.remove(credentials)
+        refresher.remove(credentials)
+        self.assertEqual(refresher.next_refresh_times(), {})
+        self.assertEqual(refresher.refresh_due(), 0)
+        self.assertEqual(http.requests, 0)
+
+    def test_start_stop(self, utcnow):
+        credentials = _make_credentials(access_token=None)
+        refreshed = threading.Event()
+
+        def http_factory():
+            refreshed.set()
+            return _token_http()
+
+        refresher = token_refresher.TokenRefresher(
+            http_factory=http_factory, jitter_secs=0)
+        refresher.stop()
+        refresher.start()
+        refresher.start()
+        refresher.add(credentials)
+        self.assertTrue(refreshed.wait(5))
+        refresher.stop(5)
+        self.assertIsNone(refresher._thread)
+        self.assertEqual(credentials.access_token, 'new_token')
+
+
+if __name__ == '__main__':  # pragma: NO COVER
+    unittest.main()
@@ -282,3 +282,53 @@ class Test_parse_unique_urlencoded(unittest.TestCase):
         content = 'a=b&a=d'
         with self.assertRaises(ValueError):
             _helpers.parse_unique_urlencoded(content)
+
+
+class Test_LRUCache(unittest.TestCase):
+
+    def test_constructor_bad_size(self):
+        with self.assertRaises(ValueError):
+            _helpers.LRUCache(0)
+
+    def test_get_set_delete(self):
+        cache = _helpers.LRUCache(2)
+        self.assertIsNone(cache.get('foo'))
+        self.assertEqual(cache.get('foo', default=1), 1)
+        cache.set('foo', 'bar')
+        self.assertEqual(cache.get('foo'), 'bar')
+        self.assertEqual(len(cache), 1)
+        cache.delete('foo')
+        cache.delete('foo')
+        self.assertIsNone(cache.get('foo'))
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 3)
+
+    def test_evicts_least_recently_used(self):
+        cache = _helpers.LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        # Touch 'a' so that 'b' is the least recently used.
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_get_invalid(self):
+        cache = _helpers.LRUCache(2)
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a', is_valid=lambda value: value > 1))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.hits, 0)
+        self.assertEqual(cache.misses, 1)
+
+    def test_clear(self):
+        cache = _helpers.LRUCache(2)
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('b')
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.hits, 0)
+        self.assertEqual(cache.misses, 0)
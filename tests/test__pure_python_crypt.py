@@ -14,10 +14,13 @@
 
 """Unit tests for oauth2client._pure_python_crypt."""
 
+import copy
 import os
+import pickle
 import unittest
 
 import mock
+from pyasn1.type import univ
 from pyasn1_modules import pem
 import rsa
 import six
@@ -25,6 +28,7 @@ import six
 from oauth2client import _helpers
 from oauth2client import _pure_python_crypt
 from oauth2client import crypt
+from oauth2client import service_account
 
 
 class TestRsaVerifier(unittest.TestCase):
@@ -112,6 +116,137 @@ class TestRsaVerifier(unittest.TestCase):
             load_pem.assert_called_once_with(cert_bytes, 'CERTIFICATE')
 
 
+class Test__bit_list_to_bytes(unittest.TestCase):
+
+    def test_empty(self):
+        self.assertEqual(_pure_python_crypt._bit_list_to_bytes([]), b'')
+
+    def test_full_bytes(self):
+        bits = [1, 0, 0, 0, 0, 0, 0, 1] + [0] * 8 + [1] * 8
+        self.assertEqual(_pure_python_crypt._bit_list_to_bytes(bits),
+                         b'\x81\x00\xff')
+
+    def test_partial_byte(self):
+        bits = [0, 0, 0, 0, 0, 0, 0, 1, 1, 0, 1]
+        self.assertEqual(_pure_python_crypt._bit_list_to_bytes(bits),
+                         b'\x01\xa0')
+
+    def test_bools(self):
+        bits = (True, False, True, True)
+        self.assertEqual(_pure_python_crypt._bit_list_to_bytes(bits),
+                         b'\xb0')
+
+    def test_bit_string(self):
+        bits = [0, 0, 0, 0, 0, 0, 0, 1, 1, 0, 1]
+        self.assertEqual(
+            _pure_python_crypt._bit_list_to_bytes(univ.BitString(bits)),
+            b'\x01\xa0')
+
+
+class Test__x509_public_key_bytes(unittest.TestCase):
+
+    PUBLIC_CERT_FILENAME = os.path.join(os.path.dirname(__file__),
+                                        'data', 'public_cert.pem')
+
+    def _load_der(self):
+        with open(self.PUBLIC_CERT_FILENAME, 'rb') as fh:
+            return rsa.pem.load_pem(fh.read(), 'CERTIFICATE')
+
+    def test_matches_strict(self):
+        der = self._load_der()
+        self.assertEqual(
+            _pure_python_crypt._x509_public_key_bytes(der),
+            _pure_python_crypt._x509_public_key_bytes_strict(der))
+
+    def test_without_version(self):
+        public_key, private_key = rsa.newkeys(512)
+        der = rsa.pem.load_pem(
+            crypt._make_self_signed_cert(public_key, private_key),
+            'CERTIFICATE')
+        # Drop the explicit version, as in a v1 certificate.
+        cert_start, cert_end = _pure_python_crypt._read_der(der, 0, 0x30)
+        tbs_start, tbs_end = _pure_python_crypt._read_der(
+            der, cert_start, 0x30)
+        self.assertEqual(six.indexbytes(der, tbs_start), 0xa0)
+        version_end = _pure_python_crypt._skip_der(der, tbs_start)
+        v1_der = crypt._der(
+            0x30, crypt._der(0x30, der[version_end:tbs_end]),
+            der[tbs_end:cert_end])
+        key_bytes = _pure_python_crypt._x509_public_key_bytes(v1_der)
+        self.assertEqual(rsa.PublicKey.load_pkcs1(key_bytes, 'DER'),
+                         public_key)
+
+    def test_unused_bytes(self):
+        with self.assertRaises(ValueError):
+            _pure_python_crypt._x509_public_key_bytes(
+                self._load_der() + b'extra')
+
+    def test_truncated(self):
+        der = self._load_der()
+        for length in (0, 1, 3, 100):
+            with self.assertRaises(ValueError):
+                _pure_python_crypt._x509_public_key_bytes(der[:length])
+
+    def test_wrong_tag(self):
+        with self.assertRaises(ValueError):
+            _pure_python_crypt._x509_public_key_bytes(
+                b'\x31' + self._load_der()[1:])
+
+    def test_truncated_tbs_certificate(self):
+        for der in (b'\x30\x02\x30\x00', b'\x30\x04\x30\x02\xa0\x00',
+                    b'\x30\x05\x30\x03\x02\x01\x01'):
+            with self.assertRaises(ValueError):
+                _pure_python_crypt._x509_public_key_bytes(der)
+
+    def test_reads_within_tbs_certificate(self):
+        # The subjectPublicKeyInfo follows, rather than is part of, the
+        # tbsCertificate.
+        tbs = crypt._der(0x30, *[crypt._der(0x02, b'\x01')] * 5)
+        key_info = crypt._der(
+            0x30, crypt._der(0x30), crypt._der(0x03, b'\x00key'))
+        with self.assertRaises(ValueError):
+            _pure_python_crypt._x509_public_key_bytes(
+                crypt._der(0x30, tbs, key_info))
+        # Once moved into the tbsCertificate, the key is found.
+        tbs = crypt._der(0x30, *[crypt._der(0x02, b'\x01')] * 5 + [key_info])
+        self.assertEqual(
+            _pure_python_crypt._x509_public_key_bytes(crypt._der(0x30, tbs)),
+            b'key')
+
+    def test_invalid_length(self):
+        for length_byte in (b'\x80', b'\x85'):
+            with self.assertRaises(ValueError):
+                _pure_python_crypt._x509_public_key_bytes(
+                    b'\x30' + length_byte + b'\x00' * 8)
+
+    def test_truncated_long_length(self):
+        with self.assertRaises(ValueError):
+            _pure_python_crypt._x509_public_key_bytes(b'\x30\x82\x01')
+
+    def test_unused_bits(self):
+        der = self._load_der()
+        key_bytes = _pure_python_crypt._x509_public_key_bytes(der)
+        key_start = der.index(key_bytes)
+        self.assertEqual(six.indexbytes(der, key_start - 1), 0)
+        bad_der = der[:key_start - 1] + b'\x01' + der[key_start:]
+        with self.assertRaises(ValueError):
+            _pure_python_crypt._x509_public_key_bytes(bad_der)
+
+    @mock.patch('oauth2client._pure_python_crypt.STRICT_X509_PARSING',
+                new=True)
+    def test_strict_parsing(self):
+        with open(self.PUBLIC_CERT_FILENAME, 'rb') as fh:
+            public_cert = fh.read()
+        strict_func = _pure_python_crypt._x509_public_key_bytes_strict
+        with mock.patch.object(_pure_python_crypt,
+                               '_x509_public_key_bytes_strict',
+                               wraps=strict_func) as strict:
+            verifier = crypt.RsaVerifier.from_string(
+                public_cert, is_x509_cert=True)
+        self.assertIsInstance(verifier._pubkey, rsa.key.PublicKey)
+        strict.assert_called_once_with(self._load_der())
+
+
 class TestRsaSigner(unittest.TestCase):
 
     PKCS1_KEY_FILENAME = os.path.join(os.path.dirname(__file__),
@@ -181,3 +316,53 @@ class TestRsaSigner(unittest.TestCase):
         key_bytes = 'bogus-key'
         with self.assertRaises(ValueError):
             crypt.RsaSigner.from_string(key_bytes)
+
+    def test_sign_matches_rsa(self):
+        signer = crypt.RsaSigner.from_string(self._load_pkcs1_key_bytes())
+        for message in (b'', b'foo', u'\u2603', b'x' * 1000):
+            expected = rsa.pkcs1.sign(_helpers._to_bytes(message, 'utf-8'),
+                                      signer._key, 'SHA-256')
+            self.assertEqual(signer.sign(message), expected)
+
+    def test_sign_updates_blinding(self):
+        signer = crypt.RsaSigner.from_string(self._load_pkcs1_key_bytes())
+        n = signer._key.n
+        blinding, unblinding = signer._blinding, signer._unblinding
+        self.assertEqual(blinding * pow(unblinding, signer._key.e, n) % n, 1)
+
+        signer.sign(b'foo')
+        self.assertEqual(signer._blinding, blinding * blinding % n)
+        self.assertEqual(signer._unblinding, unblinding * unblinding % n)
+
+    def test_sign_self_check(self):
+        signer = crypt.RsaSigner.from_string(self._load_pkcs1_key_bytes())
+        # A blinding factor without a matching inverse gives a bad signature.
+        signer._unblinding += 1
+        with self.assertRaises(rsa.pkcs1.CryptoError):
+            signer.sign(b'foo')
+
+    def _assert_copy_signs(self, signer, copied):
+        self.assertIsNot(copied._blinding_lock, signer._blinding_lock)
+        self.assertNotEqual(copied._blinding, signer._blinding)
+        self.assertEqual(copied._key, signer._key)
+        self.assertEqual(copied.sign(b'foo'), signer.sign(b'foo'))
+
+    def test_pickle(self):
+        signer = crypt.RsaSigner.from_string(self._load_pkcs1_key_bytes())
+        self._assert_copy_signs(signer, pickle.loads(pickle.dumps(signer)))
+
+    def test_deepcopy(self):
+        signer = crypt.RsaSigner.from_string(self._load_pkcs1_key_bytes())
+        self._assert_copy_signs(signer, copy.deepcopy(signer))
+
+    def test_pickle_service_account_credentials(self):
+        signer = crypt.RsaSigner.from_string(self._load_pkcs1_key_bytes())
+        credentials = service_account.ServiceAccountCredentials(
+            'name@email.com', signer, scopes='scope')
+        copied = pickle.loads(pickle.dumps(credentials))
+        self.assertEqual(copied._signer.sign(b'foo'), signer.sign(b'foo'))
+
+    def test_key_too_small(self):
+        _, private_key = rsa.newkeys(256)
+        with self.assertRaises(OverflowError):
+            crypt.RsaSigner(private_key)
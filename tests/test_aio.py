@@ -0,0 +1,428 @@
+# Copyright 2016 Google Inc. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for oauth2client.aio."""
+
+import asyncio
+import datetime
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+import mock
+from six.moves import http_client
+from six.moves import urllib
+
+from oauth2client import aio
+from oauth2client import client
+from oauth2client import crypt
+from oauth2client import service_account
+from oauth2client import transport
+from oauth2client.contrib import multiprocess_file_storage
+from tests import http_mock
+
+
+TOKEN_URI = 'https://example.com/token'
+
+
+class _Request(object):
+    """Async request callable returning canned responses, in order."""
+
+    def __init__(self, responses, gate=None):
+        self.responses = list(responses)
+        self.gate = gate
+        self.calls = []
+
+    async def __call__(self, uri, method='GET', body=None, headers=None):
+        self.calls.append({
+            'uri': uri,
+            'method': method,
+            'body': body,
+            # The caller may reuse the headers for a retry.
+            'headers': None if headers is None else dict(headers),
+        })
+        if self.gate is not None:
+            await self.gate.wait()
+        status, content = self.responses.pop(0)
+        return http_mock.ResponseMock({'status': status}), content
+
+
+def _datafile(filename):
+    with open(os.path.join(os.path.dirname(__file__), 'data', filename),
+              'rb') as file_obj:
+        return file_obj.read()
+
+
+def _token_response(access_token='new_token', expires_in=3600):
+    return http_client.OK, json.dumps({
+        'access_token': access_token,
+        'expires_in': expires_in,
+    }).encode('utf-8')
+
+
+def _make_credentials(access_token=None, expires_in=None):
+    token_expiry = None
+    if expires_in is not None:
+        token_expiry = (datetime.datetime.utcnow() +
+                        datetime.timedelta(seconds=expires_in))
+    return client.OAuth2Credentials(
+        access_token, 'client_id', 'client_secret', 'refresh_token',
+        token_expiry, TOKEN_URI, 'user-agent/1.0')
+
+
+class AioTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def run_coroutine(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+
+class Test_get_access_token(AioTestCase):
+
+    def test_refreshes(self):
+        credentials = _make_credentials()
+        request = _Request([_token_response()])
+        token_info = self.run_coroutine(
+            aio.get_access_token(credentials, request))
+
+        self.assertEqual(token_info.access_token, 'new_token')
+        self.assertEqual(credentials.access_token, 'new_token')
+        self.assertIsNotNone(credentials.token_expiry)
+        self.assertEqual(len(request.calls), 1)
+        call = request.calls[0]
+        self.assertEqual(call['uri'], TOKEN_URI)
+        self.assertEqual(call['method'], 'POST')
+        self.assertEqual(call['body'],
+                         credentials._generate_refresh_request_body())
+        self.assertEqual(call['headers'],
+                         credentials._generate_refresh_request_headers())
+        self.assertEqual(aio._refresh_tasks.get(credentials), {})
+
+    def test_valid_token(self):
+        credentials = _make_credentials('token', expires_in=3600)
+        request = _Request([])
+        token_info = self.run_coroutine(
+            aio.get_access_token(credentials, request))
+        self.assertEqual(token_info.access_token, 'token')
+        self.assertEqual(request.calls, [])
+
+    def test_expired_token(self):
+        credentials = _make_credentials('token', expires_in=-60)
+        request = _Request([_token_response()])
+        token_info = self.run_coroutine(
+            aio.get_access_token(credentials, request))
+        self.assertEqual(token_info.access_token, 'new_token')
+
+    def test_concurrent_callers_share_refresh(self):
+        credentials = _make_credentials()
+        gate = asyncio.Event()
+        request = _Request([_token_response()], gate=gate)
+
+        async def get_tokens():
+            waiters = [asyncio.ensure_future(
+                aio.get_access_token(credentials, request))
+                for _ in range(10)]
+            await asyncio.sleep(0)
+            gate.set()
+            return await asyncio.gather(*waiters)
+
+        token_infos = self.run_coroutine(get_tokens())
+        self.assertEqual(
+            set(token_info.access_token for token_info in token_infos),
+            set(['new_token']))
+        self.assertEqual(len(request.calls), 1)
+
+    def test_failure(self):
+        credentials = _make_credentials()
+        error = json.dumps({'error': 'invalid_grant'}).encode('utf-8')
+        request = _Request([(http_client.BAD_REQUEST, error)])
+
+        async def get_tokens():
+            return await asyncio.gather(
+                aio.get_access_token(credentials, request),
+                aio.get_access_token(credentials, request),
+                return_exceptions=True)
+
+        results = self.run_coroutine(get_tokens())
+        for result in results:
+            self.assertIsInstance(result, client.HttpAccessTokenRefreshError)
+            self.assertEqual(result.status, http_client.BAD_REQUEST)
+        self.assertTrue(credentials.invalid)
+        self.assertEqual(len(request.calls), 1)
+
+    def test_cancelled_caller(self):
+        credentials = _make_credentials()
+        gate = asyncio.Event()
+        request = _Request([_token_response()], gate=gate)
+
+        async def cancel_one():
+            cancelled = asyncio.ensure_future(
+                aio.get_access_token(credentials, request))
+            waiter = asyncio.ensure_future(
+                aio.get_access_token(credentials, request))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            gate.set()
+            return await waiter
+
+        token_info = self.run_coroutine(cancel_one())
+        self.assertEqual(token_info.access_token, 'new_token')
+        self.assertEqual(len(request.calls), 1)
+
+    def test_store(self):
+        credentials = _make_credentials()
+        store = mock.Mock()
+        store.locked_get.return_value = None
+        credentials.set_store(store)
+        request = _Request([_token_response()])
+
+        loop_thread = threading.current_thread()
+        store_threads = []
+        for method in (store.acquire_lock, store.locked_get,
+                       store.locked_put, store.release_lock):
+            method.side_effect = (
+                lambda *args: store_threads.append(
+                    threading.current_thread()) or mock.DEFAULT)
+        self.run_coroutine(aio.get_access_token(credentials, request))
+
+        # The store is re-read before refreshing, as in
+        # OAuth2Credentials._refresh.
+        self.assertEqual(store.mock_calls, [
+            mock.call.acquire_lock(),
+            mock.call.locked_get(),
+            mock.call.locked_put(credentials),
+            mock.call.release_lock(),
+        ])
+        self.assertEqual(len(request.calls), 1)
+        # Storage calls, which may block, are made off the event loop.
+        self.assertEqual(len(store_threads), 4)
+        self.assertNotIn(loop_thread, store_threads)
+
+    def test_store_refreshed_elsewhere(self):
+        credentials = _make_credentials('token', expires_in=-10)
+        refreshed = _make_credentials('other_token', expires_in=3600)
+        store = mock.Mock()
+        store.locked_get.return_value = refreshed
+        credentials.set_store(store)
+        request = _Request([])
+
+        token_info = self.run_coroutine(
+            aio.get_access_token(credentials, request))
+        self.assertEqual(token_info.access_token, 'other_token')
+        self.assertEqual(request.calls, [])
+        self.assertEqual(store.mock_calls, [
+            mock.call.acquire_lock(),
+            mock.call.locked_get(),
+            mock.call.release_lock(),
+        ])
+
+    def test_store_shared_between_processes(self):
+        filehandle, filename = tempfile.mkstemp()
+        os.close(filehandle)
+        self.addCleanup(os.unlink, filename)
+        self.addCleanup(os.unlink, filename + '.lock')
+
+        # Each process has its own credentials and backend for the file.
+        stores = []
+        for _ in range(2):
+            store = multiprocess_file_storage.MultiprocessFileStorage(
+                filename, 'key')
+            store._backend = (
+                multiprocess_file_storage._MultiprocessStorageBackend(
+                    filename))
+            stores.append(store)
+        first = _make_credentials('token', expires_in=-10)
+        first.set_store(stores[0])
+        stores[0].put(first)
+        second = stores[1].get()
+
+        request = _Request([_token_response()])
+        self.run_coroutine(aio.refresh(first, request))
+        token_info = self.run_coroutine(
+            aio.get_access_token(second, request))
+        self.assertEqual(token_info.access_token, 'new_token')
+        self.assertEqual(len(request.calls), 1)
+
+    def test_refresh_ahead(self):
+        credentials = _make_credentials('token', expires_in=60)
+        credentials.set_refresh_ahead(300)
+        request = _Request([_token_response()])
+        token_info = self.run_coroutine(
+            aio.get_access_token(credentials, request))
+        self.assertEqual(token_info.access_token, 'new_token')
+
+    def test_refresh_ahead_in_background(self):
+        credentials = _make_credentials('token', expires_in=60)
+        credentials.set_refresh_ahead(300, background=True)
+        gate = asyncio.Event()
+        request = _Request([_token_response()], gate=gate)
+
+        async def get_tokens():
+            first = await aio.get_access_token(credentials, request)
+            second = await aio.get_access_token(credentials, request)
+            gate.set()
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            return first, second
+
+        first, second = self.run_coroutine(get_tokens())
+        # The still-valid token is used while refreshing.
+        self.assertEqual(first.access_token, 'token')
+        self.assertEqual(second.access_token, 'token')
+        self.assertEqual(credentials.access_token, 'new_token')
+        self.assertEqual(len(request.calls), 1)
+
+    @mock.patch('oauth2client.aio._LOGGER')
+    def test_refresh_ahead_in_background_failure(self, logger):
+        credentials = _make_credentials('token', expires_in=60)
+        credentials.set_refresh_ahead(300, background=True)
+        request = _Request([(http_client.SERVICE_UNAVAILABLE, b'')])
+
+        async def get_token():
+            token_info = await aio.get_access_token(credentials, request)
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            return token_info
+
+        token_info = self.run_coroutine(get_token())
+        self.assertEqual(token_info.access_token, 'token')
+        self.assertEqual(credentials.access_token, 'token')
+        self.assertTrue(logger.warning.called)
+
+    def test_service_account(self):
+        signer = crypt.Signer.from_string(_datafile('privatekey.pem'))
+        credentials = service_account.ServiceAccountCredentials(
+            'dummy@google.com', signer, scopes='dummy_scope',
+            token_uri=TOKEN_URI)
+        request = _Request([_token_response()])
+        token_info = self.run_coroutine(
+            aio.get_access_token(credentials, request))
+
+        self.assertEqual(token_info.access_token, 'new_token')
+        body = urllib.parse.parse_qs(request.calls[0]['body'])
+        self.assertEqual(body['grant_type'],
+                         ['urn:ietf:params:oauth:grant-type:jwt-bearer'])
+        payload = crypt.verify_signed_jwt_with_certs(
+            body['assertion'][0], {'key': _datafile('public_cert.pem')},
+            TOKEN_URI)
+        self.assertEqual(payload['scope'], 'dummy_scope')
+
+    def test_executor_fallback(self):
+        refresh_threads = []
+
+        class Credentials(client.OAuth2Credentials):
+
+            def _refresh(self, http):
+                refresh_threads.append(threading.current_thread())
+                self.access_token = 'thread_token'
+
+        credentials = Credentials(None, None, None, None, None, TOKEN_URI,
+                                  None)
+        request = _Request([])
+        with mock.patch('oauth2client.transport._HTTP_POOL',
+                        new=transport.HttpPool()):
+            token_info = self.run_coroutine(
+                aio.get_access_token(credentials, request))
+        self.assertEqual(token_info.access_token, 'thread_token')
+        self.assertEqual(request.calls, [])
+        self.assertEqual(len(refresh_threads), 1)
+        self.assertIsNot(refresh_threads[0], threading.current_thread())
+
+
+class Test_wrap_request_for_auth(AioTestCase):
+
+    def test_authorizes(self):
+        credentials = _make_credentials()
+        request = _Request([_token_response(), (http_client.OK, b'ok')])
+        authed_request = aio.wrap_request_for_auth(credentials, request)
+        self.assertIs(authed_request.credentials, credentials)
+
+        resp, content = self.run_coroutine(authed_request(
+            'https://example.com/api', headers={'user-agent': 'app'}))
+
+        self.assertEqual(resp.status, http_client.OK)
+        self.assertEqual(content, b'ok')
+        self.assertEqual(len(request.calls), 2)
+        self.assertEqual(request.calls[0]['uri'], TOKEN_URI)
+        call = request.calls[1]
+        self.assertEqual(call['uri'], 'https://example.com/api')
+        self.assertEqual(call['method'], 'GET')
+        self.assertEqual(call['headers'], {
+            'Authorization': 'Bearer new_token',
+            'user-agent': 'user-agent/1.0 app',
+        })
+
+    def test_refreshes_on_401(self):
+        credentials = _make_credentials('token', expires_in=3600)
+        request = _Request([
+            (http_client.UNAUTHORIZED, b''),
+            _token_response(),
+            (http_client.OK, b'ok'),
+        ])
+        authed_request = aio.wrap_request_for_auth(credentials, request)
+        body = mock.Mock()
+        body.tell.return_value = 7
+
+        resp, content = self.run_coroutine(authed_request(
+            'https://example.com/api', method='POST', body=body))
+
+        self.assertEqual(content, b'ok')
+        self.assertEqual(
+            [call['uri'] for call in request.calls],
+            ['https://example.com/api', TOKEN_URI, 'https://example.com/api'])
+        self.assertEqual(request.calls[0]['headers']['Authorization'],
+                         'Bearer token')
+        self.assertEqual(request.calls[2]['headers']['Authorization'],
+                         'Bearer new_token')
+        body.seek.assert_called_once_with(7)
+        refresh_body = urllib.parse.parse_qs(request.calls[1]['body'])
+        self.assertEqual(refresh_body['grant_type'], ['refresh_token'])
+
+    def test_gives_up_after_two_refreshes(self):
+        credentials = _make_credentials('token', expires_in=3600)
+        request = _Request([
+            (http_client.UNAUTHORIZED, b''),
+            _token_response('token2'),
+            (http_client.UNAUTHORIZED, b''),
+            _token_response('token3'),
+            (http_client.UNAUTHORIZED, b'denied'),
+        ])
+        authed_request = aio.wrap_request_for_auth(credentials, request)
+        resp, content = self.run_coroutine(
+            authed_request('https://example.com/api'))
+        self.assertEqual(resp.status, http_client.UNAUTHORIZED)
+        self.assertEqual(content, b'denied')
+        self.assertEqual(request.responses, [])
+
+    def test_refresh_ahead(self):
+        credentials = _make_credentials('token', expires_in=60)
+        credentials.set_refresh_ahead(300)
+        request = _Request([_token_response(), (http_client.OK, b'ok')])
+        authed_request = aio.wrap_request_for_auth(credentials, request)
+        self.run_coroutine(authed_request('https://example.com/api'))
+        self.assertEqual(request.calls[1]['headers']['Authorization'],
+                         'Bearer new_token')
+
+
+if __name__ == '__main__':  # pragma: NO COVER
+    unittest.main()
@@ -23,8 +23,10 @@ import os
 import socket
 import sys
 import tempfile
+import threading
 import unittest
 
+import httplib2
 import mock
 import six
 from six.moves import http_client
@@ -848,6 +850,35 @@ def _token_revoke_test_helper(testcase, revoke_raise, valid_bool_value,
     testcase.credentials.set_store(current_store)
 
 
+class _ConcurrentRefreshHttp(object):
+    """Rejects the initial token until every thread has made its request."""
+
+    def __init__(self, num_requests):
+        self.num_requests = num_requests
+        self.refreshes = 0
+        self._lock = threading.Lock()
+        self._all_rejected = threading.Event()
+
+    def request(self, uri, method='GET', body=None, headers=None,
+                redirections=1, connection_type=None):
+        if uri == oauth2client.GOOGLE_TOKEN_URI:
+            with self._lock:
+                self.refreshes += 1
+            token_response = {'access_token': '1/3w', 'expires_in': 3600}
+            return (http_mock.ResponseMock(),
+                    json.dumps(token_response).encode('utf-8'))
+        if headers[b'Authorization'] == b'Bearer 1/3w':
+            return http_mock.ResponseMock(), b''
+        with self._lock:
+            self.num_requests -= 1
+            if self.num_requests == 0:
+                self._all_rejected.set()
+        self._all_rejected.wait()
+        response = http_mock.ResponseMock(
+            {'status': http_client.UNAUTHORIZED})
+        return response, b''
+
+
 class BasicCredentialsTests(unittest.TestCase):
 
     def setUp(self):
@@ -920,6 +951,45 @@ class BasicCredentialsTests(unittest.TestCase):
             self.assertTrue(self.credentials.access_token_expired)
             self.assertEqual(None, self.credentials.token_response)
 
+    def test__refresh_if_stale_coalesced(self):
+        self.credentials.token_expiry = None
+        http = http_mock.HttpMock()
+        self.assertFalse(self.credentials._refresh_if_stale(http, 'old'))
+        self.assertEqual(http.requests, 0)
+        self.assertEqual(self.credentials.coalesced_refreshes, 1)
+
+    def test__refresh_if_stale_refreshes(self):
+        token_response = {'access_token': '1/3w', 'expires_in': 3600}
+        http = http_mock.HttpMock(
+            data=json.dumps(token_response).encode('utf-8'))
+        self.assertTrue(self.credentials._refresh_if_stale(http, 'foo'))
+        self.assertEqual(http.requests, 1)
+        self.assertEqual(self.credentials.access_token, '1/3w')
+        self.assertEqual(self.credentials.coalesced_refreshes, 0)
+
+    def test_concurrent_401_refreshes_once(self):
+        num_threads = 8
+        http = _ConcurrentRefreshHttp(num_threads)
+        self.credentials.authorize(http)
+        statuses = []
+
+        def make_request():
+            resp, _ = transport.request(http, 'http://example.com')
+            statuses.append(resp.status)
+
+        threads = [threading.Thread(target=make_request)
+                   for _ in range(num_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(statuses, [http_client.OK] * num_threads)
+        self.assertEqual(http.refreshes, 1)
+        self.assertEqual(self.credentials.access_token, '1/3w')
+        self.assertEqual(self.credentials.coalesced_refreshes,
+                         num_threads - 1)
+
     def test_token_revoke_success(self):
         http = http_mock.HttpMock(headers={'status': http_client.OK})
         _token_revoke_test_helper(
@@ -1186,6 +1256,21 @@ class BasicCredentialsTests(unittest.TestCase):
         self.assertEqual(token_info.expires_in,
                          expires_in.return_value)
 
+    @mock.patch.object(client.OAuth2Credentials, 'refresh')
+    def test_get_access_token_reuses_pooled_http(self, refresh_mock):
+        credentials = client.OAuth2Credentials(
+            None, None, None, None, None, 'https://example.com/token', None)
+        with mock.patch('oauth2client.transport._HTTP_POOL',
+                        new=transport.HttpPool()):
+            credentials.get_access_token()
+            credentials.get_access_token()
+
+        self.assertEqual(refresh_mock.call_count, 2)
+        (http1,), _ = refresh_mock.call_args_list[0]
+        (http2,), _ = refresh_mock.call_args_list[1]
+        self.assertIsInstance(http1, httplib2.Http)
+        self.assertIs(http2, http1)
+
     @mock.patch.object(client.OAuth2Credentials, 'refresh')
     @mock.patch.object(client.OAuth2Credentials, '_expires_in',
                        return_value=1835)
@@ -1208,6 +1293,132 @@ class BasicCredentialsTests(unittest.TestCase):
         expires_in.assert_called_once_with()
         refresh_mock.assert_called_once_with(http_obj)
 
+    def _refresh_ahead_credentials(self, expires_in, background=False):
+        credentials = copy.deepcopy(self.credentials)
+        credentials.token_expiry = (
+            datetime.datetime.utcnow() +
+            datetime.timedelta(seconds=expires_in))
+        credentials.set_refresh_ahead(300, background=background)
+        return credentials
+
+    def _token_response_http(self, status=http_client.OK):
+        token_response = {'access_token': '1/3w', 'expires_in': 3600}
+        if status != http_client.OK:
+            token_response = {'error': 'backend_error'}
+        return http_mock.HttpMock(
+            headers={'status': status},
+            data=json.dumps(token_response).encode('utf-8'))
+
+    def test_get_access_token_refresh_ahead(self):
+        credentials = self._refresh_ahead_credentials(60)
+        self.assertFalse(credentials.access_token_expired)
+        http = self._token_response_http()
+        token_info = credentials.get_access_token(http)
+        self.assertEqual(token_info.access_token, '1/3w')
+        self.assertEqual(http.requests, 1)
+
+    @mock.patch('oauth2client.client.logger')
+    def test_get_access_token_refresh_ahead_failure(self, logger):
+        credentials = self._refresh_ahead_credentials(60)
+        store = mock.Mock()
+        store.locked_get.return_value = None
+        credentials.set_store(store)
+        http = self._token_response_http(
+            status=http_client.INTERNAL_SERVER_ERROR)
+        token_info = credentials.get_access_token(http)
+
+        # The still-valid token is used, and isn't marked invalid.
+        self.assertEqual(token_info.access_token, 'foo')
+        self.assertEqual(http.requests, 1)
+        self.assertFalse(credentials.invalid)
+        store.locked_put.assert_not_called()
+        self.assertTrue(logger.warning.called)
+
+    def test_get_access_token_refresh_ahead_failure_after_expiry(self):
+        credentials = self._refresh_ahead_credentials(60)
+        http = self._token_response_http(
+            status=http_client.INTERNAL_SERVER_ERROR)
+
+        def expire(*args, **kwargs):
+            credentials.token_expiry = datetime.datetime.utcnow()
+            return http_mock.HttpMock.request(http, *args, **kwargs)
+
+        with mock.patch.object(http, 'request', side_effect=expire):
+            with self.assertRaises(client.HttpAccessTokenRefreshError):
+                credentials._refresh_ahead(http)
+
+    def test_get_access_token_refresh_ahead_not_due(self):
+        credentials = self._refresh_ahead_credentials(600)
+        http = self._token_response_http()
+        token_info = credentials.get_access_token(http)
+        self.assertEqual(token_info.access_token, 'foo')
+        self.assertEqual(http.requests, 0)
+
+    def test_get_access_token_refresh_ahead_background(self):
+        credentials = self._refresh_ahead_credentials(60, background=True)
+        http = self._token_response_http()
+        with mock.patch('oauth2client.transport.get_http_object',
+                        return_value=http):
+            with mock.patch.object(threading.Thread, 'start'):
+                token_info = credentials.get_access_token()
+                # Only one background refresh is started at a time.
+                credentials.get_access_token()
+            # The still-valid token is used while refreshing.
+            self.assertEqual(token_info.access_token, 'foo')
+            thread = client._get_refresh_state(credentials).background_refresh
+            thread.run()
+
+        self.assertEqual(credentials.access_token, '1/3w')
+        self.assertEqual(http.requests, 1)
+        self.assertIsNone(
+            client._get_refresh_state(credentials).background_refresh)
+
+    @mock.patch('oauth2client.client.logger')
+    def test_get_access_token_refresh_ahead_background_failure(self, logger):
+        credentials = self._refresh_ahead_credentials(60, background=True)
+        http = self._token_response_http(status=http_client.BAD_REQUEST)
+        with mock.patch('oauth2client.transport.get_http_object',
+                        return_value=http):
+            with mock.patch.object(threading.Thread, 'start'):
+                credentials.get_access_token()
+            thread = client._get_refresh_state(credentials).background_refresh
+            thread.run()
+
+        self.assertEqual(credentials.access_token, 'foo')
+        self.assertTrue(logger.warning.called)
+        self.assertIsNone(
+            client._get_refresh_state(credentials).background_refresh)
+
+    def test_authorize_refresh_ahead(self):
+        credentials = self._refresh_ahead_credentials(60)
+        token_response = {'access_token': '1/3w', 'expires_in': 3600}
+        http = http_mock.HttpMockSequence([
+            ({'status': http_client.OK},
+             json.dumps(token_response).encode('utf-8')),
+            ({'status': http_client.OK}, 'echo_request_headers'),
+        ])
+        http = credentials.authorize(http)
+        resp, content = transport.request(http, 'http://example.com')
+        self.assertEqual(content[b'Authorization'], b'Bearer 1/3w')
+
+    def test_authorize_refresh_ahead_failure(self):
+        credentials = self._refresh_ahead_credentials(60)
+        http = http_mock.HttpMockSequence([
+            ({'status': http_client.INTERNAL_SERVER_ERROR},
+             b'{"error": "backend_error"}'),
+            ({'status': http_client.OK}, 'echo_request_headers'),
+        ])
+        http = credentials.authorize(http)
+        resp, content = transport.request(http, 'http://example.com')
+        self.assertEqual(content[b'Authorization'], b'Bearer foo')
+        self.assertFalse(credentials.invalid)
+
+    def test_refresh_ahead_not_serialized(self):
+        credentials = self._refresh_ahead_credentials(60)
+        data = json.loads(credentials.to_json())
+        self.assertNotIn('refresh_ahead_secs', data)
+        self.assertNotIn('refresh_ahead_in_background', data)
+
     @mock.patch.object(client.OAuth2Credentials,
                        '_generate_refresh_request_headers',
                        return_value=object())
@@ -2328,6 +2539,221 @@ class Test__require_crypto_or_die(unittest.TestCase):
             client._require_crypto_or_die()
 
 
+class Test__parse_cache_expiry(unittest.TestCase):
+
+    NOW = datetime.datetime(2016, 1, 1, 12, 0, 0)
+
+    def _check(self, headers, expected_secs):
+        expiry = client._parse_cache_expiry(http_mock.ResponseMock(headers),
+                                            self.NOW)
+        self.assertEqual(expiry,
+                         self.NOW + datetime.timedelta(seconds=expected_secs))
+
+    def test_max_age(self):
+        self._check({'cache-control': 'public, max-age=19000, '
+                                      'must-revalidate'}, 19000)
+
+    def test_max_age_with_age(self):
+        self._check({'cache-control': 'max-age=300', 'age': '100'}, 200)
+        self._check({'cache-control': 'max-age=300', 'age': '400'}, 0)
+
+    def test_max_age_invalid(self):
+        self._check({'cache-control': 'max-age=soon'}, 0)
+
+    def test_no_cache(self):
+        self._check({'cache-control': 'no-cache, max-age=300'}, 0)
+        self._check({'cache-control': 'no-store'}, 0)
+
+    def test_expires_with_date(self):
+        self._check({'date': 'Mon, 01 Jan 2001 00:00:00 GMT',
+                     'expires': 'Mon, 01 Jan 2001 01:00:00 GMT'}, 3600)
+
+    def test_expires_without_date(self):
+        self._check({'expires': 'Fri, 01 Jan 2016 12:10:00 GMT'}, 600)
+
+    def test_max_age_overrides_expires(self):
+        self._check({'cache-control': 'max-age=60',
+                     'expires': 'Fri, 01 Jan 2016 12:10:00 GMT'}, 60)
+
+    def test_no_headers(self):
+        self._check({}, 0)
+        self._check({'expires': 'invalid'}, 0)
+
+
+@mock.patch('oauth2client.crypt._get_verifier', new=lambda pem: 'v-' + pem)
+class Test__CertificateStore(unittest.TestCase):
+
+    NOW = datetime.datetime(2016, 1, 1, 12, 0, 0)
+    CERT_URI = 'https://example.com/certs'
+
+    def _response(self, max_age, certs):
+        return ({'status': http_client.OK,
+                 'cache-control': 'max-age={0}'.format(max_age)},
+                json.dumps(certs).encode('utf-8'))
+
+    def _get_verifiers(self, store, http, now):
+        with mock.patch('oauth2client.transport.get_http_object',
+                        return_value=http):
+            with mock.patch('oauth2client.client._UTCNOW', return_value=now):
+                return store.get_verifiers()
+
+    def test_fetches_once(self):
+        store = client._CertificateStore(self.CERT_URI)
+        http = http_mock.HttpMockSequence([
+            self._response(3600, {'a': 'pem-a', 'b': 'pem-b'}),
+        ])
+        expected = {'a': 'v-pem-a', 'b': 'v-pem-b'}
+        self.assertEqual(self._get_verifiers(store, http, self.NOW), expected)
+        later = self.NOW + datetime.timedelta(seconds=3000)
+        self.assertEqual(self._get_verifiers(store, http, later), expected)
+
+        self.assertEqual(store.fetches, 1)
+        self.assertEqual(http.requests[0]['uri'], self.CERT_URI)
+
+    def test_expired_fetches_again(self):
+        store = client._CertificateStore(self.CERT_URI)
+        http = http_mock.HttpMockSequence([
+            self._response(3600, {'a': 'pem-a'}),
+            self._response(3600, {'b': 'pem-b'}),
+        ])
+        self._get_verifiers(store, http, self.NOW)
+        later = self.NOW + datetime.timedelta(seconds=3600)
+        self.assertEqual(self._get_verifiers(store, http, later),
+                         {'b': 'v-pem-b'})
+        self.assertEqual(store.fetches, 2)
+
+    def test_not_cacheable(self):
+        store = client._CertificateStore(self.CERT_URI)
+        http = http_mock.HttpMockSequence([
+            self._response(0, {'a': 'pem-a'}),
+            self._response(0, {'b': 'pem-b'}),
+        ])
+        self._get_verifiers(store, http, self.NOW)
+        self._get_verifiers(store, http, self.NOW)
+        self.assertEqual(store.fetches, 2)
+
+    def test_fetch_failure(self):
+        store = client._CertificateStore(self.CERT_URI)
+        http = http_mock.HttpMockSequence([
+            ({'status': http_client.NOT_FOUND}, b''),
+        ])
+        with self.assertRaises(client.VerifyJwtTokenError):
+            self._get_verifiers(store, http, self.NOW)
+        self.assertIsNone(store._snapshot)
+        self.assertFalse(store._fetch_lock.locked())
+
+    @mock.patch('threading.Thread.start', autospec=True)
+    def test_refresh_ahead_in_background(self, start):
+        store = client._CertificateStore(self.CERT_URI,
+                                         refresh_ahead_secs=600)
+        http = http_mock.HttpMockSequence([
+            self._response(3600, {'a': 'pem-a'}),
+            self._response(3600, {'b': 'pem-b'}),
+        ])
+        self._get_verifiers(store, http, self.NOW)
+        self.assertEqual(start.call_count, 0)
+
+        # Inside the refresh window the old certificates are still served
+        # while new ones are fetched in the background.
+        later = self.NOW + datetime.timedelta(seconds=3000)
+        self.assertEqual(self._get_verifiers(store, http, later),
+                         {'a': 'v-pem-a'})
+        self.assertEqual(start.call_count, 1)
+        self.assertTrue(store._fetch_lock.locked())
+        # Only one background fetch is started at a time.
+        self._get_verifiers(store, http, later)
+        self.assertEqual(start.call_count, 1)
+
+        thread = start.call_args[0][0]
+        self.assertTrue(thread.daemon)
+        with mock.patch('oauth2client.transport.get_http_object',
+                        return_value=http):
+            with mock.patch('oauth2client.client._UTCNOW',
+                            return_value=later):
+                thread.run()
+        self.assertFalse(store._fetch_lock.locked())
+        self.assertEqual(self._get_verifiers(store, http, later),
+                         {'b': 'v-pem-b'})
+        self.assertEqual(store.fetches, 2)
+
+    @mock.patch('threading.Thread.start', autospec=True)
+    def test_refresh_ahead_failure(self, start):
+        store = client._CertificateStore(self.CERT_URI,
+                                         refresh_ahead_secs=600)
+        http = http_mock.HttpMockSequence([
+            self._response(3600, {'a': 'pem-a'}),
+            ({'status': http_client.SERVICE_UNAVAILABLE}, b''),
+        ])
+        self._get_verifiers(store, http, self.NOW)
+        later = self.NOW + datetime.timedelta(seconds=3000)
+        self._get_verifiers(store, http, later)
+
+        thread = start.call_args[0][0]
+        with mock.patch('oauth2client.transport.get_http_object',
+                        return_value=http):
+            with mock.patch('oauth2client.client._UTCNOW',
+                            return_value=later):
+                with mock.patch('oauth2client.client.logger') as logger:
+                    thread.run()
+        self.assertEqual(logger.warning.call_count, 1)
+        self.assertFalse(store._fetch_lock.locked())
+
+        # The old certificates are still served, and the fetch is retried
+        # later.
+        self.assertEqual(self._get_verifiers(store, http, later),
+                         {'a': 'v-pem-a'})
+        self.assertEqual(start.call_count, 1)
+        self.assertEqual(store._snapshot.refresh_at,
+                         later + datetime.timedelta(
+                             seconds=client._CERTS_RETRY_SECS))
+
+    def test_expired_after_failed_background_fetch(self):
+        store = client._CertificateStore(self.CERT_URI)
+        http = http_mock.HttpMockSequence([
+            self._response(3600, {'a': 'pem-a'}),
+            self._response(3600, {'b': 'pem-b'}),
+        ])
+        self._get_verifiers(store, http, self.NOW)
+        snapshot = store._snapshot
+        later = self.NOW + datetime.timedelta(seconds=3600)
+
+        # A background fetch fails while waiting for the fetch lock, and
+        # replaces the expired snapshot with one to retry later.
+        def fail_background_fetch():
+            store._snapshot = snapshot._replace(refresh_at=later)
+
+        with mock.patch.object(store, '_fetch_lock') as fetch_lock:
+            fetch_lock.__enter__.side_effect = fail_background_fetch
+            self.assertEqual(self._get_verifiers(store, http, later),
+                             {'b': 'v-pem-b'})
+        self.assertEqual(store.fetches, 2)
+
+    def test_short_lifetime_refreshes_half_way(self):
+        store = client._CertificateStore(self.CERT_URI,
+                                         refresh_ahead_secs=600)
+        http = http_mock.HttpMockSequence([
+            self._response(300, {'a': 'pem-a'}),
+        ])
+        self._get_verifiers(store, http, self.NOW)
+        self.assertEqual(store._snapshot.refresh_at,
+                         self.NOW + datetime.timedelta(seconds=150))
+
+
+class Test__get_certificate_store(unittest.TestCase):
+
+    @mock.patch.object(client, '_certificate_stores', {})
+    def test_shared(self):
+        store = client._get_certificate_store('https://example.com/certs')
+        self.assertIsInstance(store, client._CertificateStore)
+        self.assertEqual(store.cert_uri, 'https://example.com/certs')
+        self.assertIs(
+            client._get_certificate_store('https://example.com/certs'),
+            store)
+        self.assertIsNot(
+            client._get_certificate_store('https://example.com/other'),
+            store)
+
+
 class TestDeviceFlowInfo(unittest.TestCase):
 
     DEVICE_CODE = 'e80ff179-fd65-416c-9dbf-56a23e5d23e4'
@@ -13,6 +13,8 @@
 # limitations under the License.
 
 import base64
+import collections
+import json
 import os
 import unittest
 
@@ -33,6 +35,62 @@ def datafile(filename):
         return file_obj.read()
 
 
+class TestVerifiedTokenCache(unittest.TestCase):
+
+    JWT = b'header.payload.signature'
+    CERTS = ['cert-value1', 'cert-value2']
+
+    @mock.patch('oauth2client.crypt.time')
+    def test_get_set(self, time):
+        time.time = mock.Mock(name='time', return_value=1000)
+        cache = crypt.VerifiedTokenCache()
+        payload_dict = {'exp': 1300, 'nested': {'a': 'b'}}
+
+        self.assertIsNone(cache.get(self.JWT, self.CERTS))
+        cache.set(self.JWT, self.CERTS, payload_dict)
+        payload_dict['nested']['a'] = 'changed'
+        self.assertEqual(len(cache), 1)
+
+        cached = cache.get(self.JWT.decode('ascii'), reversed(self.CERTS))
+        self.assertEqual(cached, {'exp': 1300, 'nested': {'a': 'b'}})
+        # Callers get a copy they can't change the cached payload through.
+        cached['nested']['a'] = 'changed'
+        self.assertEqual(cache.get(self.JWT, self.CERTS)['nested']['a'], 'b')
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 1)
+
+    @mock.patch('oauth2client.crypt.time')
+    def test_different_certs(self, time):
+        time.time = mock.Mock(name='time', return_value=1000)
+        cache = crypt.VerifiedTokenCache()
+        cache.set(self.JWT, self.CERTS, {'exp': 1300})
+        self.assertIsNone(cache.get(self.JWT, self.CERTS[:1]))
+        self.assertIsNone(cache.get(b'other.jwt.value', self.CERTS))
+
+    @mock.patch('oauth2client.crypt.time')
+    def test_expired(self, time):
+        time.time = mock.Mock(name='time', return_value=1000)
+        cache = crypt.VerifiedTokenCache()
+        cache.set(self.JWT, self.CERTS, {'exp': 1300})
+        time.time.return_value = 1300
+        self.assertIsNone(cache.get(self.JWT, self.CERTS))
+        self.assertEqual(len(cache), 0)
+
+    def test_without_exp(self):
+        cache = crypt.VerifiedTokenCache()
+        cache.set(self.JWT, self.CERTS, {})
+        cache.set(self.JWT, self.CERTS, {'exp': '1300'})
+        cache.set(self.JWT, self.CERTS, {'exp': True})
+        self.assertEqual(len(cache), 0)
+
+    def test_max_size(self):
+        cache = crypt.VerifiedTokenCache(max_size=1)
+        cache.set(b'a.b.c', self.CERTS, {'exp': 2 ** 40})
+        cache.set(self.JWT, self.CERTS, {'exp': 2 ** 40})
+        self.assertEqual(len(cache), 1)
+        self.assertIsNone(cache.get(b'a.b.c', self.CERTS))
+
+
 class Test__bad_pkcs12_key_as_pem(unittest.TestCase):
 
     def test_fails(self):
@@ -144,6 +202,159 @@ class Test__verify_signature(unittest.TestCase):
             verifier.verify.assert_called_once_with(message, signature)
 
 
+class Test__get_signer(unittest.TestCase):
+
+    def setUp(self):
+        crypt._signer_cache.clear()
+
+    def tearDown(self):
+        crypt._signer_cache.clear()
+
+    def test_parses_once(self):
+        key = 'key-value'
+        with mock.patch('oauth2client.crypt.Signer') as Signer:
+            first = crypt._get_signer(key)
+            second = crypt._get_signer(key.encode('ascii'))
+
+            self.assertIs(first, Signer.from_string.return_value)
+            self.assertIs(second, first)
+            Signer.from_string.assert_called_once_with(key)
+        self.assertEqual(crypt._signer_cache.hits, 1)
+        self.assertEqual(crypt._signer_cache.misses, 1)
+
+    def test_keyed_by_password(self):
+        key = b'key-value'
+        with mock.patch('oauth2client.crypt.Signer') as Signer:
+            Signer.from_string.side_effect = lambda *args: object()
+            default = crypt._get_signer(key)
+            password1 = crypt._get_signer(key, 'password1')
+            password2 = crypt._get_signer(key, b'password2')
+
+            self.assertIsNot(password1, default)
+            self.assertIsNot(password2, password1)
+            self.assertIs(crypt._get_signer(key, b'password1'), password1)
+            self.assertEqual(Signer.from_string.mock_calls, [
+                mock.call(key),
+                mock.call(key, 'password1'),
+                mock.call(key, b'password2'),
+            ])
+
+    def test_keyed_by_signer_class(self):
+        key = 'key-value'
+        with mock.patch('oauth2client.crypt.Signer') as Signer1:
+            signer1 = crypt._get_signer(key)
+        with mock.patch('oauth2client.crypt.Signer') as Signer2:
+            signer2 = crypt._get_signer(key)
+
+        self.assertIs(signer1, Signer1.from_string.return_value)
+        self.assertIs(signer2, Signer2.from_string.return_value)
+
+    def test_errors_not_cached(self):
+        key = 'key-value'
+        with mock.patch('oauth2client.crypt.Signer') as Signer:
+            Signer.from_string.side_effect = [ValueError, mock.sentinel.signer]
+            with self.assertRaises(ValueError):
+                crypt._get_signer(key)
+            self.assertIs(crypt._get_signer(key), mock.sentinel.signer)
+
+
+class Test__get_verifier(unittest.TestCase):
+
+    def setUp(self):
+        crypt._verifier_cache.clear()
+
+    def tearDown(self):
+        crypt._verifier_cache.clear()
+
+    def test_parses_once(self):
+        cert_value = 'cert-value'
+        with mock.patch('oauth2client.crypt.Verifier') as Verifier:
+            first = crypt._get_verifier(cert_value)
+            second = crypt._get_verifier(cert_value.encode('ascii'))
+
+            self.assertIs(first, Verifier.from_string.return_value)
+            self.assertIs(second, first)
+            Verifier.from_string.assert_called_once_with(cert_value,
+                                                         is_x509_cert=True)
+        self.assertEqual(crypt._verifier_cache.hits, 1)
+        self.assertEqual(crypt._verifier_cache.misses, 1)
+
+    def test_keyed_by_verifier_class(self):
+        cert_value = 'cert-value'
+        with mock.patch('oauth2client.crypt.Verifier') as Verifier1:
+            verifier1 = crypt._get_verifier(cert_value)
+        with mock.patch('oauth2client.crypt.Verifier') as Verifier2:
+            verifier2 = crypt._get_verifier(cert_value)
+
+        self.assertIs(verifier1, Verifier1.from_string.return_value)
+        self.assertIs(verifier2, Verifier2.from_string.return_value)
+
+    def test_verify_signature_reuses_verifier(self):
+        certs = ['cert-value1', 'cert-value2']
+        message = object()
+        signature = object()
+
+        verifier = mock.Mock()
+        verifier.verify = mock.Mock(name='verify',
+                                    side_effect=[False, True, False, True])
+        with mock.patch('oauth2client.crypt.Verifier') as Verifier:
+            Verifier.from_string = mock.Mock(name='from_string',
+                                             return_value=verifier)
+            crypt._verify_signature(message, signature, certs)
+            crypt._verify_signature(message, signature, certs)
+
+            self.assertEqual(Verifier.from_string.call_count, 2)
+            self.assertEqual(verifier.verify.call_count, 4)
+
+
+class Test__get_key_id(unittest.TestCase):
+
+    def _encode(self, header):
+        return base64.urlsafe_b64encode(header).rstrip(b'=')
+
+    def test_with_kid(self):
+        header = self._encode(b'{"alg": "RS256", "kid": "key1"}')
+        self.assertEqual(crypt._get_key_id(header), 'key1')
+
+    def test_without_kid(self):
+        header = self._encode(b'{"alg": "RS256"}')
+        self.assertIsNone(crypt._get_key_id(header))
+
+    def test_bad_header(self):
+        self.assertIsNone(crypt._get_key_id(self._encode(b'{BADJSON')))
+        self.assertIsNone(crypt._get_key_id(self._encode(b'["kid"]')))
+        self.assertIsNone(crypt._get_key_id(b'?'))
+
+    def test_non_string_kid(self):
+        for key_id in (b'["key1"]', b'{"key1": 1}', b'1', b'null'):
+            header = self._encode(b'{"alg": "RS256", "kid": ' + key_id + b'}')
+            self.assertIsNone(crypt._get_key_id(header))
+
+
+class Test__select_certs(unittest.TestCase):
+
+    CERTS = {'key1': 'cert-value1', 'key2': 'cert-value2'}
+
+    def test_known_kid(self):
+        with mock.patch('oauth2client.crypt._get_key_id',
+                        return_value='key2') as get_key_id:
+            certs = crypt._select_certs(b'header', self.CERTS)
+        self.assertEqual(list(certs), ['cert-value2'])
+        get_key_id.assert_called_once_with(b'header')
+
+    def test_unknown_kid(self):
+        with mock.patch('oauth2client.crypt._get_key_id',
+                        return_value='key3'):
+            certs = crypt._select_certs(b'header', self.CERTS)
+        self.assertEqual(sorted(certs), ['cert-value1', 'cert-value2'])
+
+    def test_no_kid(self):
+        with mock.patch('oauth2client.crypt._get_key_id',
+                        return_value=None):
+            certs = crypt._select_certs(b'header', self.CERTS)
+        self.assertEqual(sorted(certs), ['cert-value1', 'cert-value2'])
+
+
 class Test__check_audience(unittest.TestCase):
 
     def test_null_audience(self):
@@ -311,3 +522,328 @@ class Test_verify_signed_jwt_with_certs(unittest.TestCase):
         verify_time.assert_called_once_with(payload_dict)
         check_aud.assert_called_once_with(payload_dict, audience)
         certs.values.assert_called_once_with()
+
+    @mock.patch('oauth2client.crypt._verify_time_range')
+    @mock.patch('oauth2client.crypt._verify_signature')
+    def test_non_string_kid(self, verify_sig, verify_time):
+        header = base64.urlsafe_b64encode(b'{"alg": "RS256", "kid": ["x"]}')
+        payload = base64.urlsafe_b64encode(b'{"a": "b"}')
+        jwt = b'.'.join([header, payload, base64.b64encode(b'signature')])
+        certs = {'x': 'cert-value1', 'y': 'cert-value2'}
+
+        result = crypt.verify_signed_jwt_with_certs(jwt, certs)
+        self.assertEqual(result, {'a': 'b'})
+        self.assertEqual(sorted(verify_sig.call_args[0][2]),
+                         ['cert-value1', 'cert-value2'])
+
+
+class Test__verify_signed_jwt_with_verifiers(unittest.TestCase):
+
+    @mock.patch('oauth2client.crypt._check_audience')
+    @mock.patch('oauth2client.crypt._verify_time_range')
+    def test_success(self, verify_time, check_aud):
+        verifier1 = mock.Mock()
+        verifier1.verify = mock.Mock(name='verify', return_value=False)
+        verifier2 = mock.Mock()
+        verifier2.verify = mock.Mock(name='verify', return_value=True)
+        verifiers = {'key1': verifier1, 'key2': verifier2}
+        audience = object()
+
+        header = base64.urlsafe_b64encode(b'{"kid": "key2"}')
+        signature_bytes = b'signature'
+        signature = base64.b64encode(signature_bytes)
+        payload_dict = {'a': 'b'}
+        payload = base64.b64encode(b'{"a": "b"}')
+        jwt = b'.'.join([header, payload, signature])
+
+        result = crypt._verify_signed_jwt_with_verifiers(
+            jwt, verifiers, audience=audience)
+        self.assertEqual(result, payload_dict)
+
+        message_to_sign = header + b'.' + payload
+        verifier2.verify.assert_called_once_with(message_to_sign,
+                                                 signature_bytes)
+        self.assertFalse(verifier1.verify.called)
+        verify_time.assert_called_once_with(payload_dict)
+        check_aud.assert_called_once_with(payload_dict, audience)
+
+    def test_bad_signature(self):
+        verifier = mock.Mock()
+        verifier.verify = mock.Mock(name='verify', return_value=False)
+        payload = base64.b64encode(b'{"a": "b"}')
+        signature = base64.b64encode(b'signature')
+        jwt = b'.'.join([b'header', payload, signature])
+
+        with self.assertRaises(crypt.AppIdentityError):
+            crypt._verify_signed_jwt_with_verifiers(jwt, {'key': verifier})
+
+
+class Test_verify_signed_jwts_with_certs(unittest.TestCase):
+
+    def _make_jwt(self, payload, key_id=None):
+        header = {'alg': 'RS256'}
+        if key_id is not None:
+            header['kid'] = key_id
+        return b'.'.join([
+            base64.urlsafe_b64encode(json.dumps(header).encode('utf-8')),
+            base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')),
+            base64.urlsafe_b64encode(b'sig-' + payload['sig'].encode('utf-8')),
+        ])
+
+    def _make_verifier(self, valid_signatures):
+        verifier = mock.Mock()
+        verifier.verify = mock.Mock(
+            name='verify',
+            side_effect=lambda message, signature: (
+                signature in valid_signatures))
+        return verifier
+
+    @mock.patch('oauth2client.crypt._verify_time_range')
+    def test_groups_by_key_id(self, verify_time):
+        verifier1 = self._make_verifier([b'sig-1'])
+        verifier2 = self._make_verifier([b'sig-2'])
+        verifiers = {'key1': verifier1, 'key2': verifier2}
+        jwts = [
+            self._make_jwt({'sig': '1'}, key_id='key1'),
+            self._make_jwt({'sig': '2'}, key_id='key2'),
+            self._make_jwt({'sig': '1'}, key_id='key1'),
+            self._make_jwt({'sig': '2'}, key_id='unknown'),
+            self._make_jwt({'sig': '2'}, key_id='key1'),
+        ]
+
+        with mock.patch('oauth2client.crypt._get_verifier',
+                        side_effect=lambda pem: verifiers[pem]):
+            results = crypt.verify_signed_jwts_with_certs(
+                jwts, {'key1': 'key1', 'key2': 'key2'})
+
+        self.assertEqual([result.payload for result in results], [
+            {'sig': '1'}, {'sig': '2'}, {'sig': '1'}, {'sig': '2'}, None])
+        self.assertEqual([result.error for result in results[:4]],
+                         [None] * 4)
+        self.assertIsInstance(results[4].error, crypt.AppIdentityError)
+        self.assertEqual(str(results[4].error), 'Invalid token signature')
+        # Only the unknown key ID is checked against every verifier.
+        self.assertEqual(verifier1.verify.call_count, 4)
+        self.assertEqual(verifier2.verify.call_count, 2)
+        self.assertEqual(verify_time.call_count, 4)
+
+    @mock.patch('oauth2client.crypt._verify_time_range')
+    def test_audience(self, verify_time):
+        verifiers = {'key': self._make_verifier([b'sig-1'])}
+        jwts = [
+            self._make_jwt({'sig': '1', 'aud': 'audience'}),
+            self._make_jwt({'sig': '1', 'aud': 'somebody else'}),
+        ]
+        results = crypt._verify_signed_jwts_with_verifiers(
+            jwts, verifiers, audience='audience')
+        self.assertEqual(results[0].payload['aud'], 'audience')
+        self.assertTrue(str(results[1].error).startswith('Wrong recipient'))
+
+    def test_malformed(self):
+        results = crypt._verify_signed_jwts_with_verifiers(
+            [b'', b'a.' + base64.b64encode(b'{BADJSON') + b'.c', b'a.$.c',
+             None], {})
+        self.assertEqual([result.payload for result in results],
+                         [None] * 4)
+        for result in results:
+            self.assertIsInstance(result.error, crypt.AppIdentityError)
+        self.assertTrue(str(results[0].error).startswith(
+            'Wrong number of segments in token'))
+        self.assertTrue(str(results[1].error).startswith(
+            'Can\'t parse token'))
+
+    @mock.patch('oauth2client.crypt._verify_time_range')
+    def test_non_string_key_id(self, verify_time):
+        verifier = self._make_verifier([b'sig-1'])
+        jwts = [
+            self._make_jwt({'sig': '1'}, key_id='key'),
+            self._make_jwt({'sig': '1'}, key_id=['key']),
+            self._make_jwt({'sig': '2'}, key_id={'key': 1}),
+        ]
+        with mock.patch('oauth2client.crypt._get_verifier',
+                        return_value=verifier):
+            results = crypt.verify_signed_jwts_with_certs(
+                jwts, {'key': 'cert'})
+
+        self.assertEqual([result.payload for result in results],
+                         [{'sig': '1'}, {'sig': '1'}, None])
+        self.assertEqual([result.error for result in results[:2]],
+                         [None, None])
+        self.assertIsInstance(results[2].error, crypt.AppIdentityError)
+
+    @mock.patch('oauth2client.crypt._BATCH_CHUNK_SIZE', new=2)
+    @mock.patch('oauth2client.crypt._verify_time_range')
+    def test_executor(self, verify_time):
+        verifiers = {'key': self._make_verifier([b'sig-1'])}
+        jwts = [self._make_jwt({'sig': str(i % 2)}) for i in range(5)]
+        executor = mock.Mock()
+        executor.map = mock.Mock(side_effect=map)
+
+        results = crypt._verify_signed_jwts_with_verifiers(
+            jwts, verifiers, executor=executor)
+
+        self.assertEqual([result.error is None for result in results],
+                         [False, True, False, True, False])
+        executor.map.assert_called_once_with(crypt._verify_signatures,
+                                             mock.ANY)
+        tasks = list(executor.map.call_args[0][1])
+        self.assertEqual([len(signed) for _, signed in tasks], [2, 2, 1])
+
+    def test_empty(self):
+        self.assertEqual(
+            crypt._verify_signed_jwts_with_verifiers([], {}), [])
+
+
+class Test_verify_signed_jwt_with_certs_cache(unittest.TestCase):
+
+    CERTS = {'key': 'cert-value'}
+
+    def _make_jwt(self, payload_dict):
+        return b'.'.join([
+            base64.urlsafe_b64encode(b'{"alg": "RS256"}'),
+            base64.urlsafe_b64encode(json.dumps(payload_dict).encode('utf-8')),
+            base64.urlsafe_b64encode(b'signature'),
+        ])
+
+    @mock.patch('oauth2client.crypt._verify_time_range')
+    @mock.patch('oauth2client.crypt._verify_signature')
+    def test_hit(self, verify_sig, verify_time):
+        cache = crypt.VerifiedTokenCache()
+        jwt = self._make_jwt({'aud': 'audience', 'exp': 2 ** 40})
+
+        for _ in range(3):
+            result = crypt.verify_signed_jwt_with_certs(
+                jwt, self.CERTS, audience='audience', cache=cache)
+            self.assertEqual(result, {'aud': 'audience', 'exp': 2 ** 40})
+
+        self.assertEqual(verify_sig.call_count, 1)
+        # The time range is still checked on every hit.
+        self.assertEqual(verify_time.call_count, 3)
+        self.assertEqual(cache.hits, 2)
+
+        # So is the audience.
+        with self.assertRaises(crypt.AppIdentityError):
+            crypt.verify_signed_jwt_with_certs(
+                jwt, self.CERTS, audience='somebody else', cache=cache)
+        self.assertEqual(verify_sig.call_count, 1)
+
+    @mock.patch('oauth2client.crypt._verify_signature',
+                side_effect=crypt.AppIdentityError('Invalid token signature'))
+    def test_bad_signature_not_cached(self, verify_sig):
+        cache = crypt.VerifiedTokenCache()
+        jwt = self._make_jwt({'exp': 2 ** 40})
+        for _ in range(2):
+            with self.assertRaises(crypt.AppIdentityError):
+                crypt.verify_signed_jwt_with_certs(jwt, self.CERTS,
+                                                   cache=cache)
+        self.assertEqual(verify_sig.call_count, 2)
+        self.assertEqual(len(cache), 0)
+
+    @mock.patch('oauth2client.crypt._verify_time_range')
+    def test_with_verifiers(self, verify_time):
+        verifier = mock.Mock()
+        verifier.verify = mock.Mock(name='verify', return_value=True)
+        cache = crypt.VerifiedTokenCache()
+        jwt = self._make_jwt({'exp': 2 ** 40})
+
+        for _ in range(2):
+            result = crypt._verify_signed_jwt_with_verifiers(
+                jwt, {'key': verifier}, cache=cache)
+            self.assertEqual(result, {'exp': 2 ** 40})
+        self.assertEqual(verifier.verify.call_count, 1)
+        self.assertEqual(verify_time.call_count, 2)
+
+
+class Test_set_backend(unittest.TestCase):
+
+    def setUp(self):
+        self.orig_state = (crypt.Signer, crypt.Verifier, crypt._backend_mode,
+                           crypt._backend_timings)
+
+    def tearDown(self):
+        (crypt.Signer, crypt.Verifier, crypt._backend_mode,
+         crypt._backend_timings) = self.orig_state
+
+    def test_available_backends(self):
+        backends = crypt.available_backends()
+        self.assertEqual(backends[-1], crypt.RSA_BACKEND)
+        self.assertEqual(backends, list(crypt._BACKENDS))
+
+    def test_named_backend(self):
+        for name in crypt.available_backends():
+            crypt.set_backend(name)
+            self.assertIs(crypt.Signer, crypt._BACKENDS[name][0])
+            self.assertIs(crypt.Verifier, crypt._BACKENDS[name][1])
+            info = crypt.get_backend_info()
+            self.assertEqual(info['mode'], name)
+            self.assertEqual(info['signer'], name)
+            self.assertEqual(info['verifier'], name)
+            self.assertEqual(info['timings'], {})
+
+    def test_unknown_backend(self):
+        signer = crypt.Signer
+        with self.assertRaises(ValueError):
+            crypt.set_backend('unknown')
+        self.assertIs(crypt.Signer, signer)
+
+    @mock.patch.object(crypt, '_BACKENDS', collections.OrderedDict([
+        ('slow-sign', (mock.sentinel.Signer1, mock.sentinel.Verifier1)),
+        ('slow-verify', (mock.sentinel.Signer2, mock.sentinel.Verifier2)),
+    ]))
+    def test_auto_backend(self):
+        timings = {
+            'sign': {'slow-sign': 2.0, 'slow-verify': 1.0},
+            'verify': {'slow-sign': 1.0, 'slow-verify': 2.0},
+        }
+        with mock.patch('oauth2client.crypt._benchmark_backends',
+                        return_value=timings):
+            crypt.set_backend(crypt.AUTO_BACKEND)
+
+        self.assertIs(crypt.Signer, mock.sentinel.Signer2)
+        self.assertIs(crypt.Verifier, mock.sentinel.Verifier1)
+        self.assertEqual(crypt.get_backend_info(), {
+            'mode': crypt.AUTO_BACKEND,
+            'signer': 'slow-verify',
+            'verifier': 'slow-sign',
+            'available': ['slow-sign', 'slow-verify'],
+            'timings': timings,
+        })
+
+    @mock.patch('oauth2client.crypt._BENCHMARK_ROUNDS', new=1)
+    def test_benchmark_backends(self):
+        timings = crypt._benchmark_backends()
+        self.assertEqual(sorted(timings), ['sign', 'verify'])
+        for kind in ('sign', 'verify'):
+            self.assertEqual(sorted(timings[kind]),
+                             sorted(crypt.available_backends()))
+            for seconds in timings[kind].values():
+                self.assertGreaterEqual(seconds, 0)
+
+    def test_backend_info_direct_assignment(self):
+        crypt.Signer = crypt.RsaSigner
+        crypt.Verifier = mock.sentinel.Verifier
+        info = crypt.get_backend_info()
+        self.assertEqual(info['signer'], crypt.RSA_BACKEND)
+        self.assertIsNone(info['verifier'])
+
+    def test_set_backend_from_env(self):
+        with mock.patch.dict(os.environ,
+                             {crypt.CRYPTO_BACKEND_ENV_VAR: ' RSA '}):
+            crypt._set_backend_from_env()
+        self.assertIs(crypt.Signer, crypt.RsaSigner)
+        self.assertIs(crypt.Verifier, crypt.RsaVerifier)
+
+    def test_set_backend_from_env_unset(self):
+        signer = crypt.Signer
+        with mock.patch.dict(os.environ, {crypt.CRYPTO_BACKEND_ENV_VAR: ''}):
+            crypt._set_backend_from_env()
+        self.assertIs(crypt.Signer, signer)
+
+    def test_set_backend_from_env_unknown(self):
+        signer = crypt.Signer
+        with mock.patch.dict(os.environ,
+                             {crypt.CRYPTO_BACKEND_ENV_VAR: 'unknown'}):
+            with mock.patch('oauth2client.crypt.logger') as logger:
+                crypt._set_backend_from_env()
+        self.assertIs(crypt.Signer, signer)
+        self.assertEqual(logger.warning.call_count, 1)
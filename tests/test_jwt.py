@@ -14,6 +14,7 @@
 
 """Unit tests for JWT related methods in oauth2client."""
 
+import multiprocessing.pool
 import os
 import tempfile
 import time
@@ -90,7 +91,7 @@ class CryptTests(unittest.TestCase):
 
         self.assertTrue(expected_error in str(exc_manager.exception))
 
-    def _create_signed_jwt(self):
+    def _create_signed_jwt(self, key_id=None):
         private_key = datafile('privatekey.' + self.format_)
         signer = self.signer.from_string(private_key)
         audience = 'some_audience_address@testing.gserviceaccount.com'
@@ -102,7 +103,7 @@ class CryptTests(unittest.TestCase):
             'exp': now + 300,
             'user': 'billy bob',
             'metadata': {'meta': 'data'},
-        })
+        }, key_id=key_id)
 
     def test_verify_id_token(self):
         jwt = self._create_signed_jwt()
@@ -113,6 +114,26 @@ class CryptTests(unittest.TestCase):
         self.assertEqual('billy bob', contents['user'])
         self.assertEqual('data', contents['metadata']['meta'])
 
+    def test_verify_id_token_with_kid(self):
+        jwt = self._create_signed_jwt(key_id='foo')
+        certs = {'foo': datafile('public_cert.pem'),
+                 'bar': datafile('public_cert.pem')}
+        audience = 'some_audience_address@testing.gserviceaccount.com'
+        with mock.patch('oauth2client.crypt._verify_signature',
+                        wraps=crypt._verify_signature) as verify_sig:
+            contents = crypt.verify_signed_jwt_with_certs(
+                jwt, certs, audience)
+        self.assertEqual('billy bob', contents['user'])
+        self.assertEqual(list(verify_sig.call_args[0][2]),
+                         [certs['foo']])
+
+    def test_verify_id_token_with_unknown_kid(self):
+        jwt = self._create_signed_jwt(key_id='baz')
+        certs = {'foo': datafile('public_cert.pem')}
+        audience = 'some_audience_address@testing.gserviceaccount.com'
+        contents = crypt.verify_signed_jwt_with_certs(jwt, certs, audience)
+        self.assertEqual('billy bob', contents['user'])
+
     def _verify_http_mock(self, http):
         self.assertEqual(http.requests, 1)
         self.assertEqual(http.uri, client.ID_TOKEN_VERIFICATION_CERTS)
@@ -136,11 +157,19 @@ class CryptTests(unittest.TestCase):
     def test_verify_id_token_with_certs_uri_default_http(self):
         jwt = self._create_signed_jwt()
 
-        http = http_mock.HttpMock(data=datafile('certs.json'))
+        http = http_mock.HttpMock(
+            headers={'status': http_client.OK,
+                     'cache-control': 'public, max-age=3600'},
+            data=datafile('certs.json'))
 
-        with mock.patch('oauth2client.transport._CACHED_HTTP', new=http):
-            contents = client.verify_id_token(
-                jwt, 'some_audience_address@testing.gserviceaccount.com')
+        with mock.patch('oauth2client.transport.get_http_object',
+                        return_value=http):
+            with mock.patch.object(client, '_certificate_stores', {}):
+                contents = client.verify_id_token(
+                    jwt, 'some_audience_address@testing.gserviceaccount.com')
+                # The certificates are only fetched once.
+                client.verify_id_token(
+                    jwt, 'some_audience_address@testing.gserviceaccount.com')
 
         self.assertEqual('billy bob', contents['user'])
         self.assertEqual('data', contents['metadata']['meta'])
@@ -148,6 +177,22 @@ class CryptTests(unittest.TestCase):
         # Verify mocks.
         self._verify_http_mock(http)
 
+    def test_verify_id_token_default_http_fails(self):
+        jwt = self._create_signed_jwt()
+        test_email = 'some_audience_address@testing.gserviceaccount.com'
+
+        http = http_mock.HttpMock(
+            headers={'status': http_client.NOT_FOUND},
+            data=datafile('certs.json'))
+
+        with mock.patch('oauth2client.transport.get_http_object',
+                        return_value=http):
+            with mock.patch.object(client, '_certificate_stores', {}):
+                with self.assertRaises(client.VerifyJwtTokenError):
+                    client.verify_id_token(jwt, test_email)
+
+        self._verify_http_mock(http)
+
     def test_verify_id_token_with_certs_uri_fails(self):
         jwt = self._create_signed_jwt()
         test_email = 'some_audience_address@testing.gserviceaccount.com'
@@ -162,6 +207,84 @@ class CryptTests(unittest.TestCase):
         # Verify mocks.
         self._verify_http_mock(http)
 
+    def test_verify_id_token_with_cache(self):
+        jwt = self._create_signed_jwt()
+        cache = crypt.VerifiedTokenCache()
+        http = http_mock.HttpMock(data=datafile('certs.json'))
+        with mock.patch('oauth2client.crypt._verify_signature',
+                        wraps=crypt._verify_signature) as verify_sig:
+            for _ in range(2):
+                contents = client.verify_id_token(
+                    jwt, 'some_audience_address@testing.gserviceaccount.com',
+                    http=http, cache=cache)
+                self.assertEqual('billy bob', contents['user'])
+        self.assertEqual(verify_sig.call_count, 1)
+        self.assertEqual(cache.hits, 1)
+
+    def _check_verify_id_tokens(self, **kwargs):
+        audience = 'some_audience_address@testing.gserviceaccount.com'
+        jwt = self._create_signed_jwt()
+        jwt_with_kid = self._create_signed_jwt(key_id='foo')
+        signer = self.signer.from_string(
+            datafile('privatekey.' + self.format_))
+        wrong_audience = crypt.make_signed_jwt(signer, {
+            'aud': 'somebody else',
+            'iat': time.time(),
+            'exp': time.time() + 300,
+        })
+
+        http = http_mock.HttpMock(data=datafile('certs.json'))
+        results = client.verify_id_tokens(
+            [jwt, 'foo', jwt_with_kid, wrong_audience, 'foo.bar.baz'],
+            audience, http=http, **kwargs)
+
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results[0].payload['user'], 'billy bob')
+        self.assertIsNone(results[0].error)
+        self.assertIsNone(results[1].payload)
+        self.assertIn('Wrong number of segments', str(results[1].error))
+        self.assertEqual(results[2].payload['user'], 'billy bob')
+        self.assertIsNone(results[2].error)
+        self.assertIsNone(results[3].payload)
+        self.assertIn('Wrong recipient', str(results[3].error))
+        self.assertIsNone(results[4].payload)
+        self.assertIn('Can\'t parse token', str(results[4].error))
+        self._verify_http_mock(http)
+
+    def test_verify_id_tokens(self):
+        self._check_verify_id_tokens()
+
+    def test_verify_id_tokens_with_executor(self):
+        pool = multiprocessing.pool.ThreadPool(2)
+        try:
+            self._check_verify_id_tokens(executor=pool)
+        finally:
+            pool.terminate()
+
+    def test_verify_id_tokens_default_http(self):
+        jwt = self._create_signed_jwt()
+        http = http_mock.HttpMock(
+            headers={'status': http_client.OK,
+                     'cache-control': 'public, max-age=3600'},
+            data=datafile('certs.json'))
+
+        with mock.patch('oauth2client.transport.get_http_object',
+                        return_value=http):
+            with mock.patch.object(client, '_certificate_stores', {}):
+                results = client.verify_id_tokens(
+                    [jwt, jwt],
+                    'some_audience_address@testing.gserviceaccount.com')
+
+        self.assertEqual([result.payload['user'] for result in results],
+                         ['billy bob', 'billy bob'])
+        self._verify_http_mock(http)
+
+    def test_verify_id_tokens_with_certs_uri_fails(self):
+        http = http_mock.HttpMock(headers={'status': http_client.NOT_FOUND})
+        with self.assertRaises(client.VerifyJwtTokenError):
+            client.verify_id_tokens([self._create_signed_jwt()],
+                                    'audience', http=http)
+
     def test_verify_id_token_bad_tokens(self):
         private_key = datafile('privatekey.' + self.format_)
 
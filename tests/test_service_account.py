@@ -47,6 +47,7 @@ def datafile(filename):
 class ServiceAccountCredentialsTests(unittest.TestCase):
 
     def setUp(self):
+        crypt._signer_cache.clear()
         self.orig_signer = crypt.Signer
         self.orig_verifier = crypt.Verifier
         self.client_id = '123'
@@ -65,6 +66,7 @@ class ServiceAccountCredentialsTests(unittest.TestCase):
     def tearDown(self):
         crypt.Signer = self.orig_signer
         crypt.Verifier = self.orig_verifier
+        crypt._signer_cache.clear()
 
     def test__to_json_override(self):
         signer = object()
@@ -225,6 +227,37 @@ class ServiceAccountCredentialsTests(unittest.TestCase):
                                       scopes=['foo', 'bar'],
                                       token_uri='baz', revoke_uri='qux')
 
+    def _from_json_twice(self, credentials):
+        serialized = credentials.to_json()
+        with mock.patch.object(crypt.Signer, 'from_string',
+                               wraps=crypt.Signer.from_string) as from_string:
+            first = service_account.ServiceAccountCredentials.from_json(
+                serialized)
+            second = service_account.ServiceAccountCredentials.from_json(
+                serialized)
+        self.assertIsNot(second, first)
+        self.assertIs(second._signer, first._signer)
+        return first, from_string
+
+    def test_from_json_shares_signer(self):
+        self.credentials._private_key_pkcs8_pem = self.private_key
+        credentials, from_string = self._from_json_twice(self.credentials)
+        from_string.assert_called_once_with(
+            self.private_key.decode('utf-8'))
+        self.assertEqual(credentials.sign_blob(b'blob'),
+                         self.credentials.sign_blob(b'blob'))
+
+    def test_from_json_p12_shares_signer(self):
+        credentials = (
+            service_account.ServiceAccountCredentials.from_p12_keyfile(
+                'name@email.com', data_filename('privatekey.p12')))
+        # Parsed once already, by from_p12_keyfile.
+        crypt._signer_cache.clear()
+        credentials, from_string = self._from_json_twice(credentials)
+        from_string.assert_called_once_with(
+            datafile('privatekey.p12'),
+            service_account._PASSWORD_DEFAULT)
+
     def test_create_scoped_required_without_scopes(self):
         self.assertTrue(self.credentials.create_scoped_required())
 
@@ -387,6 +420,138 @@ T3_EXPIRY = T3 + TOKEN_LIFE
 T3_EXPIRY_DATE = T3_DATE + datetime.timedelta(seconds=TOKEN_LIFE)
 
 
+def _token_response(status=http_client.OK, access_token='token'):
+    if status == http_client.OK:
+        payload = {'access_token': access_token, 'expires_in': 3600}
+    else:
+        payload = {'error': 'rate_limited'}
+    return {'status': status}, json.dumps(payload).encode('utf-8')
+
+
+@mock.patch('time.time', return_value=1000)
+@mock.patch('time.sleep')
+class CreateDelegatedBulkTests(unittest.TestCase):
+
+    def setUp(self):
+        signer = crypt.Signer.from_string(datafile('pem_from_pkcs12.pem'))
+        self.credentials = service_account.ServiceAccountCredentials(
+            'dummy@google.com', signer, scopes='dummy_scope')
+
+    def test_refreshes_each_subject(self, sleep, unused_time):
+        subjects = ['a@example.com', 'b@example.com', 'c@example.com']
+        http_objects = []
+
+        def http_factory():
+            http = http_mock.HttpMock(*_token_response())
+            http_objects.append(http)
+            return http
+
+        results = self.credentials.create_delegated_bulk(
+            subjects, scopes=['foo', 'bar'], http_factory=http_factory,
+            max_workers=2)
+
+        self.assertEqual(sorted(results), subjects)
+        for subject, credentials in results.items():
+            self.assertIsInstance(
+                credentials, service_account.ServiceAccountCredentials)
+            self.assertEqual(credentials._kwargs['sub'], subject)
+            self.assertEqual(credentials._scopes, 'foo bar')
+            self.assertEqual(credentials.access_token, 'token')
+        self.assertEqual(len(http_objects), 2)
+        self.assertEqual(sum(http.requests for http in http_objects), 3)
+        sleep.assert_not_called()
+
+    def test_no_subjects(self, sleep, unused_time):
+        http_factory = mock.Mock()
+        self.assertEqual(self.credentials.create_delegated_bulk(
+            [], http_factory=http_factory), {})
+        http_factory.assert_not_called()
+
+    def test_invalid_max_workers(self, sleep, unused_time):
+        http_factory = mock.Mock()
+        for max_workers in (0, -1):
+            with self.assertRaises(ValueError):
+                self.credentials.create_delegated_bulk(
+                    ['a@example.com'], http_factory=http_factory,
+                    max_workers=max_workers)
+        http_factory.assert_not_called()
+
+    def test_http_factory_fails(self, sleep, unused_time):
+        subjects = ['a@example.com', 'b@example.com', 'c@example.com']
+        error = IOError('no connection')
+        results = self.credentials.create_delegated_bulk(
+            subjects, http_factory=mock.Mock(side_effect=error),
+            max_workers=2)
+        self.assertEqual(results, dict.fromkeys(subjects, error))
+
+    def test_http_factory_fails_for_one_worker(self, sleep, unused_time):
+        subjects = ['a@example.com', 'b@example.com', 'c@example.com']
+        http = http_mock.HttpMock(*_token_response())
+        http_factory = mock.Mock(side_effect=[IOError('no connection'), http])
+        results = self.credentials.create_delegated_bulk(
+            subjects, http_factory=http_factory, max_workers=2)
+
+        # The remaining worker refreshes every subject.
+        self.assertEqual(sorted(results), subjects)
+        for credentials in results.values():
+            self.assertEqual(credentials.access_token, 'token')
+        self.assertEqual(http.requests, 3)
+
+    @staticmethod
+    def _advance_clock_on_sleep(sleep, time_mock):
+        def advance(secs):
+            time_mock.return_value += secs
+        sleep.side_effect = advance
+
+    def test_rate_limited(self, sleep, time_mock):
+        self._advance_clock_on_sleep(sleep, time_mock)
+        http = http_mock.HttpMockSequence([
+            _token_response(status=429),
+            _token_response(status=http_client.SERVICE_UNAVAILABLE),
+            _token_response(),
+            _token_response(access_token='token2'),
+        ])
+        results = self.credentials.create_delegated_bulk(
+            ['a@example.com', 'b@example.com'], http_factory=lambda: http,
+            max_workers=1, min_backoff_secs=3)
+
+        self.assertEqual(results['a@example.com'].access_token, 'token')
+        self.assertEqual(results['b@example.com'].access_token, 'token2')
+        self.assertFalse(results['a@example.com'].invalid)
+        self.assertEqual(sleep.mock_calls, [mock.call(3), mock.call(6)])
+
+    def test_retries_exhausted(self, sleep, time_mock):
+        self._advance_clock_on_sleep(sleep, time_mock)
+        http = http_mock.HttpMockSequence([
+            _token_response(status=429),
+            _token_response(status=429),
+            _token_response(status=429),
+        ])
+        results = self.credentials.create_delegated_bulk(
+            ['a@example.com'], http_factory=lambda: http, max_retries=2,
+            min_backoff_secs=3, max_backoff_secs=4)
+
+        error = results['a@example.com']
+        self.assertIsInstance(error, client.HttpAccessTokenRefreshError)
+        self.assertEqual(error.status, 429)
+        self.assertEqual(sleep.mock_calls, [mock.call(3), mock.call(4)])
+
+    def test_errors_not_retried(self, sleep, unused_time):
+        http = http_mock.HttpMockSequence([
+            _token_response(status=http_client.BAD_REQUEST),
+        ])
+        results = self.credentials.create_delegated_bulk(
+            ['a@example.com', 'b@example.com'], http_factory=lambda: http,
+            max_workers=1)
+
+        error = results['a@example.com']
+        self.assertIsInstance(error, client.HttpAccessTokenRefreshError)
+        self.assertEqual(error.status, http_client.BAD_REQUEST)
+        # The mock has run out of responses.
+        self.assertIsInstance(results['b@example.com'], IndexError)
+        sleep.assert_not_called()
+
+
 class JWTAccessCredentialsTests(unittest.TestCase):
 
     def setUp(self):
@@ -555,6 +720,52 @@ class JWTAccessCredentialsTests(unittest.TestCase):
         self.assertEqual(payload['exp'], T1_EXPIRY)
         self.assertEqual(payload['aud'], self.url)
 
+    @mock.patch('oauth2client.client._UTCNOW')
+    @mock.patch('time.time')
+    def test_authorize_no_aud_reuses_token(self, time, utcnow):
+        utcnow.return_value = T1_DATE
+        time.return_value = T1
+
+        jwt = service_account._JWTAccessCredentials(
+            self.service_account_email, self.signer,
+            private_key_id=self.private_key_id, client_id=self.client_id)
+
+        http = http_mock.HttpMockSequence([
+            ({'status': http_client.OK}, b''),
+            ({'status': http_client.OK}, b''),
+            ({'status': http_client.OK}, b''),
+        ])
+
+        jwt.authorize(http)
+        with mock.patch.object(jwt, '_create_token',
+                               wraps=jwt._create_token) as create_token:
+            transport.request(http, self.url)
+            # The cached token is still well within its lifetime.
+            utcnow.return_value = T2_DATE
+            transport.request(http, self.url + '?foo=bar')
+            # Close enough to expiry that a new token is signed.
+            utcnow.return_value = T1_DATE + datetime.timedelta(
+                seconds=TOKEN_LIFE - 60)
+            transport.request(http, self.url)
+
+        self.assertEqual(create_token.call_count, 2)
+        cache = jwt.audience_token_cache
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 2)
+        tokens = [info['headers'][b'Authorization'] for info in http.requests]
+        self.assertEqual(tokens[0], tokens[1])
+        self.assertNotEqual(tokens[1], tokens[2])
+
+    def test_audience_token_cache_not_serialized(self):
+        jwt = service_account._JWTAccessCredentials(
+            self.service_account_email, self.signer,
+            private_key_id=self.private_key_id, client_id=self.client_id)
+        cache = jwt.audience_token_cache
+        self.assertIs(jwt.audience_token_cache, cache)
+        self.assertEqual(cache.max_size, jwt._AUDIENCE_TOKEN_CACHE_SIZE)
+        self.assertNotIn('_audience_tokens', json.loads(jwt.to_json()))
+        self.assertNotIn('_audience_tokens', jwt.__getstate__())
+
     @mock.patch('oauth2client.client._UTCNOW')
     def test_authorize_stale_token(self, utcnow):
         utcnow.return_value = T1_DATE
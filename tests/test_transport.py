@@ -63,6 +63,108 @@ class Test_get_http_object(unittest.TestCase):
         http_klass.assert_called_once_with(1, 2, foo='bar')
 
 
+def _http_with_connection():
+    http = httplib2.Http()
+    connection = mock.Mock()
+    http.connections['https:example.com'] = connection
+    return http, connection
+
+
+@mock.patch('time.time', return_value=1000)
+class TestHttpPool(unittest.TestCase):
+
+    def test_reuses_per_host(self, unused_time):
+        pool = transport.HttpPool()
+        with pool.checkout('https://example.com/token') as http1:
+            self.assertIsInstance(http1, httplib2.Http)
+            # Concurrent checkouts get different objects.
+            with pool.checkout('https://example.com/token') as http2:
+                self.assertIsNot(http2, http1)
+        # The most recently checked in is reused first.
+        with pool.checkout('https://example.com/revoke') as http3:
+            self.assertIs(http3, http1)
+        with pool.checkout('https://example.org/token') as http4:
+            self.assertIsNot(http4, http1)
+            self.assertIsNot(http4, http2)
+        with pool.checkout('http://example.com/token') as http5:
+            self.assertIsNot(http5, http1)
+            self.assertIsNot(http5, http2)
+
+    def test_max_size(self, unused_time):
+        pool = transport.HttpPool(max_size=1)
+        http1, connection1 = _http_with_connection()
+        http2, connection2 = _http_with_connection()
+        with mock.patch('oauth2client.transport.get_http_object',
+                        side_effect=[http1, http2]):
+            with pool.checkout('https://example.com'):
+                with pool.checkout('https://example.com'):
+                    pass
+        # The second checked in doesn't fit.
+        connection1.close.assert_called_once_with()
+        self.assertEqual(http1.connections, {})
+        connection2.close.assert_not_called()
+        with pool.checkout('https://example.com') as http:
+            self.assertIs(http, http2)
+
+    def test_idle_timeout(self, time_mock):
+        pool = transport.HttpPool(idle_timeout=10)
+        http, connection = _http_with_connection()
+        with mock.patch('oauth2client.transport.get_http_object',
+                        return_value=http):
+            with pool.checkout('https://example.com'):
+                pass
+
+        time_mock.return_value += 10
+        with pool.checkout('https://example.com') as reused:
+            self.assertIs(reused, http)
+
+        time_mock.return_value += 11
+        with pool.checkout('https://example.com') as new_http:
+            self.assertIsNot(new_http, http)
+        connection.close.assert_called_once_with()
+
+    def test_error_discards(self, unused_time):
+        pool = transport.HttpPool()
+        http, connection = _http_with_connection()
+        with mock.patch('oauth2client.transport.get_http_object',
+                        return_value=http):
+            with self.assertRaises(ValueError):
+                with pool.checkout('https://example.com'):
+                    raise ValueError()
+        connection.close.assert_called_once_with()
+        with pool.checkout('https://example.com') as new_http:
+            self.assertIsNot(new_http, http)
+
+    def test_only_pools_httplib2(self, unused_time):
+        pool = transport.HttpPool()
+        with mock.patch('oauth2client.transport.get_http_object',
+                        side_effect=[object(), object()]):
+            with pool.checkout('https://example.com') as http1:
+                pass
+            with pool.checkout('https://example.com') as http2:
+                self.assertIsNot(http2, http1)
+
+    def test_clear(self, unused_time):
+        pool = transport.HttpPool()
+        http, connection = _http_with_connection()
+        with mock.patch('oauth2client.transport.get_http_object',
+                        return_value=http):
+            with pool.checkout('https://example.com'):
+                pass
+        pool.clear()
+        connection.close.assert_called_once_with()
+        with pool.checkout('https://example.com') as new_http:
+            self.assertIsNot(new_http, http)
+
+    def test_pooled_http(self, unused_time):
+        pool = transport.HttpPool()
+        with mock.patch('oauth2client.transport._HTTP_POOL', new=pool):
+            with transport.pooled_http('https://example.com') as http1:
+                pass
+            with transport.pooled_http('https://example.com') as http2:
+                self.assertIs(http2, http1)
+
+
 class Test__initialize_headers(unittest.TestCase):
 
     def test_null(self):
@@ -128,6 +230,81 @@ class Test_clean_headers(unittest.TestCase):
         self.assertEqual(result, header_str)
 
 
+class Test__refresh_if_stale(unittest.TestCase):
+
+    def test_without_coalescing(self):
+        credentials = mock.Mock(spec=['_refresh'])
+        http = object()
+        transport._refresh_if_stale(credentials, http, 'token')
+        credentials._refresh.assert_called_once_with(http)
+
+    def test_with_coalescing(self):
+        credentials = mock.Mock(spec=['_refresh', '_refresh_if_stale'])
+        http = object()
+        transport._refresh_if_stale(credentials, http, 'token')
+        credentials._refresh_if_stale.assert_called_once_with(http, 'token')
+        credentials._refresh.assert_not_called()
+
+
+class Test__AuthHeaders(unittest.TestCase):
+
+    @staticmethod
+    def _credentials(access_token='token', user_agent='ua/1.0'):
+        return client.OAuth2Credentials(
+            access_token, None, None, None, None, None, user_agent)
+
+    @staticmethod
+    def _slow_build(credentials, headers):
+        headers = transport._initialize_headers(headers)
+        credentials.apply(headers)
+        transport._apply_user_agent(headers, credentials.user_agent)
+        return transport.clean_headers(headers)
+
+    def test_matches_clean_headers(self):
+        for user_agent in (None, 'ua/1.0'):
+            credentials = self._credentials(user_agent=user_agent)
+            auth_headers = transport._AuthHeaders(credentials)
+            for headers in (None, {}, {'foo': 'bar', u'baz': 1},
+                            {'user-agent': 'app'},
+                            {'Authorization': 'overridden'}):
+                self.assertEqual(auth_headers.build(headers),
+                                 self._slow_build(credentials, headers))
+
+    def test_does_not_modify_headers(self):
+        auth_headers = transport._AuthHeaders(self._credentials())
+        headers = {'foo': 'bar'}
+        auth_headers.build(headers)
+        self.assertEqual(headers, {'foo': 'bar'})
+
+    def test_cached_until_refresh(self):
+        credentials = self._credentials()
+        auth_headers = transport._AuthHeaders(credentials)
+        with mock.patch.object(credentials, 'apply',
+                               wraps=credentials.apply) as apply_mock:
+            first = auth_headers.build({'foo': 'bar'})
+            second = auth_headers.build(None)
+            self.assertEqual(apply_mock.call_count, 1)
+            self.assertEqual(second[b'Authorization'], b'Bearer token')
+            # Results don't share the cached dictionary.
+            self.assertNotIn(b'foo', second)
+            self.assertEqual(first[b'foo'], b'bar')
+
+            credentials.access_token = 'new_token'
+            third = auth_headers.build(None)
+            self.assertEqual(apply_mock.call_count, 2)
+            self.assertEqual(third[b'Authorization'], b'Bearer new_token')
+
+            credentials.user_agent = 'ua/2.0'
+            fourth = auth_headers.build(None)
+            self.assertEqual(apply_mock.call_count, 3)
+            self.assertEqual(fourth[b'user-agent'], b'ua/2.0')
+
+    def test_non_ascii_header(self):
+        auth_headers = transport._AuthHeaders(self._credentials())
+        with self.assertRaises(client.NonAsciiHeaderError):
+            auth_headers.build({'foo': u'\u2603'})
+
+
 class Test_wrap_http_for_auth(unittest.TestCase):
 
     def test_wrap(self):